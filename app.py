@@ -14,6 +14,7 @@ else:
 
 from flask import Flask
 from flask_migrate import Migrate
+from flask_mail import Mail
 
 from routes.cpa.auth import auth_bp 
 from routes.cpa.mail import mail_bp 
@@ -22,6 +23,7 @@ from routes.cpa.cpa_customer import cpa_customer_bp
 from routes.customer.auth import customer_auth_bp 
 from routes.customer.customer_profile import customer_profile_bp
 from routes.customer.customer_document import customer_document_bp
+from routes.customer.customer_upload_session import customer_upload_session_bp
 
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
@@ -29,6 +31,11 @@ from models import db
 from flask_cors import CORS 
 
 from config.config import Config 
+from lib.s3 import init_s3_client
+from lib.storage import init_storage
+from lib.passwords import init_password_hasher
+from lib.dbmetrics import init_query_metrics
+from lib.commands import register_commands
 
 
 
@@ -39,6 +46,15 @@ app = Flask(__name__)
 app.config.from_object(Config)
 
 db.init_app(app)
+# Per-request query count, DB time and slow statements
+init_query_metrics(app)
+
+# One shared, thread-safe S3 client (and connection pool) per worker process
+init_s3_client(app)
+# Document storage backends (S3 and/or local filesystem), see STORAGE_BACKEND
+init_storage(app)
+# Password hashing on a bounded process pool; a full queue answers 503
+init_password_hasher(app)
 
 
 
@@ -46,10 +62,19 @@ db.init_app(app)
 # JWTManager WITH YOUR APP
 jwt = JWTManager(app) 
 
+# Flask-Mail, used by the outbox worker (`flask send-emails`)
+mail = Mail(app)
+
 # Flask-Migrate
 migrate = Migrate(app, db)
 
-CORS(app, origins=["http://localhost:3000","http://localhost:3001"], supports_credentials=True)
+CORS(
+    app,
+    origins=["http://localhost:3000","http://localhost:3001"],
+    supports_credentials=True,
+    # Resumable upload clients read the session URL and offset from these headers
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Upload-Expires", "Upload-Document-Guid", "Tus-Resumable"]
+)
 
 
 # register CPA blueprints
@@ -62,6 +87,10 @@ app.register_blueprint(mail_bp)
 app.register_blueprint(customer_auth_bp, name='customer_auth')
 app.register_blueprint(customer_profile_bp)
 app.register_blueprint(customer_document_bp)
+app.register_blueprint(customer_upload_session_bp)
+
+# flask CLI maintenance commands
+register_commands(app)
 
 
 with app.app_context():
@@ -0,0 +1,167 @@
+"""
+Benchmark for compression at rest (lib/compression.py).
+
+Runs a document mix through the same streaming compress and decompress paths the upload and
+download routes use, for each codec and level, and reports per file type the share of files
+that would be compressed, the compression ratio and the CPU cost per MB of original data.
+
+By default the mix is generated: text files, PDFs with uncompressed and with random
+(incompressible) content, and compound-file stand-ins for doc/xls/ppt made of UTF-16 text,
+repetitive records and some binary noise. Pass --sample-dir to measure real documents instead.
+
+Example:
+    python benchmarks/compression_benchmark.py --codecs zstd:1,zstd:3,zstd:9,gzip:1,gzip:6
+    python benchmarks/compression_benchmark.py --sample-dir ~/sample-documents
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from lib.compression import COMPRESSIBLE_FILE_TYPES, CompressingReader, choose_encoding, decompress_chunks
+from text_index_benchmark import write_pdf, write_txt, sentence
+
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+
+def write_compound_file(path, size, rng):
+    """Writes an approximation of a legacy Office file: mostly text and records, some noise."""
+    with open(path, 'wb') as output:
+        output.write(OLE_MAGIC + bytes(504))
+        written = 512
+        while written < size:
+            roll = rng.random()
+            if roll < 0.6:
+                block = (sentence(rng, 40) + '\r').encode('utf-16-le')
+            elif roll < 0.9:
+                block = b''.join(bytes([0x03, 0x02, 0x0e, 0x00]) + rng.randrange(65536).to_bytes(2, 'little') + bytes(8) for _ in range(64))
+            else:
+                block = rng.randbytes(512)
+            output.write(block)
+            written += len(block)
+
+
+def write_random_pdf(path, size, rng):
+    """A PDF whose streams are already compressed, like most scanned or exported PDFs."""
+    with open(path, 'wb') as output:
+        output.write(b"%PDF-1.7\n1 0 obj\n<< /Filter /FlateDecode >>\nstream\n")
+        output.write(rng.randbytes(size))
+        output.write(b"\nendstream\nendobj\n%%EOF\n")
+
+
+def generate_mix(directory, seed):
+    rng = random.Random(seed)
+    files = []
+    for index in range(6):
+        path = os.path.join(directory, f"notes{index}.txt")
+        write_txt(path, rng.choice((500, 5000, 20000)), rng)
+        files.append(path)
+    for index in range(6):
+        path = os.path.join(directory, f"statement{index}.pdf")
+        write_pdf(path, rng.choice((2, 10, 40)), rng)
+        files.append(path)
+    for index in range(6):
+        path = os.path.join(directory, f"scan{index}.pdf")
+        write_random_pdf(path, rng.choice((200, 1000, 3000)) * 1024, rng)
+        files.append(path)
+    for extension in ('doc', 'xls', 'ppt'):
+        for index in range(3):
+            path = os.path.join(directory, f"legacy{index}.{extension}")
+            write_compound_file(path, rng.choice((100, 500, 2000)) * 1024, rng)
+            files.append(path)
+    return files
+
+
+def measure(data, encoding, level):
+    """Returns (stored bytes, compress CPU seconds, decompress CPU seconds) for one file."""
+    started = time.process_time()
+    reader = CompressingReader(io.BytesIO(data), encoding, level)
+    parts = []
+    while True:
+        part = reader.read(UPLOAD_PART_SIZE)
+        if not part:
+            break
+        parts.append(part)
+    compress_seconds = time.process_time() - started
+    stored = b''.join(parts)
+
+    started = time.process_time()
+    chunks = (stored[offset:offset + DOWNLOAD_CHUNK_SIZE] for offset in range(0, len(stored), DOWNLOAD_CHUNK_SIZE))
+    restored_size = sum(len(chunk) for chunk in decompress_chunks(chunks, encoding))
+    decompress_seconds = time.process_time() - started
+
+    if restored_size != len(data):
+        raise RuntimeError(f"{encoding} round trip lost data ({restored_size} != {len(data)} bytes)")
+    return len(stored), compress_seconds, decompress_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--codecs', default='zstd:1,zstd:3,zstd:9,gzip:1,gzip:6', help='Comma-separated encoding:level pairs.')
+    parser.add_argument('--sample-dir', default=None, help='Directory of real documents to measure instead of the generated mix.')
+    parser.add_argument('--min-saving', type=float, default=0.1, help='Same as STORAGE_COMPRESSION_MIN_SAVING.')
+    parser.add_argument('--pdf-min-saving', type=float, default=0.5, help='Same as STORAGE_COMPRESSION_PDF_MIN_SAVING.')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.sample_dir:
+        paths = [os.path.join(args.sample_dir, name) for name in sorted(os.listdir(args.sample_dir))]
+    else:
+        paths = generate_mix(tempfile.mkdtemp(prefix='compression-benchmark-'), args.seed)
+    documents = []
+    for path in paths:
+        file_type = path.rsplit('.', 1)[-1].lower()
+        if os.path.isfile(path) and file_type in COMPRESSIBLE_FILE_TYPES:
+            with open(path, 'rb') as document_file:
+                documents.append((file_type, document_file.read()))
+
+    total_mb = sum(len(data) for _, data in documents) / 1e6
+    print(f"{len(documents)} documents, {total_mb:.1f} MB")
+
+    app = Flask(__name__)
+    for codec in args.codecs.split(','):
+        encoding, level = codec.split(':')
+        app.config.update(STORAGE_COMPRESSION=encoding, STORAGE_COMPRESSION_LEVEL=int(level), STORAGE_COMPRESSION_MIN_SAVING=args.min_saving, STORAGE_COMPRESSION_PDF_MIN_SAVING=args.pdf_min_saving)
+
+        totals = {}
+        with app.app_context():
+            for file_type, data in documents:
+                total = totals.setdefault(file_type, {'files': 0, 'compressed': 0, 'original': 0, 'stored': 0, 'compressed_original': 0, 'compressed_stored': 0, 'compress': 0.0, 'decompress': 0.0})
+                total['files'] += 1
+                total['original'] += len(data)
+                # Files the sample check turns away are stored as-is and cost nothing on download
+                if not choose_encoding(io.BytesIO(data), file_type):
+                    total['stored'] += len(data)
+                    continue
+                stored_size, compress_seconds, decompress_seconds = measure(data, encoding, int(level))
+                total['compressed'] += 1
+                total['stored'] += stored_size
+                total['compressed_original'] += len(data)
+                total['compressed_stored'] += stored_size
+                total['compress'] += compress_seconds
+                total['decompress'] += decompress_seconds
+
+        print(f"\n{encoding} level {level}:")
+        # ratio: over the files that were compressed; saved: over every file of the type
+        print(f"  {'type':5} {'compressed':>10} {'ratio':>7} {'saved':>7} {'compress':>14} {'decompress':>16}")
+        for file_type, total in sorted(totals.items()) + [('all', {key: sum(t[key] for t in totals.values()) for key in next(iter(totals.values()))})]:
+            compressed_mb = total['compressed_original'] / 1e6 or float('inf')
+            ratio = total['compressed_original'] / total['compressed_stored'] if total['compressed_stored'] else 1.0
+            print(
+                f"  {file_type:5} {total['compressed']:>4}/{total['files']:<5} "
+                f"{ratio:6.2f}x {1 - total['stored'] / total['original']:6.1%} "
+                f"{total['compress'] * 1000 / compressed_mb:7.1f} ms CPU/MB {total['decompress'] * 1000 / compressed_mb:7.1f} ms CPU/MB"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Load test for /customer/login and /cpa/login against a running server.
+
+Fires --requests logins from --concurrency threads and reports throughput, latency
+percentiles and how many requests were shed with 503 by the password hashing pool.
+
+Example:
+    python benchmarks/login_benchmark.py --url http://localhost:5000/customer/login \
+        --email customer@example.com --password secret --requests 500 --concurrency 50
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def login(url, email, password):
+    body = json.dumps({"email": email, "password": password}).encode('utf-8')
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, TimeoutError):
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', required=True, help='Full login URL, e.g. http://localhost:5000/cpa/login')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda _: login(args.url, args.email, args.password), range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    ok_latencies = sorted(latency for status, latency in results if status == 200)
+
+    print(f"requests:    {args.requests} ({args.concurrency} concurrent) in {elapsed:.2f}s")
+    print(f"throughput:  {len(ok_latencies) / elapsed:.1f} successful logins/s")
+    print(f"statuses:    {', '.join(f'{status}={count}' for status, count in sorted(statuses.items()))}")
+    if ok_latencies:
+        print(f"latency ms:  p50={percentile(ok_latencies, 0.50) * 1000:.0f} "
+              f"p95={percentile(ok_latencies, 0.95) * 1000:.0f} "
+              f"p99={percentile(ok_latencies, 0.99) * 1000:.0f} "
+              f"mean={statistics.mean(ok_latencies) * 1000:.0f}")
+
+
+if __name__ == '__main__':
+    main()
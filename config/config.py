@@ -6,6 +6,25 @@ class Config:
     # Ensure these match your .env keys for the database
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI") 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool: recycle connections before MySQL's wait_timeout closes them and
+    # ping on checkout so a stale connection is replaced instead of failing the request
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "True").lower() in ('true', '1', 't'),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 280)),
+    }
+    # SQLite (local development) uses a single-connection pool without these options
+    if not (SQLALCHEMY_DATABASE_URI or '').startswith('sqlite'):
+        SQLALCHEMY_ENGINE_OPTIONS.update({
+            "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+            "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+            "connect_args": {"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 10))},
+        })
+    # Per-request query instrumentation (see lib/dbmetrics.py)
+    DB_SLOW_QUERY_MS = int(os.getenv("DB_SLOW_QUERY_MS", 200))
+    DB_QUERY_COUNT_WARN = int(os.getenv("DB_QUERY_COUNT_WARN", 30))
+    DB_METRICS_HEADERS = os.getenv("DB_METRICS_HEADERS", "False").lower() in ('true', '1', 't')
+    DB_METRICS_LOG_INTERVAL = int(os.getenv("DB_METRICS_LOG_INTERVAL", 60))
 
     # AWS S3 Configuration
     # These must match your .env keys
@@ -13,12 +32,97 @@ class Config:
     AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
     AWS_REGION = os.getenv("AWS_REGION")
     S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
+    # Shared S3 client tuning (one client and connection pool per worker process)
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+    S3_CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT", 5))
+    S3_READ_TIMEOUT = float(os.getenv("S3_READ_TIMEOUT", 60))
+    S3_RETRY_MODE = os.getenv("S3_RETRY_MODE", "standard")
+    S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", 3))
+    S3_TCP_KEEPALIVE = os.getenv("S3_TCP_KEEPALIVE", "True").lower() in ('true', '1', 't')
+    S3_WARMUP = os.getenv("S3_WARMUP", "False").lower() in ('true', '1', 't')
+    # Part size used when streaming uploads to S3 (bytes). S3 requires at least 5 MiB per part.
+    S3_UPLOAD_PART_SIZE = int(os.getenv("S3_UPLOAD_PART_SIZE", 8 * 1024 * 1024))
+    # Lifetime (seconds) of the presigned part URLs handed out for direct-to-S3 uploads
+    S3_PRESIGNED_UPLOAD_EXPIRES = int(os.getenv("S3_PRESIGNED_UPLOAD_EXPIRES", 3600))
+    # Seconds a direct-to-S3 upload may stay pending before `flask cleanup-direct-uploads` aborts it
+    DIRECT_UPLOAD_EXPIRES = int(os.getenv("DIRECT_UPLOAD_EXPIRES", 24 * 60 * 60))
+    # Batch uploads: how many files one request may carry and how many are sent to S3 at once
+    MAX_BATCH_UPLOAD_FILES = int(os.getenv("MAX_BATCH_UPLOAD_FILES", 50))
+    S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", 8))
+    # Seconds a resumable upload session stays open without receiving a chunk
+    RESUMABLE_UPLOAD_EXPIRES = int(os.getenv("RESUMABLE_UPLOAD_EXPIRES", 24 * 60 * 60))
+    # Storage quotas in bytes as uploaded (before compression at rest) for each customer and each
+    # business (0 = unlimited), checked on upload
+    CUSTOMER_STORAGE_QUOTA_BYTES = int(os.getenv("CUSTOMER_STORAGE_QUOTA_BYTES", 0))
+    BUSINESS_STORAGE_QUOTA_BYTES = int(os.getenv("BUSINESS_STORAGE_QUOTA_BYTES", 0))
+    # Upload content sniffing: how many leading bytes are checked against the claimed file type,
+    # and the limits past which archives (ratio, declared total size) and images (pixels) are rejected
+    UPLOAD_SNIFF_BYTES = int(os.getenv("UPLOAD_SNIFF_BYTES", 8 * 1024))
+    UPLOAD_MAX_COMPRESSION_RATIO = int(os.getenv("UPLOAD_MAX_COMPRESSION_RATIO", 200))
+    UPLOAD_MAX_EXPANDED_BYTES = int(os.getenv("UPLOAD_MAX_EXPANDED_BYTES", 1024 * 1024 * 1024))
+    UPLOAD_MAX_IMAGE_PIXELS = int(os.getenv("UPLOAD_MAX_IMAGE_PIXELS", 100 * 1000 * 1000))
+    # Compression at rest for txt/doc/xls/ppt and uncompressed PDFs: 'zstd', 'gzip' or 'none',
+    # the codec level, and the least fraction of a 64 KB sample that compressing must save
+    STORAGE_COMPRESSION = os.getenv("STORAGE_COMPRESSION", "zstd").lower()
+    STORAGE_COMPRESSION_LEVEL = int(os.getenv("STORAGE_COMPRESSION_LEVEL", 3))
+    STORAGE_COMPRESSION_MIN_SAVING = float(os.getenv("STORAGE_COMPRESSION_MIN_SAVING", 0.1))
+    # Compressed objects cannot serve Range requests, so PDFs (which viewers load progressively)
+    # are only compressed when the sample saves at least this fraction
+    STORAGE_COMPRESSION_PDF_MIN_SAVING = float(os.getenv("STORAGE_COMPRESSION_PDF_MIN_SAVING", 0.5))
+    # Document previews (made by the background jobs): longest side in pixels, 'WEBP' or 'JPEG',
+    # encoder quality and the browser cache lifetime (seconds) of the preview responses
+    PREVIEW_MAX_SIZE = int(os.getenv("PREVIEW_MAX_SIZE", 320))
+    PREVIEW_FORMAT = os.getenv("PREVIEW_FORMAT", "WEBP").upper()
+    PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", 75))
+    PREVIEW_CACHE_MAX_AGE = int(os.getenv("PREVIEW_CACHE_MAX_AGE", 365 * 24 * 60 * 60))
+    # Most characters of extracted text stored per document for content search; extraction stops there
+    TEXT_INDEX_MAX_CHARS = int(os.getenv("TEXT_INDEX_MAX_CHARS", 1000000))
+    # Chunk size (bytes) used when relaying S3 downloads to the client
+    S3_DOWNLOAD_CHUNK_SIZE = int(os.getenv("S3_DOWNLOAD_CHUNK_SIZE", 64 * 1024))
+    # Download mode: 'stream' relays bytes through the app, 'presigned' returns a signed S3 URL,
+    # 'redirect' sends a 302 to it. Signed URLs are cached until PRESIGNED_URL_CACHE_MARGIN seconds before expiry.
+    DOWNLOAD_MODE = os.getenv("DOWNLOAD_MODE", "stream")
+    PRESIGNED_DOWNLOAD_EXPIRES = int(os.getenv("PRESIGNED_DOWNLOAD_EXPIRES", 300))
+    PRESIGNED_URL_CACHE_MARGIN = int(os.getenv("PRESIGNED_URL_CACHE_MARGIN", 60))
+    # How many S3 objects the ZIP export requests ahead of the one being streamed
+    ZIP_PREFETCH_DEPTH = int(os.getenv("ZIP_PREFETCH_DEPTH", 4))
+    # Where new documents are stored: 's3' or 'local'. Existing documents are read from the
+    # backend named in their document_path, so LOCAL_STORAGE_ROOT must stay set while local files exist.
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3")
+    LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT")
+
+    # Bulk customer import: rows inserted per statement/commit and rows accepted per CSV file
+    CUSTOMER_IMPORT_BATCH_SIZE = int(os.getenv("CUSTOMER_IMPORT_BATCH_SIZE", 500))
+    CUSTOMER_IMPORT_MAX_ROWS = int(os.getenv("CUSTOMER_IMPORT_MAX_ROWS", 10000))
+    # Password hashing runs on a process pool per worker (total processes = app workers x PASSWORD_HASH_WORKERS).
+    # PASSWORD_HASH_METHOD is a werkzeug method string; hashes made with other settings are upgraded at login.
+    # More than PASSWORD_HASH_QUEUE_LIMIT jobs in flight, or one waiting longer than PASSWORD_HASH_TIMEOUT
+    # seconds, is answered with 503 and Retry-After: PASSWORD_HASH_RETRY_AFTER.
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 32))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+    PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 2))
+    # Passwords for credentials emails are hashed in batches on a separate pool of PASSWORD_HASH_BULK_WORKERS processes
+    PASSWORD_HASH_BULK_WORKERS = int(os.getenv("PASSWORD_HASH_BULK_WORKERS", 1))
 
     # Flask-JWT-Extended Configuration
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY") # This is crucial for JWT
+    # Seconds an authenticated account's ids stay cached per worker before being re-checked
+    # against the database (also the longest a soft-deleted customer stays usable in other workers)
+    IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", 60))
     # Other JWT settings if you have them, e.g., token expiry
     # JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
 
+    # Background jobs (`flask run-jobs`): worker processes, idle poll interval (seconds), how long a
+    # claimed job may run before another worker retries it, and retry backoff / attempts
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', os.cpu_count() or 1))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1))
+    JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', 300))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+    JOB_BACKOFF_SECONDS = int(os.getenv('JOB_BACKOFF_SECONDS', 10))
+    JOB_MAX_BACKOFF_SECONDS = int(os.getenv('JOB_MAX_BACKOFF_SECONDS', 3600))
+
     # Flask Mail (if you're using it)
     MAIL_SERVER = os.getenv('MAIL_SERVER')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
@@ -26,6 +130,15 @@ class Config:
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER')
+    # Email outbox worker: messages per SMTP connection, idle poll interval (seconds), how long
+    # a claimed batch stays locked, and retry backoff (doubling from BACKOFF up to MAX_BACKOFF)
+    # until MAX_ATTEMPTS failures move a message to the dead letters
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+    EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', 2))
+    EMAIL_OUTBOX_LOCK_SECONDS = int(os.getenv('EMAIL_OUTBOX_LOCK_SECONDS', 300))
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+    EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', 30))
+    EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600))
 
     # Flask CORS (if you need specific origins)
     # CORS_ORIGINS = os.getenv("CORS_ORIGINS").split(',') if os.getenv("CORS_ORIGINS") else ["*"]
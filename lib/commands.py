@@ -0,0 +1,114 @@
+import click
+
+
+def register_commands(app):
+    """
+    Registers the maintenance commands on the Flask CLI (run them with `flask <command>`).
+    """
+
+    @app.cli.command('cleanup-upload-sessions')
+    def cleanup_upload_sessions():
+        """Abort expired resumable upload sessions and delete their stored parts."""
+        from routes.customer.customer_upload_session import expire_upload_sessions
+
+        expired_count = expire_upload_sessions()
+        click.echo(f"Expired {expired_count} upload session(s).")
+
+    @app.cli.command('cleanup-direct-uploads')
+    def cleanup_direct_uploads():
+        """Abort expired direct-to-S3 uploads and delete their uploaded parts."""
+        from routes.customer.customer_document import expire_direct_uploads
+
+        expired_count = expire_direct_uploads()
+        click.echo(f"Expired {expired_count} direct upload(s).")
+
+    @app.cli.command('explain-queries')
+    @click.option('--customer-guid', default=None, help='Customer whose ids are used in the queries (defaults to the first customer).')
+    @click.option('--fail-on-scan', is_flag=True, help='Exit with status 1 if any query plan contains a full table scan.')
+    def explain_queries(customer_guid, fail_on_scan):
+        """Print the EXPLAIN plan of each hot route query and flag full table scans."""
+        from models import Customer, CustomerDocument
+        from lib.explain import hot_queries, explain_query, is_full_scan
+
+        customer_query = Customer.query
+        if customer_guid:
+            customer_query = customer_query.filter_by(guid=customer_guid)
+        customer = customer_query.order_by(Customer.id).first()
+        if not customer:
+            raise click.ClickException("No customer found to build the sample queries from.")
+
+        document = CustomerDocument.query.filter_by(customer_id=customer.id).order_by(CustomerDocument.id).first()
+        document_guid = document.guid if document else '00000000-0000-0000-0000-000000000000'
+
+        scans = []
+        for name, query in hot_queries(customer.business_id, customer.id, document_guid).items():
+            plan = explain_query(query)
+            full_scan = is_full_scan(plan)
+            if full_scan:
+                scans.append(name)
+
+            click.echo(f"== {name}{' (FULL SCAN)' if full_scan else ''}")
+            for row in plan:
+                click.echo("   " + ", ".join(f"{key}={value}" for key, value in row.items()))
+
+        if scans:
+            click.echo(f"Full table scans in: {', '.join(scans)}")
+            if fail_on_scan:
+                raise SystemExit(1)
+        else:
+            click.echo("All queries use an index.")
+
+    @app.cli.command('reconcile-counters')
+    @click.option('--business-id', type=int, default=None, help='Only rebuild the counters of this business.')
+    def reconcile_counters_command(business_id):
+        """Rebuild the usage counters from the customers and customer_documents tables."""
+        from lib.counters import reconcile_counters
+
+        row_count = reconcile_counters(business_id)
+        click.echo(f"Rebuilt {row_count} counter row(s).")
+
+    @app.cli.command('send-emails')
+    @click.option('--once', is_flag=True, help='Exit once the outbox has nothing due instead of polling.')
+    @click.option('--batch-size', type=int, default=None, help='Messages sent per SMTP connection (defaults to EMAIL_OUTBOX_BATCH_SIZE).')
+    def send_emails(once, batch_size):
+        """Deliver queued outbox emails over reused SMTP connections."""
+        from lib.outbox import run_worker
+
+        sent_count = run_worker(
+            batch_size or app.config['EMAIL_OUTBOX_BATCH_SIZE'],
+            app.config['EMAIL_OUTBOX_POLL_INTERVAL'],
+            once=once
+        )
+        click.echo(f"Processed {sent_count} email(s).")
+
+    @app.cli.command('requeue-emails')
+    @click.option('--limit', type=int, default=None, help='Requeue at most this many dead messages.')
+    def requeue_emails(limit):
+        """Move dead-lettered outbox emails back to pending."""
+        from lib.outbox import requeue_dead
+
+        requeued_count = requeue_dead(limit)
+        click.echo(f"Requeued {requeued_count} email(s).")
+
+    @app.cli.command('run-jobs')
+    @click.option('--processes', type=int, default=None, help='Worker processes (defaults to JOB_WORKERS); 0 runs jobs in this process.')
+    @click.option('--once', is_flag=True, help='Exit once no job is due instead of polling.')
+    def run_jobs(processes, once):
+        """Run queued background jobs on a pool of worker processes."""
+        from lib.jobs import run_worker
+
+        processed_count = run_worker(
+            app.config['JOB_WORKERS'] if processes is None else processes,
+            app.config['JOB_POLL_INTERVAL'],
+            once=once
+        )
+        click.echo(f"Ran {processed_count} job(s).")
+
+    @app.cli.command('retry-failed-jobs')
+    @click.option('--kind', default=None, help="Only retry jobs of this kind, e.g. 'document.process'.")
+    def retry_failed_jobs_command(kind):
+        """Queue failed jobs again with fresh attempts."""
+        from lib.jobs import retry_failed_jobs
+
+        retried_count = retry_failed_jobs(kind)
+        click.echo(f"Queued {retried_count} failed job(s) again.")
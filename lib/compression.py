@@ -0,0 +1,149 @@
+import gzip
+import zlib
+
+import zstandard
+from flask import current_app
+
+# Formats stored byte-for-byte by their own applications; the others (docx, png, ...) are already compressed
+COMPRESSIBLE_FILE_TYPES = {'txt', 'doc', 'xls', 'ppt', 'pdf'}
+
+# Object key suffix per Content-Encoding, so every document sharing an object can tell how it was stored
+ENCODING_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Bytes compressed up front to decide whether a file is worth compressing (e.g. a PDF whose
+# content streams are already deflated is not)
+SAMPLE_SIZE = 64 * 1024
+READ_SIZE = 1024 * 1024
+# Most decompressed bytes produced per step, however well the stored data compressed
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def _compressor(encoding, level):
+    if encoding == 'gzip':
+        return zlib.compressobj(level, zlib.DEFLATED, 31) # wbits 31: gzip container
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+class CompressingReader:
+    """
+    File-like wrapper that compresses another stream as it is read, so a storage backend can
+    upload the compressed bytes part by part without ever holding the whole file.
+    """
+
+    def __init__(self, stream, encoding, level, read_size=READ_SIZE):
+        self._stream = stream
+        self._compressor = _compressor(encoding, level)
+        self._read_size = read_size
+        self._buffer = bytearray()
+        self._finished = False
+        # Uncompressed bytes consumed so far
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        while not self._finished and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = self._stream.read(self._read_size)
+            if chunk:
+                self.bytes_read += len(chunk)
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._finished = True
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+class _ChunkReader:
+    """Minimal file-like view of an iterator of byte chunks, for the streaming decompressors."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _decoded_chunks(chunks, encoding, chunk_size):
+    raw = _ChunkReader(chunks)
+    if encoding == 'gzip':
+        reader = gzip.GzipFile(fileobj=raw, mode='rb')
+    elif encoding == 'zstd':
+        reader = zstandard.ZstdDecompressor().stream_reader(raw)
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+
+    with reader:
+        while True:
+            data = reader.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+
+def decompress_chunks(chunks, encoding, chunk_size=DECODE_CHUNK_SIZE):
+    """
+    Returns an iterator over the original bytes of a stored object given its stored chunks.
+    Output comes in pieces of at most `chunk_size`, so a highly compressed object never
+    expands in memory all at once. Objects stored as-is (no encoding) pass straight through.
+    """
+    if not encoding:
+        return chunks
+    return _decoded_chunks(chunks, encoding, chunk_size)
+
+
+def encoding_for_path(document_path):
+    """
+    Returns the content encoding of a stored object from its key suffix, or None.
+    """
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        if document_path.endswith(suffix):
+            return encoding
+    return None
+
+
+def choose_encoding(stream, file_type):
+    """
+    Returns the STORAGE_COMPRESSION encoding to store an upload with, or None to store it as-is.
+
+    Only COMPRESSIBLE_FILE_TYPES qualify, and only when compressing their first SAMPLE_SIZE
+    bytes saves at least STORAGE_COMPRESSION_MIN_SAVING; that keeps PDFs that are already
+    compressed inside (most of them) byte-for-byte. PDFs must save the larger
+    STORAGE_COMPRESSION_PDF_MIN_SAVING, because a compressed PDF loses Range requests and with
+    them progressive loading in viewers. The stream must be seekable; it is rewound.
+    """
+    encoding = current_app.config['STORAGE_COMPRESSION']
+    if encoding not in ENCODING_SUFFIXES or file_type not in COMPRESSIBLE_FILE_TYPES:
+        return None
+
+    sample = stream.read(SAMPLE_SIZE)
+    stream.seek(0)
+    if not sample:
+        return None
+
+    min_saving = current_app.config['STORAGE_COMPRESSION_PDF_MIN_SAVING' if file_type == 'pdf' else 'STORAGE_COMPRESSION_MIN_SAVING']
+    compressor = _compressor(encoding, current_app.config['STORAGE_COMPRESSION_LEVEL'])
+    compressed_size = len(compressor.compress(sample)) + len(compressor.flush())
+    if compressed_size > len(sample) * (1 - min_saving):
+        return None
+    return encoding
+
+
+def compressed_stream(stream, encoding):
+    """
+    Wraps an upload stream so it is compressed with `encoding` at STORAGE_COMPRESSION_LEVEL as it is stored.
+    """
+    return CompressingReader(stream, encoding, current_app.config['STORAGE_COMPRESSION_LEVEL'])
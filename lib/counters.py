@@ -0,0 +1,173 @@
+from datetime import datetime
+
+from sqlalchemy import update, insert, delete, func, case
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Customer, CustomerDocument, UsageCounter
+
+
+def _adjust(business_id, customer_id, deltas):
+    """
+    Adds `deltas` ({column: amount}) to one counter row inside the current transaction,
+    creating the row on first use.
+    """
+    deltas = {column: amount for column, amount in deltas.items() if amount}
+    if not deltas:
+        return
+
+    statement = update(UsageCounter).where(
+        UsageCounter.business_id == business_id,
+        UsageCounter.customer_id == customer_id
+    ).values(
+        updated_at=datetime.utcnow(),
+        **{column: getattr(UsageCounter, column) + amount for column, amount in deltas.items()}
+    ).execution_options(synchronize_session=False)
+
+    if db.session.execute(statement).rowcount:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(UsageCounter(business_id=business_id, customer_id=customer_id, **deltas))
+    except IntegrityError:
+        # Another transaction created the row in the meantime
+        db.session.execute(statement)
+
+
+def adjust_document_counters(business_id, customer_id, documents=0, unverified=0, total_bytes=0):
+    """
+    Applies document count, unverified count and byte deltas to both the customer's row
+    and the business row. Call it before committing the change being counted.
+    """
+    deltas = {'document_count': documents, 'unverified_count': unverified, 'total_bytes': total_bytes}
+    # Always customer row first, then business row, so concurrent transactions lock in the same order
+    _adjust(business_id, customer_id, deltas)
+    _adjust(business_id, UsageCounter.BUSINESS_ROW, deltas)
+
+
+def uploaded_bytes(document):
+    """
+    Returns the size of a document as uploaded, before any compression at rest. Usage and
+    the storage quotas are counted in these bytes, since that is what an upload can be
+    checked against while it is still arriving.
+    """
+    return document.original_size if document.content_encoding else document.file_size
+
+
+def document_added(document):
+    """
+    Counts a document that became active (uploaded, or a direct upload completed).
+    """
+    adjust_document_counters(
+        document.business_id,
+        document.customer_id,
+        documents=1,
+        unverified=0 if document.verified_status else 1,
+        total_bytes=uploaded_bytes(document)
+    )
+
+
+def document_removed(document):
+    """
+    Uncounts an active document that is being soft-deleted.
+    """
+    adjust_document_counters(
+        document.business_id,
+        document.customer_id,
+        documents=-1,
+        unverified=0 if document.verified_status else -1,
+        total_bytes=-uploaded_bytes(document)
+    )
+
+
+def adjust_customer_count(business_id, amount):
+    """
+    Adds `amount` to the number of live customers of a business.
+    """
+    _adjust(business_id, UsageCounter.BUSINESS_ROW, {'customer_count': amount})
+
+
+def get_counters(business_id, customer_id=UsageCounter.BUSINESS_ROW):
+    """
+    Returns the counter row for a business (or one of its customers). When nothing has been
+    counted yet an unsaved all-zero row is returned.
+    """
+    counters = UsageCounter.query.filter_by(business_id=business_id, customer_id=customer_id).first()
+    if counters is None:
+        counters = UsageCounter(
+            business_id=business_id,
+            customer_id=customer_id,
+            customer_count=0,
+            document_count=0,
+            unverified_count=0,
+            total_bytes=0
+        )
+    return counters
+
+
+def reconcile_counters(business_id=None):
+    """
+    Rebuilds the counters from customer_documents and customers, for one business or all
+    of them, and returns the number of counter rows written. Changes committed while this
+    runs can be missed, so run it when traffic is low.
+    """
+    documents_query = db.session.query(
+        CustomerDocument.business_id,
+        CustomerDocument.customer_id,
+        func.count(CustomerDocument.id),
+        func.sum(case((CustomerDocument.verified_status == False, 1), else_=0)),
+        func.sum(case(
+            (CustomerDocument.content_encoding.isnot(None), CustomerDocument.original_size),
+            else_=CustomerDocument.file_size
+        ))
+    ).filter(
+        CustomerDocument.status == 'active',
+        CustomerDocument.deleted == 0
+    ).group_by(CustomerDocument.business_id, CustomerDocument.customer_id)
+
+    customers_query = db.session.query(
+        Customer.business_id,
+        func.count(Customer.id)
+    ).filter(Customer.deleted == 0).group_by(Customer.business_id)
+
+    clear_statement = delete(UsageCounter)
+    if business_id is not None:
+        documents_query = documents_query.filter(CustomerDocument.business_id == business_id)
+        customers_query = customers_query.filter(Customer.business_id == business_id)
+        clear_statement = clear_statement.where(UsageCounter.business_id == business_id)
+
+    rows = {}
+
+    def row_for(row_business_id, row_customer_id):
+        key = (row_business_id, row_customer_id)
+        if key not in rows:
+            rows[key] = {
+                'business_id': row_business_id,
+                'customer_id': row_customer_id,
+                'customer_count': 0,
+                'document_count': 0,
+                'unverified_count': 0,
+                'total_bytes': 0,
+                'updated_at': datetime.utcnow()
+            }
+        return rows[key]
+
+    for row_business_id, row_customer_id, document_count, unverified_count, total_bytes in documents_query:
+        for row in (row_for(row_business_id, row_customer_id), row_for(row_business_id, UsageCounter.BUSINESS_ROW)):
+            row['document_count'] += document_count
+            row['unverified_count'] += int(unverified_count or 0)
+            row['total_bytes'] += int(total_bytes or 0)
+
+    for row_business_id, customer_count in customers_query:
+        row_for(row_business_id, UsageCounter.BUSINESS_ROW)['customer_count'] = customer_count
+
+    try:
+        db.session.execute(clear_statement)
+        if rows:
+            db.session.execute(insert(UsageCounter), list(rows.values()))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(rows)
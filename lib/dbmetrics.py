@@ -0,0 +1,121 @@
+import threading
+import time
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from lib.s3 import s3_pool_stats
+
+_lock = threading.Lock()
+# {endpoint: {'requests', 'queries', 'db_time', 'max_queries', 'slow_queries'}} since the last flush
+_endpoint_stats = {}
+_last_flush = time.monotonic()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_times', []).append(time.perf_counter())
+    if context is not None:
+        context._query_timed = True
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start_times'].pop()
+    if context is not None:
+        context._query_timed = False
+    if not has_request_context() or 'db_query_count' not in g:
+        return
+
+    duration = time.perf_counter() - started
+    g.db_query_count += 1
+    g.db_time += duration
+    if duration * 1000 >= g.db_slow_query_ms:
+        g.db_slow_queries.append((duration, statement))
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute never runs for a failed statement, so drop its start time here
+    # instead of leaving it on the pooled connection
+    conn = exception_context.connection
+    context = exception_context.execution_context
+    # Errors raised before the statement was sent, or after it finished, have nothing to pop
+    if conn is not None and getattr(context, '_query_timed', False) and conn.info.get('query_start_times'):
+        conn.info['query_start_times'].pop()
+
+
+def init_query_metrics(app):
+    """
+    Records the number of queries, total database time and slow statements of every request.
+
+    In debug mode (or with DB_METRICS_HEADERS) they are returned as X-DB-* response headers.
+    Otherwise they are aggregated per endpoint and written to the log every
+    DB_METRICS_LOG_INTERVAL seconds, together with the S3 connection pool counters.
+    Requests running more than DB_QUERY_COUNT_WARN queries (the usual sign of an N+1 loop)
+    and statements slower than DB_SLOW_QUERY_MS are logged right away.
+    """
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def start_query_metrics():
+        g.db_query_count = 0
+        g.db_time = 0.0
+        g.db_slow_queries = []
+        g.db_slow_query_ms = app.config['DB_SLOW_QUERY_MS']
+
+    @app.after_request
+    def report_query_metrics(response):
+        if 'db_query_count' not in g:
+            return response
+
+        endpoint = request.endpoint or request.path
+        for duration, statement in g.db_slow_queries:
+            app.logger.warning(f"Slow query ({duration * 1000:.0f} ms) in {endpoint}: {' '.join(statement.split())[:500]}")
+        if g.db_query_count > app.config['DB_QUERY_COUNT_WARN']:
+            app.logger.warning(f"{endpoint} ran {g.db_query_count} queries in one request (possible N+1)")
+
+        if app.debug or app.config['DB_METRICS_HEADERS']:
+            response.headers['X-DB-Query-Count'] = str(g.db_query_count)
+            response.headers['X-DB-Time-Ms'] = f"{g.db_time * 1000:.1f}"
+            response.headers['X-DB-Slow-Queries'] = str(len(g.db_slow_queries))
+        else:
+            record_request(app, endpoint, g.db_query_count, g.db_time, len(g.db_slow_queries))
+
+        return response
+
+
+def record_request(app, endpoint, query_count, db_time, slow_queries):
+    """
+    Adds one request to the per-endpoint aggregates and flushes them to the log when due.
+    """
+    global _last_flush
+    with _lock:
+        stats = _endpoint_stats.setdefault(endpoint, {'requests': 0, 'queries': 0, 'db_time': 0.0, 'max_queries': 0, 'slow_queries': 0})
+        stats['requests'] += 1
+        stats['queries'] += query_count
+        stats['db_time'] += db_time
+        stats['max_queries'] = max(stats['max_queries'], query_count)
+        stats['slow_queries'] += slow_queries
+
+        now = time.monotonic()
+        if now - _last_flush < app.config['DB_METRICS_LOG_INTERVAL']:
+            return
+        snapshot = dict(_endpoint_stats)
+        _endpoint_stats.clear()
+        _last_flush = now
+
+    for endpoint_name, stats in sorted(snapshot.items()):
+        app.logger.info(
+            f"db metrics {endpoint_name}: requests={stats['requests']} "
+            f"avg_queries={stats['queries'] / stats['requests']:.1f} max_queries={stats['max_queries']} "
+            f"avg_db_ms={stats['db_time'] * 1000 / stats['requests']:.1f} slow_queries={stats['slow_queries']}"
+        )
+
+    pool = s3_pool_stats()
+    if pool['requests']:
+        # Counted since the worker started; reused_connections should grow with requests
+        app.logger.info(
+            f"s3 pool: requests={pool['requests']} new_connections={pool['new_connections']} "
+            f"reused_connections={pool['reused_connections']}"
+        )
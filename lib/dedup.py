@@ -0,0 +1,86 @@
+import hashlib
+
+from models import db, DocumentBlob
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_stream(stream, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Computes the SHA-256 and size of a seekable stream in fixed-size chunks,
+    then rewinds it so it can be uploaded afterwards.
+    Returns (hex_digest, size_in_bytes).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+
+def find_blobs(business_id, content_hashes, lock=True):
+    """
+    Returns {content_hash: DocumentBlob} for the hashes already stored for a business.
+    By default the rows are locked so concurrent reference count updates do not race.
+    """
+    content_hashes = set(content_hashes)
+    if not content_hashes:
+        return {}
+    query = DocumentBlob.query.filter(
+        DocumentBlob.business_id == business_id,
+        DocumentBlob.content_hash.in_(content_hashes)
+    )
+    if lock:
+        query = query.with_for_update()
+    return {blob.content_hash: blob for blob in query.all()}
+
+
+def acquire_blob(business_id, content_hash):
+    """
+    Adds a reference to an existing blob and returns it, or returns None if the
+    content has not been stored for this business yet.
+    """
+    blob = find_blobs(business_id, [content_hash]).get(content_hash)
+    if blob:
+        blob.ref_count += 1
+    return blob
+
+
+def register_blob(business_id, content_hash, document_path, file_size, ref_count=1):
+    """
+    Records a newly uploaded object as the blob for its content hash.
+    Flushes immediately so a concurrent upload of the same content surfaces as an IntegrityError here.
+    """
+    blob = DocumentBlob(
+        business_id=business_id,
+        content_hash=content_hash,
+        document_path=document_path,
+        file_size=file_size,
+        ref_count=ref_count
+    )
+    db.session.add(blob)
+    db.session.flush()
+    return blob
+
+
+def release_blob(business_id, content_hash):
+    """
+    Drops one reference to a blob. When the last reference is gone the blob row is
+    deleted and its document_path is returned so the caller can remove the stored
+    object once the transaction has been committed. Returns None otherwise.
+    """
+    blob = find_blobs(business_id, [content_hash]).get(content_hash)
+    if not blob:
+        return None
+
+    blob.ref_count -= 1
+    if blob.ref_count > 0:
+        return None
+
+    db.session.delete(blob)
+    return blob.document_path
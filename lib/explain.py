@@ -0,0 +1,74 @@
+from models import db, Customer, CustomerDocument
+
+# Plan fragments that mean a table is read without an index, per database dialect
+FULL_SCAN_MARKERS = {
+    'postgresql': ('Seq Scan',),
+}
+
+
+def hot_queries(business_id, customer_id, document_guid):
+    """
+    Returns {name: query} for the queries behind the busiest routes, built the same way
+    the routes build them. Keep these in step with the routes when their filters change.
+    """
+    return {
+        # GET /customer/document-list
+        'document_list': CustomerDocument.query.filter_by(
+            customer_id=customer_id,
+            business_id=business_id,
+            status='active',
+            deleted=0
+        ).order_by(CustomerDocument.created_at, CustomerDocument.id).limit(10),
+        # GET /customer/document-download/<guid> (and the delete route)
+        'document_download': CustomerDocument.query.filter_by(
+            guid=document_guid,
+            customer_id=customer_id,
+            business_id=business_id,
+            status='active',
+            deleted=0
+        ).limit(1),
+        # GET /cpa/customer-documents-zip/<guid>
+        'documents_zip': CustomerDocument.query.filter_by(
+            customer_id=customer_id,
+            business_id=business_id,
+            status='active',
+            deleted=0
+        ).order_by(CustomerDocument.created_at, CustomerDocument.id),
+        # GET /cpa/customer-list
+        'customer_list': Customer.query.filter_by(
+            business_id=business_id,
+            deleted=0
+        ).order_by(Customer.created_at, Customer.id).limit(10),
+    }
+
+
+def explain_query(query):
+    """
+    Runs the database's EXPLAIN on a query and returns the plan as a list of row dicts.
+    """
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN' if dialect.name == 'sqlite' else 'EXPLAIN'
+    result = db.session.execute(db.text(f"{prefix} {sql}"))
+    return [dict(row._mapping) for row in result]
+
+
+def is_full_scan(plan):
+    """
+    Returns True when a plan reads a table without using an index.
+    """
+    dialect_name = db.engine.dialect.name
+    for row in plan:
+        if dialect_name == 'mysql':
+            # access type ALL is a full table scan
+            if str(row.get('type', '')).upper() == 'ALL':
+                return True
+        elif dialect_name == 'sqlite':
+            detail = str(row.get('detail', ''))
+            if detail.startswith('SCAN') and 'USING' not in detail:
+                return True
+        else:
+            line = ' '.join(str(value) for value in row.values())
+            if any(marker in line for marker in FULL_SCAN_MARKERS.get(dialect_name, ())):
+                return True
+    return False
@@ -1,8 +1,8 @@
 import random
 import string
+import unicodedata
+from urllib.parse import quote
 from flask import Blueprint, request, jsonify, current_app, render_template 
-from flask_mail import  Message
-from datetime import datetime # To get the current year for the template
 
 def generate_random_string(length=8):
     """Generates a random string of specified length using alphanumeric characters."""
@@ -11,41 +11,13 @@ def generate_random_string(length=8):
     return random_string
 
 
-def sendCustomerCredentialsEmail(recipient,password):
-    
-    try:
-        subject = 'Welcome to CPA Application - Your Account Credentials'
-
-        msg = Message(
-                subject=subject,
-                recipients=[recipient]
-            )
-
-        plain_body_content = render_template(
-            'email/customer_credential_plain.txt',
-            recipient_email=recipient,
-            user_password=password,
-            current_year=datetime.now().year
-        )
-        
-        # --- Render the HTML email from template ---
-        html_body_content = render_template(
-            'email/customer_credential_html.html',
-            recipient_email=recipient,
-            user_password=password,
-            current_year=datetime.now().year
-        )
-        
-        msg.body = plain_body_content
-        msg.html = html_body_content
-        
-            
-        mail_instance = current_app.extensions.get('mail') 
-
-            
-        mail_instance.send(msg)
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email to {recipient}: {e}", exc_info=True)
-        return False
-    
+def content_disposition(disposition, filename):
+    """
+    Builds a Content-Disposition header value that is safe for any filename.
+    Names that are not plain ASCII get an ASCII fallback plus an RFC 5987 filename* parameter.
+    """
+    ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    ascii_name = ascii_name.replace('\\', '').replace('"', '')
+    if ascii_name == filename:
+        return f'{disposition}; filename="{ascii_name}"'
+    return f"{disposition}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename, safe='!#$&+^`|~')}"
@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+from flask import current_app
+from flask_jwt_extended import get_jwt, get_jwt_identity
+
+from models import db, Customer, User
+from lib.cache import TTLCache
+
+# The ids an authenticated request needs to scope its queries
+Identity = namedtuple('Identity', ['id', 'guid', 'business_id'])
+
+# Active identities per (user_type, guid). Per worker process, so a soft-delete made in
+# another worker is only seen here once the entry expires (IDENTITY_CACHE_TTL seconds).
+identity_cache = TTLCache(maxsize=10000)
+
+IDENTITY_MODELS = {
+    'customer': (Customer, 'customer_id'),
+    'cpa': (User, 'user_id'),
+}
+
+
+def identity_claims(user_type, account):
+    """
+    Returns the additional JWT claims issued at login, so later requests can load the
+    account by its numeric id instead of looking its GUID up again.
+    """
+    _, id_claim = IDENTITY_MODELS[user_type]
+    return {"user_type": user_type, id_claim: account.id}
+
+
+def resolve_identity(user_type):
+    """
+    Returns the Identity of the authenticated account, or None when it does not exist,
+    has been soft-deleted, or the token belongs to another kind of account.
+
+    Resolution order: the identity cache, then the signed claims (checked with a single
+    primary-key lookup), then a GUID lookup for tokens issued before the claims existed.
+    """
+    model, id_claim = IDENTITY_MODELS[user_type]
+    claims = get_jwt()
+    if claims.get('user_type', user_type) != user_type:
+        return None
+
+    guid = get_jwt_identity()
+    cache_key = (user_type, guid)
+    identity = identity_cache.get(cache_key)
+    if identity is not None:
+        return identity
+
+    if id_claim in claims:
+        row = db.session.query(model.id, model.guid, model.business_id, model.deleted) \
+            .filter(model.id == claims[id_claim]).first()
+        if row is None or row.guid != guid or row.deleted:
+            return None
+    else:
+        row = db.session.query(model.id, model.business_id) \
+            .filter(model.guid == guid, model.deleted == 0).first()
+        if row is None:
+            return None
+
+    identity = Identity(id=row.id, guid=guid, business_id=row.business_id)
+    identity_cache.set(cache_key, identity, ttl=current_app.config['IDENTITY_CACHE_TTL'])
+    return identity
+
+
+def current_customer():
+    """
+    Returns the Identity of the authenticated customer, or None.
+    """
+    return resolve_identity('customer')
+
+
+def current_cpa_user():
+    """
+    Returns the Identity of the authenticated CPA user, or None.
+    """
+    return resolve_identity('cpa')
+
+
+def invalidate_identity(user_type, guid):
+    """
+    Drops a cached identity, e.g. right after the account was soft-deleted.
+    """
+    identity_cache.pop((user_type, guid))
@@ -0,0 +1,245 @@
+import importlib
+import json
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, and_
+
+from models import db, Job
+
+# Modules whose @job_handler functions the worker processes register
+HANDLER_MODULES = ('lib.processing', 'lib.previews', 'lib.textindex')
+
+HANDLERS = {}
+
+# The app inside each worker process (set by _init_worker_process)
+_worker_app = None
+
+
+def job_handler(kind):
+    """
+    Registers a function as the handler for jobs of `kind`. It is called with the job's
+    payload dict inside an app context.
+
+    Jobs run at least once, not exactly once: a job whose worker dies or outlives
+    JOB_VISIBILITY_TIMEOUT is run again. Handlers must therefore be idempotent, e.g. skip
+    work that is already done and overwrite their results instead of appending.
+    """
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def load_handlers():
+    for module_name in HANDLER_MODULES:
+        importlib.import_module(module_name)
+
+
+def enqueue(kind, payload=None, delay=0, max_attempts=None):
+    """
+    Adds a job to the current transaction and returns it.
+
+    The job becomes visible to the worker when the caller commits, so it never runs for
+    a change that was rolled back, and it is never lost for a change that was committed.
+    """
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    return job
+
+
+def claim_jobs(limit):
+    """
+    Claims up to `limit` due jobs and commits the claim. Returns [(job id, lock token)].
+
+    A claim lasts JOB_VISIBILITY_TIMEOUT seconds. Running jobs whose claim ran out (the
+    worker died or hung) are claimed again; rows locked by another worker are skipped.
+    """
+    now = datetime.utcnow()
+    jobs = Job.query.filter(or_(
+        and_(Job.status == 'queued', Job.run_at <= now),
+        and_(Job.status == 'running', Job.locked_until < now)
+    )).order_by(Job.run_at, Job.id).limit(limit).with_for_update(skip_locked=True).all()
+
+    locked_until = now + timedelta(seconds=current_app.config['JOB_VISIBILITY_TIMEOUT'])
+    claimed = []
+    for job in jobs:
+        if job.status == 'running':
+            current_app.logger.warning(f"Job {job.guid} ({job.kind}) outlived its visibility timeout")
+            if job.attempts >= job.max_attempts:
+                _record_failure(job, 'Visibility timeout expired on the last attempt')
+                continue
+
+        job.status = 'running'
+        job.attempts += 1
+        job.locked_until = locked_until
+        job.lock_token = str(uuid.uuid4())
+        claimed.append((job.id, job.lock_token))
+
+    db.session.commit()
+    return claimed
+
+
+def _record_failure(job, error):
+    """
+    Schedules a retry with exponential backoff, or marks the job failed once it has used
+    all of its attempts.
+    """
+    config = current_app.config
+    job.locked_until = None
+    job.lock_token = None
+    job.last_error = str(error)[:500]
+    if job.attempts >= job.max_attempts:
+        job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+        current_app.logger.error(f"Job {job.guid} ({job.kind}) failed after {job.attempts} attempt(s): {error}")
+        return
+
+    delay = min(config['JOB_BACKOFF_SECONDS'] * 2 ** (job.attempts - 1), config['JOB_MAX_BACKOFF_SECONDS'])
+    job.status = 'queued'
+    job.run_at = datetime.utcnow() + timedelta(seconds=delay)
+    current_app.logger.warning(f"Job {job.guid} ({job.kind}) failed (attempt {job.attempts}), retrying in {delay}s: {error}")
+
+
+def execute_job(job_id, lock_token):
+    """
+    Runs one claimed job and records the outcome. Does nothing when the claim has since
+    passed to another worker.
+    """
+    job = Job.query.filter_by(id=job_id, lock_token=lock_token, status='running').first()
+    if not job:
+        return
+    kind, payload = job.kind, json.loads(job.payload)
+    db.session.commit()
+
+    error = None
+    try:
+        handler = HANDLERS.get(kind)
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{kind}'")
+        handler(payload)
+    except Exception as e:
+        db.session.rollback()
+        error = e
+
+    # Record the outcome only if this worker still holds the claim
+    job = Job.query.filter_by(id=job_id, lock_token=lock_token).with_for_update().first()
+    if not job:
+        db.session.rollback()
+        return
+    if error is None:
+        job.status = 'succeeded'
+        job.finished_at = datetime.utcnow()
+        job.locked_until = None
+        job.lock_token = None
+        job.last_error = None
+    else:
+        _record_failure(job, error)
+    db.session.commit()
+
+
+def _init_worker_process():
+    # Each spawned worker process builds its own app (and database connections)
+    global _worker_app
+    from app import app
+    _worker_app = app
+    load_handlers()
+
+
+def _run_in_worker_process(job_id, lock_token):
+    with _worker_app.app_context():
+        execute_job(job_id, lock_token)
+
+
+def _new_pool(processes):
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker_process
+    )
+
+
+def run_worker(processes, poll_interval, once=False):
+    """
+    Claims jobs and runs them on a pool of `processes` worker processes until stopped.
+    Only as many jobs are claimed as there are idle processes, so a claimed job does not
+    sit in a local queue while its visibility timeout runs down. With `processes` 0 the
+    jobs run in this process (handy on SQLite). With `once`, returns the number of jobs
+    run as soon as nothing is due.
+    """
+    load_handlers()
+    processed = 0
+
+    if processes == 0:
+        while True:
+            claimed = claim_jobs(1)
+            if not claimed:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+            execute_job(*claimed[0])
+            processed += 1
+
+    executor = _new_pool(processes)
+    in_flight = set()
+    try:
+        while True:
+            idle = processes - len(in_flight)
+            for job_id, lock_token in (claim_jobs(idle) if idle else []):
+                in_flight.add(executor.submit(_run_in_worker_process, job_id, lock_token))
+
+            if not in_flight:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            done, in_flight = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            pool_broken = False
+            for future in done:
+                processed += 1
+                try:
+                    future.result()
+                except BrokenProcessPool:
+                    pool_broken = True
+                except Exception as e:
+                    current_app.logger.error(f"Job worker process error: {e}")
+
+            if pool_broken:
+                # A worker process died (e.g. killed for memory). Its jobs stay claimed and are
+                # retried once their visibility timeout runs out; start a fresh pool for the rest.
+                current_app.logger.error("A job worker process died; restarting the pool")
+                executor.shutdown(wait=False, cancel_futures=True)
+                in_flight = set()
+                executor = _new_pool(processes)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def retry_failed_jobs(kind=None):
+    """
+    Puts failed jobs (optionally of one kind) back in the queue with fresh attempts.
+    Returns how many were requeued.
+    """
+    query = Job.query.filter_by(status='failed')
+    if kind:
+        query = query.filter_by(kind=kind)
+    jobs = query.all()
+    for job in jobs:
+        job.status = 'queued'
+        job.attempts = 0
+        job.run_at = datetime.utcnow()
+        job.finished_at = None
+    db.session.commit()
+    return len(jobs)
@@ -0,0 +1,227 @@
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, render_template
+from flask_mail import Message
+from sqlalchemy import or_, and_
+
+from models import db, EmailOutbox, Customer
+from lib import helpers, passwords
+
+CREDENTIALS_TEMPLATE = 'customer_credentials'
+CREDENTIALS_SUBJECT = 'Welcome to CPA Application - Your Account Credentials'
+
+# Messages rendered by the worker at send time: template name -> (plain text, HTML) templates
+TEMPLATES = {
+    CREDENTIALS_TEMPLATE: ('email/customer_credential_plain.txt', 'email/customer_credential_html.html'),
+}
+
+
+def enqueue_email(recipient, subject, body=None, html=None, template=None, customer_guid=None):
+    """
+    Adds an email to the outbox in the current transaction and returns the row.
+
+    Nothing is sent here: the message is written when the caller commits, together with
+    the change it belongs to, and the `flask send-emails` worker delivers it afterwards.
+    The row is kept after sending, so `body` and `html` must not contain secrets; pass a
+    `template` rendered at send time instead.
+    """
+    message = EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        html=html,
+        template=template,
+        customer_guid=customer_guid
+    )
+    db.session.add(message)
+    return message
+
+
+def enqueue_credentials_email(recipient, customer_guid):
+    """
+    Adds the welcome email with a customer's login credentials to the outbox.
+
+    Only the customer's guid is stored. The worker generates the password when it sends
+    the email and sets it on the customer in the same commit that marks the message sent,
+    so no plaintext password is written to the database. The customer must be created
+    with passwords.UNUSABLE_PASSWORD; a customer who already has a password is not sent one.
+    """
+    return enqueue_email(recipient, CREDENTIALS_SUBJECT, template=CREDENTIALS_TEMPLATE, customer_guid=customer_guid)
+
+
+def claim_batch(batch_size):
+    """
+    Claims up to `batch_size` due messages for this worker and commits the claim.
+
+    A claim lasts EMAIL_OUTBOX_LOCK_SECONDS; messages whose claim ran out (the worker
+    died mid-batch) are picked up again. Rows locked by another worker are skipped.
+    """
+    now = datetime.utcnow()
+    messages = EmailOutbox.query.filter(or_(
+        and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == 'sending', EmailOutbox.locked_until < now)
+    )).order_by(EmailOutbox.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    locked_until = now + timedelta(seconds=current_app.config['EMAIL_OUTBOX_LOCK_SECONDS'])
+    for message in messages:
+        message.status = 'sending'
+        message.locked_until = locked_until
+    db.session.commit()
+    return messages
+
+
+def _issue_credentials(messages):
+    """
+    Generates the passwords for the credentials emails among `messages` and hashes them
+    together on the bulk hashing pool. Returns {message id: (customer, password, hash)};
+    nothing is stored until the message has been sent.
+
+    Messages whose customer was deleted, or already has a password, are cancelled.
+    """
+    credential_messages = [message for message in messages if message.template == CREDENTIALS_TEMPLATE]
+    if not credential_messages:
+        return {}
+
+    customers = {
+        customer.guid: customer
+        for customer in Customer.query.filter(Customer.guid.in_([message.customer_guid for message in credential_messages]))
+    }
+    issued = []
+    for message in credential_messages:
+        customer = customers.get(message.customer_guid)
+        if customer is None or customer.deleted or customer.password != passwords.UNUSABLE_PASSWORD:
+            message.status = 'cancelled'
+            message.locked_until = None
+            message.last_error = 'The customer no longer exists or already has a password.'
+            continue
+        issued.append((message, customer, helpers.generate_random_string(8)))
+    db.session.commit()
+
+    password_hashes = passwords.hash_passwords([password for _, _, password in issued])
+    return {
+        message.id: (customer, password, password_hash)
+        for (message, customer, password), password_hash in zip(issued, password_hashes)
+    }
+
+
+def _render(message, values):
+    plain_template, html_template = TEMPLATES[message.template]
+    values = dict(values, recipient_email=message.recipient, current_year=datetime.now().year)
+    return render_template(plain_template, **values), render_template(html_template, **values)
+
+
+def _mark_sent(message):
+    message.status = 'sent'
+    message.sent_at = datetime.utcnow()
+    message.locked_until = None
+    message.last_error = None
+    message.body = None
+    message.html = None
+
+
+def _mark_failed(message, error):
+    """
+    Schedules another attempt with exponential backoff, or moves the message to the
+    'dead' state once EMAIL_OUTBOX_MAX_ATTEMPTS have failed.
+    """
+    config = current_app.config
+    message.attempts += 1
+    message.locked_until = None
+    message.last_error = str(error)[:500]
+    if message.attempts >= config['EMAIL_OUTBOX_MAX_ATTEMPTS']:
+        message.status = 'dead'
+        current_app.logger.error(f"Email {message.guid} to {message.recipient} failed {message.attempts} times and was moved to the dead letters: {error}")
+        return
+
+    delay = min(config['EMAIL_OUTBOX_BACKOFF_SECONDS'] * 2 ** (message.attempts - 1), config['EMAIL_OUTBOX_MAX_BACKOFF_SECONDS'])
+    message.status = 'pending'
+    message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    current_app.logger.warning(f"Email {message.guid} to {message.recipient} failed (attempt {message.attempts}), retrying in {delay}s: {error}")
+
+
+def send_batch(batch_size):
+    """
+    Sends one batch of due messages over a single SMTP connection and records the outcome
+    of each. Returns the number of messages that were claimed.
+    """
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0
+
+    try:
+        credentials = _issue_credentials(messages)
+    except Exception as e:
+        db.session.rollback()
+        for message in messages:
+            if message.status == 'sending':
+                _mark_failed(message, e)
+        db.session.commit()
+        return len(messages)
+
+    mail = current_app.extensions['mail']
+    try:
+        with mail.connect() as connection:
+            for message in messages:
+                if message.status != 'sending':
+                    continue
+                try:
+                    body, html = message.body, message.html
+                    if message.id in credentials:
+                        customer, password, password_hash = credentials[message.id]
+                        body, html = _render(message, {'user_password': password})
+                    connection.send(Message(
+                        subject=message.subject,
+                        recipients=[message.recipient],
+                        body=body,
+                        html=html
+                    ))
+                    if message.id in credentials:
+                        # Set with the sent mark, so the password only works once it was emailed
+                        customer.password = password_hash
+                    _mark_sent(message)
+                except Exception as e:
+                    _mark_failed(message, e)
+                # Record each outcome right away so a crash cannot resend what already went out
+                db.session.commit()
+    except Exception as e:
+        # Could not connect (or the connection broke): every message still claimed is retried
+        db.session.rollback()
+        for message in messages:
+            if message.status == 'sending':
+                _mark_failed(message, e)
+        db.session.commit()
+
+    return len(messages)
+
+
+def run_worker(batch_size, poll_interval, once=False):
+    """
+    Delivers outbox messages until stopped. Sleeps `poll_interval` seconds whenever the
+    outbox has nothing due. With `once`, returns after the outbox has been drained.
+    """
+    sent_total = 0
+    while True:
+        claimed = send_batch(batch_size)
+        sent_total += claimed
+        if claimed:
+            continue
+        if once:
+            return sent_total
+        time.sleep(poll_interval)
+
+
+def requeue_dead(limit=None):
+    """
+    Moves dead messages back to 'pending' with a fresh attempt count and returns how many.
+    """
+    query = EmailOutbox.query.filter_by(status='dead').order_by(EmailOutbox.id)
+    if limit:
+        query = query.limit(limit)
+    messages = query.all()
+    for message in messages:
+        message.status = 'pending'
+        message.attempts = 0
+        message.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    return len(messages)
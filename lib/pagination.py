@@ -0,0 +1,85 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def _encode(payload):
+    data = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+
+def encode_cursor(created_at, row_id):
+    """
+    Encodes the (created_at, id) position of the last row on a page as an opaque string.
+    """
+    return _encode({'c': created_at.isoformat(), 'i': row_id})
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor made by encode_cursor back to (created_at, id).
+    Raises ValueError when the cursor is malformed.
+    """
+    try:
+        payload = _decode(cursor)
+        return datetime.fromisoformat(payload['c']), int(payload['i'])
+    except (TypeError, KeyError, ValueError, UnicodeError, AttributeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def encode_rank_cursor(score, row_id):
+    """
+    Encodes the (relevance score, id) position of the last search result on a page.
+    """
+    return _encode({'s': score, 'i': row_id})
+
+
+def decode_rank_cursor(cursor):
+    """
+    Decodes a cursor made by encode_rank_cursor back to (score, id).
+    Raises ValueError when the cursor is malformed.
+    """
+    try:
+        payload = _decode(cursor)
+        return float(payload['s']), int(payload['i'])
+    except (TypeError, KeyError, ValueError, UnicodeError, AttributeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_page(query, model, cursor, per_page):
+    """
+    Returns one page of `query` in (created_at, id) order, starting after `cursor`.
+
+    Instead of OFFSET, the next page seeks past the last row seen, so every page costs
+    the same no matter how deep it is, as long as an index ends in created_at.
+    No COUNT(*) is run; callers add a total from the usage counters when asked for one.
+
+    Returns (items, pagination) where pagination holds per_page, has_next and next_cursor.
+    """
+    page_query = query
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # Written out instead of a row-value comparison so MySQL can use the index range
+        page_query = page_query.filter(or_(
+            model.created_at > created_at,
+            and_(model.created_at == created_at, model.id > row_id)
+        ))
+
+    # One extra row tells whether another page exists without a COUNT(*)
+    rows = page_query.order_by(model.created_at, model.id).limit(per_page + 1).all()
+    items = rows[:per_page]
+    has_next = len(rows) > per_page
+
+    pagination = {
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': encode_cursor(items[-1].created_at, items[-1].id) if has_next else None,
+    }
+    return items, pagination
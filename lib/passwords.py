@@ -0,0 +1,137 @@
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import current_app, jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+_bulk_executor = None
+
+# Stored as the password of accounts whose password is only set when their credentials email
+# is sent; it is not a valid hash, so no password ever matches it
+UNUSABLE_PASSWORD = '!'
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool already has PASSWORD_HASH_QUEUE_LIMIT jobs queued."""
+
+
+def init_password_hasher(app):
+    """
+    Answers requests that hit a full hashing queue with 503 + Retry-After, so a login burst
+    sheds load quickly instead of piling up behind the pool and stalling the worker.
+    """
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(e):
+        response = jsonify({"statuscode": 503, "message": "The server is busy, please try again shortly."})
+        response.headers['Retry-After'] = str(app.config['PASSWORD_HASH_RETRY_AFTER'])
+        return response, 503
+
+
+def get_hash_executor():
+    """
+    Returns this worker's process pool for password hashing, creating it on first use.
+
+    Hashing is deliberately CPU-heavy and holds the GIL, so running it in threads would
+    stall every other request in the worker. Processes are spawned rather than forked so
+    the pool is safe to start from a multi-threaded server.
+    """
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(current_app.config['PASSWORD_HASH_QUEUE_LIMIT'])
+                _executor = ProcessPoolExecutor(
+                    max_workers=current_app.config['PASSWORD_HASH_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _executor
+
+
+def get_bulk_hash_executor():
+    """
+    Returns this worker's separate, smaller process pool for bulk hashing (the passwords of
+    a batch of credentials emails). Bulk jobs never queue on the login pool.
+    """
+    global _bulk_executor
+    if _bulk_executor is None:
+        with _executor_lock:
+            if _bulk_executor is None:
+                _bulk_executor = ProcessPoolExecutor(
+                    max_workers=current_app.config['PASSWORD_HASH_BULK_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _bulk_executor
+
+
+def _run(function, *args):
+    """
+    Runs one hashing job on the pool and waits for it. Raises PasswordHasherBusy when
+    the queue is full or the job does not finish within PASSWORD_HASH_TIMEOUT seconds.
+    """
+    executor = get_hash_executor()
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+
+    try:
+        future = executor.submit(function, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+
+    try:
+        return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+    except FutureTimeoutError as e:
+        future.cancel()
+        raise PasswordHasherBusy() from e
+
+
+def _hash_function():
+    return functools.partial(generate_password_hash, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def hash_password(password):
+    """
+    Hashes a password with PASSWORD_HASH_METHOD on the process pool.
+    """
+    return _run(_hash_function(), password)
+
+
+def verify_password(password_hash, password):
+    """
+    Checks a password against a stored hash on the process pool.
+    """
+    return _run(check_password_hash, password_hash, password)
+
+
+@functools.lru_cache(maxsize=8)
+def _full_method(method):
+    # "pbkdf2" -> "pbkdf2:sha256:1000000": werkzeug fills in the defaults in the hash prefix
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """
+    Returns True when a stored hash was made with other parameters than PASSWORD_HASH_METHOD,
+    e.g. "pbkdf2:sha256:260000$salt$hash" after the method was changed to scrypt.
+    """
+    return password_hash.split('$', 1)[0] != _full_method(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def hash_passwords(passwords):
+    """
+    Hashes many passwords in parallel on the bulk process pool and returns the hashes in order.
+    Meant for bulk jobs such as the email outbox; logins and single hashes never wait behind it.
+    """
+    passwords = list(passwords)
+    if not passwords:
+        return []
+    executor = get_bulk_hash_executor()
+    # Send the work in a few large chunks instead of one inter-process round trip per password
+    chunksize = max(1, len(passwords) // (current_app.config['PASSWORD_HASH_BULK_WORKERS'] * 4))
+    return list(executor.map(_hash_function(), passwords, chunksize=chunksize))
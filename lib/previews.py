@@ -0,0 +1,162 @@
+import hashlib
+import io
+import posixpath
+
+import pypdfium2
+from flask import current_app, request, Response
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import and_
+
+from models import db, CustomerDocument
+from lib.processing import document_stage
+from lib.storage import storage_for_path, local_copy, ObjectNotFound
+
+PREVIEW_IMAGE_TYPES = {'png', 'jpg', 'jpeg', 'gif'}
+PREVIEW_PDF_TYPES = {'pdf'}
+
+# Pillow format name -> (file extension, MIME type) of the stored preview
+PREVIEW_FORMATS = {
+    'WEBP': ('webp', 'image/webp'),
+    'JPEG': ('jpg', 'image/jpeg'),
+}
+
+
+def supports_preview(file_type):
+    return file_type in PREVIEW_IMAGE_TYPES or file_type in PREVIEW_PDF_TYPES
+
+
+def same_object_filter(document):
+    """
+    Returns a filter matching the documents that share `document`'s stored object.
+    Deduplicated documents are found through the (business_id, content_hash) index;
+    documents without a content hash own their object alone.
+    """
+    if not document.content_hash:
+        return CustomerDocument.id == document.id
+    return and_(
+        CustomerDocument.business_id == document.business_id,
+        CustomerDocument.content_hash == document.content_hash,
+        CustomerDocument.document_path == document.document_path
+    )
+
+
+def preview_key_for(object_key, preview_format):
+    """
+    Returns the key of a stored object's preview in the sibling "previews/" prefix, e.g.
+    ".../customers/2/documents/<uuid>.pdf" -> ".../customers/2/previews/<uuid>.webp".
+    """
+    directory, filename = posixpath.split(object_key)
+    stem = filename.rsplit('.', 1)[0]
+    return posixpath.join(posixpath.dirname(directory), 'previews', f"{stem}.{PREVIEW_FORMATS[preview_format][0]}")
+
+
+def _first_pdf_page(path, max_size):
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        page = pdf[0]
+        width, height = page.get_size()
+        # Render straight at preview size instead of rendering full size and shrinking
+        bitmap = page.render(scale=max_size / max(width, height, 1))
+        return bitmap.to_pil()
+    finally:
+        pdf.close()
+
+
+def render_preview(path, file_type, max_size, preview_format, quality):
+    """
+    Renders a preview no larger than max_size x max_size of an image or of a PDF's
+    first page and returns it encoded as `preview_format`.
+    """
+    if file_type in PREVIEW_PDF_TYPES:
+        image = _first_pdf_page(path, max_size)
+    else:
+        image = Image.open(path)
+        # Lets JPEG decode at a reduced scale, which is much faster for large photos
+        image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+
+    image.thumbnail((max_size, max_size))
+    if preview_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        # WebP keeps transparency (including palette transparency in GIF/PNG); JPEG cannot
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if preview_format == 'WEBP' and has_alpha else 'RGB')
+
+    output = io.BytesIO()
+    image.save(output, format=preview_format, quality=quality)
+    return output.getvalue()
+
+
+@document_stage('preview')
+def generate_preview(document):
+    """
+    Stores a small preview of a new image or PDF next to it and records it on every
+    document sharing the stored object. Already previewed documents are skipped.
+    """
+    if document.preview_path or not supports_preview(document.file_type):
+        return
+
+    # Deduplicated documents share one stored object, and so one preview
+    existing = CustomerDocument.query.filter(
+        same_object_filter(document),
+        CustomerDocument.preview_path.isnot(None)
+    ).first()
+
+    if existing:
+        preview_path = existing.preview_path
+    else:
+        config = current_app.config
+        preview_format = config['PREVIEW_FORMAT']
+        try:
+            with local_copy(document.document_path, document.content_encoding) as path:
+                preview = render_preview(path, document.file_type, config['PREVIEW_MAX_SIZE'], preview_format, config['PREVIEW_QUALITY'])
+        except ObjectNotFound:
+            current_app.logger.warning(f"Stored object for document {document.guid} is gone, no preview made")
+            return
+        except (UnidentifiedImageError, Image.DecompressionBombError, pypdfium2.PdfiumError, OSError) as e:
+            # A file that cannot be rendered will not render on retry either
+            current_app.logger.warning(f"Could not render a preview of document {document.guid}: {e}")
+            return
+
+        backend, object_key = storage_for_path(document.document_path)
+        preview_key = preview_key_for(object_key, preview_format)
+        backend.put(preview_key, io.BytesIO(preview), content_type=PREVIEW_FORMATS[preview_format][1])
+        preview_path = backend.path_for(preview_key)
+
+    CustomerDocument.query.filter(
+        same_object_filter(document),
+        CustomerDocument.preview_path.is_(None)
+    ).update({CustomerDocument.preview_path: preview_path}, synchronize_session=False)
+    db.session.commit()
+
+
+def delete_preview(preview_path):
+    """
+    Removes a stored preview; call it when its document's stored object is deleted.
+    """
+    backend, preview_key = storage_for_path(preview_path)
+    backend.delete(preview_key)
+
+
+def preview_response(document):
+    """
+    Builds the response for a document's preview.
+
+    Previews never change once written (a new upload gets a new key), so they are sent
+    with a long private max-age, and a matching If-None-Match is answered with 304
+    without touching storage.
+    """
+    etag = hashlib.sha1(document.preview_path.encode('utf-8')).hexdigest()
+    max_age = current_app.config['PREVIEW_CACHE_MAX_AGE']
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        backend, preview_key = storage_for_path(document.preview_path)
+        extension = preview_key.rsplit('.', 1)[-1]
+        mimetype = next((mime for ext, mime in PREVIEW_FORMATS.values() if ext == extension), 'application/octet-stream')
+        response = Response(backend.get(preview_key), mimetype=mimetype)
+
+    response.set_etag(etag)
+    # 'private': previews are only served to authenticated users, so shared caches must not keep them
+    response.headers['Cache-Control'] = f"private, max-age={max_age}, immutable"
+    return response
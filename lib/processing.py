@@ -0,0 +1,35 @@
+from models import CustomerDocument
+from lib import jobs
+
+# Stages run on every new document, in registration order: [(name, function(document))]
+DOCUMENT_STAGES = []
+
+
+def document_stage(name):
+    """
+    Registers a function as a processing stage for new documents. It is called with the
+    active CustomerDocument from the 'document.process' job and, like any job handler,
+    must be idempotent: a retry runs every stage again.
+    """
+    def register(function):
+        DOCUMENT_STAGES.append((name, function))
+        return function
+    return register
+
+
+def enqueue_document_processing(document_guid):
+    """
+    Queues the processing of a newly stored document in the current transaction.
+    """
+    return jobs.enqueue('document.process', {'document_guid': document_guid})
+
+
+@jobs.job_handler('document.process')
+def process_document(payload):
+    document = CustomerDocument.query.filter_by(guid=payload['document_guid'], status='active', deleted=0).first()
+    if not document:
+        # Deleted before the worker got to it
+        return
+
+    for name, stage in DOCUMENT_STAGES:
+        stage(document)
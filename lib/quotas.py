@@ -0,0 +1,111 @@
+from flask import current_app
+
+from models import UsageCounter
+
+
+class QuotaExceeded(Exception):
+    """Raised when an upload would take a customer or business over its storage quota."""
+
+    def __init__(self, scope, quota_bytes, used_bytes):
+        self.scope = scope
+        self.quota_bytes = quota_bytes
+        self.used_bytes = used_bytes
+        super().__init__(
+            f"Storage quota exceeded: the {scope} quota is {quota_bytes} bytes and {used_bytes} bytes are in use."
+        )
+
+
+def _quotas():
+    # (scope, counter row, quota) for every quota that is switched on (0 means unlimited)
+    config = current_app.config
+    return [
+        (scope, customer_row, quota)
+        for scope, customer_row, quota in (
+            ('customer', None, config['CUSTOMER_STORAGE_QUOTA_BYTES']),
+            ('business', UsageCounter.BUSINESS_ROW, config['BUSINESS_STORAGE_QUOTA_BYTES']),
+        )
+        if quota
+    ]
+
+
+def remaining_bytes(business_id, customer_id):
+    """
+    Returns (scope, quota, used, remaining) for the tightest storage quota of a customer,
+    or None when no quota is configured.
+
+    Usage is read from the maintained usage_counters rows (one indexed lookup), never by
+    summing customer_documents.
+    """
+    quotas = _quotas()
+    if not quotas:
+        return None
+
+    rows = {
+        row.customer_id: row.total_bytes
+        for row in UsageCounter.query.filter(
+            UsageCounter.business_id == business_id,
+            UsageCounter.customer_id.in_([customer_id, UsageCounter.BUSINESS_ROW])
+        )
+    }
+
+    tightest = None
+    for scope, customer_row, quota in quotas:
+        used = rows.get(customer_id if customer_row is None else customer_row, 0)
+        if tightest is None or quota - used < tightest[3]:
+            tightest = (scope, quota, used, quota - used)
+    return tightest
+
+
+def check_quota(business_id, customer_id, incoming_bytes):
+    """
+    Raises QuotaExceeded when storing `incoming_bytes` more would exceed a quota.
+    Returns the number of bytes still allowed after them (None when unlimited).
+    """
+    tightest = remaining_bytes(business_id, customer_id)
+    if tightest is None:
+        return None
+
+    scope, quota, used, remaining = tightest
+    if incoming_bytes > remaining:
+        raise QuotaExceeded(scope, quota, used)
+    return remaining - incoming_bytes
+
+
+class QuotaLimitedStream:
+    """
+    Wraps a readable stream and raises QuotaExceeded as soon as more than `limit` bytes
+    have been read from it, so an oversized body is cut off while it is being read.
+    """
+
+    def __init__(self, stream, limit, quota):
+        self.stream = stream
+        self.limit = limit
+        self.scope, self.quota_bytes, self.used_bytes = quota
+        self.position = 0
+
+    def read(self, size=-1):
+        chunk = self.stream.read(size)
+        self.position += len(chunk)
+        if self.position > self.limit:
+            raise QuotaExceeded(self.scope, self.quota_bytes, self.used_bytes)
+        return chunk
+
+    def seek(self, offset, whence=0):
+        self.position = self.stream.seek(offset, whence)
+        return self.position
+
+    def tell(self):
+        return self.stream.tell()
+
+
+def limit_stream(stream, business_id, customer_id):
+    """
+    Returns `stream` wrapped so reading past the remaining quota raises QuotaExceeded,
+    or `stream` itself when no quota is configured.
+    """
+    tightest = remaining_bytes(business_id, customer_id)
+    if tightest is None:
+        return stream
+
+    scope, quota, used, remaining = tightest
+    return QuotaLimitedStream(stream, remaining, (scope, quota, used))
@@ -0,0 +1,274 @@
+import threading
+
+import boto3
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
+from flask import current_app
+from werkzeug.http import parse_date
+
+# S3 rejects multipart parts smaller than 5 MiB (only the last part may be smaller).
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+_client_lock = threading.Lock()
+
+
+def create_s3_client(config):
+    """
+    Builds an S3 client with a tuned connection pool, timeouts, retries and TCP keepalive.
+    """
+    return boto3.client(
+        's3',
+        aws_access_key_id=config['AWS_ACCESS_KEY_ID'],
+        aws_secret_access_key=config['AWS_SECRET_ACCESS_KEY'],
+        region_name=config['AWS_REGION'],
+        config=BotoConfig(
+            max_pool_connections=config['S3_MAX_POOL_CONNECTIONS'],
+            connect_timeout=config['S3_CONNECT_TIMEOUT'],
+            read_timeout=config['S3_READ_TIMEOUT'],
+            retries={'mode': config['S3_RETRY_MODE'], 'total_max_attempts': config['S3_MAX_ATTEMPTS']},
+            tcp_keepalive=config['S3_TCP_KEEPALIVE']
+        )
+    )
+
+
+def init_s3_client(app):
+    """
+    Creates the process-wide S3 client once at startup and stores it on the app.
+
+    boto3 clients are thread-safe, so every request in this worker shares the same client
+    and its connection pool instead of re-resolving credentials and redoing TLS handshakes.
+    With S3_WARMUP enabled a HEAD request is sent to the bucket so the first upload or
+    download does not pay for endpoint resolution and the initial handshake.
+    """
+    client = create_s3_client(app.config)
+    app.extensions['s3_client'] = client
+
+    if app.config.get('S3_WARMUP') and app.config.get('S3_BUCKET_NAME'):
+        try:
+            client.head_bucket(Bucket=app.config['S3_BUCKET_NAME'])
+        except Exception as e:
+            app.logger.warning(f"S3 warm-up request failed: {e}")
+
+    return client
+
+
+def get_s3_client():
+    """
+    Returns the shared S3 client for this worker, creating it on first use if the
+    app was not initialized through init_s3_client (e.g. in a CLI command).
+    """
+    client = current_app.extensions.get('s3_client')
+    if client is None:
+        with _client_lock:
+            client = current_app.extensions.get('s3_client')
+            if client is None:
+                client = init_s3_client(current_app)
+    return client
+
+
+def s3_pool_stats():
+    """
+    Returns request and connection counters for the shared client's connection pools.
+    reused_connections is how many requests were served on an already-open connection.
+    """
+    client = current_app.extensions.get('s3_client')
+    stats = {'requests': 0, 'new_connections': 0, 'reused_connections': 0}
+    if client is None:
+        return stats
+
+    # botocore does not expose its urllib3 pools publicly, so read them defensively
+    try:
+        pool_manager = client._endpoint.http_session._manager
+        for pool_key in pool_manager.pools.keys():
+            pool = pool_manager.pools.get(pool_key)
+            if pool is None:
+                continue
+            stats['requests'] += pool.num_requests
+            stats['new_connections'] += pool.num_connections
+    except AttributeError:
+        return stats
+
+    stats['reused_connections'] = max(stats['requests'] - stats['new_connections'], 0)
+    return stats
+
+
+def get_part_size():
+    """
+    Returns the configured multipart part size, never below the S3 minimum.
+    """
+    part_size = current_app.config.get('S3_UPLOAD_PART_SIZE') or S3_MIN_PART_SIZE
+    return max(int(part_size), S3_MIN_PART_SIZE)
+
+
+def read_exactly(stream, size):
+    """
+    Reads up to `size` bytes from a stream, looping over short reads.
+    Returns fewer bytes only when the stream is exhausted.
+    """
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def upload_stream(s3_client, stream, bucket_name, object_key, extra_args=None, part_size=None):
+    """
+    Streams a file-like object into S3 part by part and returns the number of bytes uploaded.
+
+    Only one part is held in memory at a time, so peak memory per upload is bounded by
+    the part size no matter how large the file is. Streams that fit in a single part are
+    sent with a plain put_object to skip the multipart round trips.
+    If anything fails mid-way the multipart upload is aborted so S3 does not keep orphaned parts.
+    """
+    extra_args = extra_args or {}
+    part_size = part_size or get_part_size()
+
+    first_part = read_exactly(stream, part_size)
+    if len(first_part) < part_size:
+        s3_client.put_object(Bucket=bucket_name, Key=object_key, Body=first_part, **extra_args)
+        return len(first_part)
+
+    multipart = s3_client.create_multipart_upload(Bucket=bucket_name, Key=object_key, **extra_args)
+    upload_id = multipart['UploadId']
+    parts = []
+    total_bytes = 0
+
+    try:
+        part_number = 1
+        part_data = first_part
+        while part_data:
+            response = s3_client.upload_part(
+                Bucket=bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=part_data
+            )
+            parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+            total_bytes += len(part_data)
+
+            part_number += 1
+            part_data = read_exactly(stream, part_size)
+
+        s3_client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=object_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        try:
+            s3_client.abort_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+        except Exception as abort_error:
+            current_app.logger.error(f"Failed to abort multipart upload {upload_id} for {object_key}: {abort_error}")
+        raise
+
+    return total_bytes
+
+
+# S3 allows at most 10,000 parts per multipart upload.
+S3_MAX_PARTS = 10000
+
+
+def plan_parts(file_size, part_size=None):
+    """
+    Returns (part_size, part_count) for a multipart upload of `file_size` bytes.
+    The part size is grown when needed so the upload stays within the S3 part limit.
+    """
+    part_size = part_size or get_part_size()
+    part_size = max(part_size, -(-file_size // S3_MAX_PARTS))
+    part_count = max(1, -(-file_size // part_size))
+    return part_size, part_count
+
+
+def presign_upload_part_urls(s3_client, bucket_name, object_key, upload_id, part_count, expires_in):
+    """
+    Generates one presigned PUT URL per part so the client can upload parts straight to S3.
+    """
+    return [
+        {
+            'part_number': part_number,
+            'url': s3_client.generate_presigned_url(
+                'upload_part',
+                Params={
+                    'Bucket': bucket_name,
+                    'Key': object_key,
+                    'UploadId': upload_id,
+                    'PartNumber': part_number
+                },
+                ExpiresIn=expires_in
+            )
+        }
+        for part_number in range(1, part_count + 1)
+    ]
+
+
+def list_uploaded_parts(s3_client, bucket_name, object_key, upload_id):
+    """
+    Returns every part S3 has received for a multipart upload, following pagination.
+    """
+    parts = []
+    paginator = s3_client.get_paginator('list_parts')
+    for page in paginator.paginate(Bucket=bucket_name, Key=object_key, UploadId=upload_id):
+        parts.extend(page.get('Parts', []))
+    return parts
+
+
+def get_object_for_range(s3_client, bucket_name, object_key, range_header=None, if_range=None):
+    """
+    Fetches an object from S3, forwarding an HTTP Range request when one is given.
+
+    GetObject has no If-Range parameter, so If-Range is mapped onto IfMatch (ETag) or
+    IfUnmodifiedSince (HTTP date). When that precondition fails the full object is
+    returned instead of the range, which is what If-Range requires.
+    """
+    if not range_header:
+        return s3_client.get_object(Bucket=bucket_name, Key=object_key)
+
+    range_args = {'Range': range_header}
+    if if_range:
+        if if_range.startswith('W/'):
+            # Weak validators never satisfy If-Range, so the client gets the whole object
+            return s3_client.get_object(Bucket=bucket_name, Key=object_key)
+        if if_range.startswith('"'):
+            range_args['IfMatch'] = if_range
+        else:
+            if_range_date = parse_date(if_range)
+            if if_range_date is None:
+                return s3_client.get_object(Bucket=bucket_name, Key=object_key)
+            range_args['IfUnmodifiedSince'] = if_range_date
+
+    try:
+        return s3_client.get_object(Bucket=bucket_name, Key=object_key, **range_args)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'PreconditionFailed':
+            raise
+        return s3_client.get_object(Bucket=bucket_name, Key=object_key)
+
+
+def iter_body(body, chunk_size):
+    """
+    Relays an S3 streaming body in fixed-size chunks and closes it when done,
+    so memory per download stays flat regardless of the object size.
+    """
+    try:
+        for chunk in body.iter_chunks(chunk_size=chunk_size):
+            yield chunk
+    finally:
+        body.close()
+
+
+def key_from_path(document_path, bucket_name):
+    """
+    Extracts the object key from a stored "s3://bucket-name/path/to/object.ext" document path.
+    """
+    s3_path_prefix = f"s3://{bucket_name}/"
+    if not document_path.startswith(s3_path_prefix):
+        raise ValueError(f"Invalid S3 path format: {document_path}")
+    return document_path[len(s3_path_prefix):]
+
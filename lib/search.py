@@ -0,0 +1,107 @@
+import re
+
+from sqlalchemy import and_, or_, case, func, literal
+from sqlalchemy.dialects.mysql import match
+
+from models import db, Customer, CustomerDocument
+from lib.pagination import encode_rank_cursor, decode_rank_cursor
+
+# Columns covered by the FULLTEXT indexes ft_customers_search / ft_customer_documents_search
+CUSTOMER_SEARCH_COLUMNS = (Customer.firstname, Customer.lastname, Customer.email, Customer.phone, Customer.city)
+DOCUMENT_SEARCH_COLUMNS = (CustomerDocument.document_name, CustomerDocument.file_type)
+
+# Longer queries add little to ranking and only make the match more expensive
+MAX_SEARCH_TERMS = 8
+
+
+def search_terms(search_query):
+    """
+    Splits a search string into lowercase word terms, e.g. "John Smi" -> ['john', 'smi'].
+    """
+    return re.findall(r'\w+', (search_query or '').lower())[:MAX_SEARCH_TERMS]
+
+
+def _uses_fulltext():
+    return db.engine.dialect.name == 'mysql'
+
+
+def relevance(columns, terms, match_anywhere=False):
+    """
+    Returns (filter, score) expressions that match rows where every term is a word prefix
+    in one of `columns`, and rank them.
+
+    On MySQL this is MATCH ... AGAINST in boolean mode ("+term*" per term), served by
+    the FULLTEXT index. Other databases (local development) fall back to LIKE matching on
+    the start of each column value (anywhere in it with `match_anywhere`, for long text),
+    scored by how many columns each term matches.
+    """
+    if _uses_fulltext():
+        score = match(*columns, against=' '.join(f"+{term}*" for term in terms)).in_boolean_mode()
+        # A bare MATCH in WHERE is what lets MySQL drive the query from the FULLTEXT index
+        return score, score
+
+    prefix = '%' if match_anywhere else ''
+    term_matches = [
+        [func.lower(column).like(f"{prefix}{term.replace('_', '!_')}%", escape='!') for column in columns]
+        for term in terms
+    ]
+    search_filter = and_(*[or_(*matches) for matches in term_matches])
+    score = sum(
+        (case((matched, 1), else_=0) for matches in term_matches for matched in matches),
+        literal(0)
+    )
+    return search_filter, score
+
+
+def ranked_page(query, model, columns, terms, cursor, per_page, match_anywhere=False):
+    """
+    Returns one page of search results as (rows, pagination), best match first.
+
+    Rows are tuples with the model instance first and the score last. Pages are cut by
+    keyset on (score, id), so the cursor stays valid while new rows are written and deep
+    pages need no OFFSET.
+    """
+    search_filter, score = relevance(columns, terms, match_anywhere)
+    page_query = query.filter(search_filter)
+
+    if cursor:
+        last_score, last_id = decode_rank_cursor(cursor)
+        page_query = page_query.filter(or_(
+            score < last_score,
+            and_(score == last_score, model.id < last_id)
+        ))
+
+    rows = page_query.add_columns(score.label('score')).order_by(score.desc(), model.id.desc()).limit(per_page + 1).all()
+    results = rows[:per_page]
+    has_next = len(rows) > per_page
+
+    pagination = {
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': encode_rank_cursor(float(results[-1][-1]), results[-1][0].id) if has_next else None,
+    }
+    return results, pagination
+
+
+def search_customers(business_id, terms, cursor, per_page):
+    """
+    Searches a business's live customers by name, email, phone and city.
+    """
+    query = Customer.query.filter(Customer.business_id == business_id, Customer.deleted == 0)
+    return ranked_page(query, Customer, CUSTOMER_SEARCH_COLUMNS, terms, cursor, per_page)
+
+
+def search_documents(business_id, terms, cursor, per_page):
+    """
+    Searches a business's active documents by name and file type.
+    Rows are (document, customer guid, score) tuples.
+    """
+    query = CustomerDocument.query.join(
+        Customer, Customer.id == CustomerDocument.customer_id
+    ).filter(
+        CustomerDocument.business_id == business_id,
+        CustomerDocument.status == 'active',
+        CustomerDocument.deleted == 0,
+        Customer.deleted == 0
+    ).add_columns(Customer.guid)
+    return ranked_page(query, CustomerDocument, DOCUMENT_SEARCH_COLUMNS, terms, cursor, per_page)
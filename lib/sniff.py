@@ -0,0 +1,168 @@
+import mimetypes
+import struct
+
+from flask import current_app
+
+# Leading bytes of each supported format
+PDF_MAGIC = b'%PDF-'
+ZIP_MAGIC = b'PK\x03\x04'
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' # Compound File Binary (legacy Office, encrypted OOXML)
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+JPEG_MAGIC = b'\xff\xd8\xff'
+GIF_MAGICS = (b'GIF87a', b'GIF89a')
+
+# Signatures a text upload must not start with
+BINARY_MAGICS = (PDF_MAGIC, ZIP_MAGIC, OLE_MAGIC, PNG_MAGIC, JPEG_MAGIC, *GIF_MAGICS, b'\x7fELF', b'MZ')
+
+# Office Open XML parts that only occur in one kind of document
+OOXML_PART_PREFIXES = {'docx': 'word/', 'xlsx': 'xl/', 'pptx': 'ppt/'}
+
+ZIP_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+ZIP64_EXTRA_ID = 0x0001
+# Entries smaller than this are never treated as a decompression bomb, whatever their ratio
+MIN_BOMB_ENTRY_SIZE = 1024 * 1024
+
+
+class ContentRejected(Exception):
+    """Raised when the start of an upload does not look like the file type it claims to be."""
+
+
+def _mimetype(file_extension):
+    return mimetypes.guess_type(f"document.{file_extension}")[0] or 'application/octet-stream'
+
+
+def _zip_entries(head):
+    """
+    Yields (name, flags, compressed_size, uncompressed_size) for the zip local file headers
+    that lie completely inside `head`. Sizes are None when they follow the entry's data
+    (flag bit 3) and so cannot be known from the start of the file.
+    """
+    offset = 0
+    while offset + ZIP_LOCAL_HEADER.size <= len(head):
+        (signature, _, flags, _, _, _, _, compressed_size, uncompressed_size,
+         name_length, extra_length) = ZIP_LOCAL_HEADER.unpack_from(head, offset)
+        if signature != ZIP_MAGIC:
+            return
+        name_start = offset + ZIP_LOCAL_HEADER.size
+        data_start = name_start + name_length + extra_length
+        if data_start > len(head):
+            return
+        name = head[name_start:name_start + name_length].decode('utf-8', 'replace')
+
+        if 0xFFFFFFFF in (compressed_size, uncompressed_size):
+            # ZIP64: the real sizes are in the extra field
+            extra = head[name_start + name_length:data_start]
+            position = 0
+            while position + 4 <= len(extra):
+                extra_id, size = struct.unpack_from('<HH', extra, position)
+                if extra_id == ZIP64_EXTRA_ID and size >= 16:
+                    uncompressed_size, compressed_size = struct.unpack_from('<QQ', extra, position + 4)
+                    break
+                position += 4 + size
+
+        if flags & 0x08:
+            yield name, flags, None, None
+            return # The data length is unknown, so the next header cannot be found
+        yield name, flags, compressed_size, uncompressed_size
+        offset = data_start + compressed_size
+
+
+def _check_zip(head, file_extension):
+    max_ratio = current_app.config['UPLOAD_MAX_COMPRESSION_RATIO']
+    max_expanded = current_app.config['UPLOAD_MAX_EXPANDED_BYTES']
+    expanded = 0
+
+    for name, flags, compressed_size, uncompressed_size in _zip_entries(head):
+        if flags & 0x01:
+            raise ContentRejected("Encrypted files are not accepted.")
+
+        other_prefixes = [prefix for extension, prefix in OOXML_PART_PREFIXES.items() if extension != file_extension]
+        if any(name.startswith(prefix) for prefix in other_prefixes):
+            raise ContentRejected(f"The file content does not match the .{file_extension} file type.")
+
+        if uncompressed_size is None:
+            continue
+        expanded += uncompressed_size
+        too_dense = uncompressed_size > MIN_BOMB_ENTRY_SIZE and uncompressed_size > max_ratio * compressed_size
+        if too_dense or expanded > max_expanded:
+            raise ContentRejected("The file expands to an unreasonable size and was rejected.")
+
+
+def _check_image_size(width, height):
+    if width * height > current_app.config['UPLOAD_MAX_IMAGE_PIXELS']:
+        raise ContentRejected(f"Images may have at most {current_app.config['UPLOAD_MAX_IMAGE_PIXELS']} pixels.")
+
+
+def _sniff_text(head):
+    if b'\x00' in head or head.startswith(BINARY_MAGICS):
+        raise ContentRejected("The file content does not match the .txt file type.")
+    try:
+        # The head may end inside a multi-byte character
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if e.start < len(head) - 3:
+            return 'text/plain'
+    return 'text/plain; charset=utf-8'
+
+
+def sniff_content(head, file_extension):
+    """
+    Checks the first bytes of an upload against the type its extension claims and returns
+    the MIME type to store it with, e.g. 'application/pdf'.
+
+    Raises ContentRejected when the bytes belong to another format, when the file is
+    encrypted, or when a compressed container or image declares a size far beyond what its
+    own bytes could reasonably hold (a decompression bomb). Only what is visible in `head`
+    is checked; the background jobs still see the whole file.
+    """
+    mismatch = ContentRejected(f"The file content does not match the .{file_extension} file type.")
+
+    if file_extension == 'pdf':
+        # The header may follow a little junk; readers accept it within the first KB
+        if PDF_MAGIC not in head[:1024]:
+            raise mismatch
+        # Linearized PDFs carry the trailer, and with it any /Encrypt entry, near the start
+        if b'/Encrypt' in head:
+            raise ContentRejected("Encrypted files are not accepted.")
+
+    elif file_extension in OOXML_PART_PREFIXES:
+        if head.startswith(OLE_MAGIC):
+            # Password-protected Office files are stored as an encrypted package in a compound file
+            raise ContentRejected("Encrypted files are not accepted.")
+        if not head.startswith(ZIP_MAGIC):
+            raise mismatch
+        _check_zip(head, file_extension)
+
+    elif file_extension in ('doc', 'xls', 'ppt'):
+        if not head.startswith(OLE_MAGIC):
+            raise mismatch
+
+    elif file_extension == 'png':
+        if not head.startswith(PNG_MAGIC):
+            raise mismatch
+        if len(head) >= 24 and head[12:16] == b'IHDR':
+            _check_image_size(*struct.unpack_from('>II', head, 16))
+
+    elif file_extension in ('jpg', 'jpeg'):
+        if not head.startswith(JPEG_MAGIC):
+            raise mismatch
+
+    elif file_extension == 'gif':
+        if not head.startswith(GIF_MAGICS):
+            raise mismatch
+        if len(head) >= 10:
+            _check_image_size(*struct.unpack_from('<HH', head, 6))
+
+    elif file_extension == 'txt':
+        return _sniff_text(head)
+
+    return _mimetype(file_extension)
+
+
+def sniff_stream(stream, file_extension):
+    """
+    Sniffs the first UPLOAD_SNIFF_BYTES of a seekable stream with sniff_content and rewinds it.
+    """
+    head = stream.read(current_app.config['UPLOAD_SNIFF_BYTES'])
+    stream.seek(0)
+    return sniff_content(head, file_extension)
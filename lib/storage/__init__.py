@@ -0,0 +1,135 @@
+import os
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from lib.compression import decompress_chunks, ENCODING_SUFFIXES
+
+from .base import StorageBackend, StoredObject, ObjectNotFound, InvalidRange
+from .s3 import S3Storage
+from .local import LocalStorage
+
+
+def init_storage(app):
+    """
+    Creates the storage backends once per worker and stores them on the app.
+
+    Every backend that is configured is registered by its document_path scheme, so
+    documents written under a previous STORAGE_BACKEND setting stay readable.
+    STORAGE_BACKEND only decides where new uploads go.
+    """
+    backends = {S3Storage.scheme: S3Storage(app.config.get('S3_BUCKET_NAME'))}
+    if app.config.get('LOCAL_STORAGE_ROOT'):
+        backends[LocalStorage.scheme] = LocalStorage(app.config['LOCAL_STORAGE_ROOT'])
+
+    default_scheme = {'s3': S3Storage.scheme, 'local': LocalStorage.scheme}.get(app.config['STORAGE_BACKEND'])
+    if default_scheme not in backends:
+        raise RuntimeError(f"STORAGE_BACKEND '{app.config['STORAGE_BACKEND']}' is not configured")
+
+    app.extensions['storage'] = {'backends': backends, 'default': backends[default_scheme]}
+    return app.extensions['storage']
+
+
+def _registry():
+    registry = current_app.extensions.get('storage')
+    if registry is None:
+        registry = init_storage(current_app)
+    return registry
+
+
+def get_storage():
+    """
+    Returns the backend new documents are written to.
+    """
+    return _registry()['default']
+
+
+def storage_for_path(document_path):
+    """
+    Resolves a stored document_path ("s3://..." or "file://...") to (backend, key).
+    """
+    scheme = document_path.split('://', 1)[0]
+    backend = _registry()['backends'].get(scheme)
+    if backend is None:
+        raise ValueError(f"No storage backend configured for path: {document_path}")
+    return backend, backend.key_for(document_path)
+
+
+def prefetch_streams(document_paths, chunk_size, depth):
+    """
+    Yields (document_path, StoredObject or exception) in order, keeping up to `depth`
+    objects opened ahead of the consumer.
+
+    Only opening is done ahead (for S3 that is the request and time-to-first-byte);
+    each body is read by the consumer as it goes, so memory stays flat.
+    """
+    document_paths = list(document_paths)
+    in_flight = deque()
+
+    def open_stream(document_path):
+        backend, key = storage_for_path(document_path)
+        return backend.stream(key, chunk_size)
+
+    app = current_app._get_current_object()
+
+    def open_in_app_context(document_path):
+        with app.app_context():
+            return open_stream(document_path)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, depth))
+    next_index = 0
+    try:
+        while next_index < len(document_paths) or in_flight:
+            while next_index < len(document_paths) and len(in_flight) < depth:
+                document_path = document_paths[next_index]
+                in_flight.append((document_path, executor.submit(open_in_app_context, document_path)))
+                next_index += 1
+
+            document_path, future = in_flight.popleft()
+            try:
+                yield document_path, future.result()
+            except Exception as e:
+                yield document_path, e
+    finally:
+        # Consumer stopped early (e.g. client disconnected): release the objects opened ahead
+        for document_path, future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=True)
+        for document_path, future in in_flight:
+            if not future.cancelled() and future.exception() is None:
+                future.result().close()
+
+
+@contextmanager
+def local_copy(document_path, content_encoding=None, chunk_size=1024 * 1024):
+    """
+    Yields a filesystem path holding the stored object, for libraries that need a real
+    file. Uncompressed objects on local storage are used in place; others are streamed
+    (and decompressed, given the document's content_encoding) into a temporary file that
+    is removed afterwards, so the object is never held in memory.
+    """
+    backend, key = storage_for_path(document_path)
+    path = backend.local_path(key)
+    if path and not content_encoding:
+        if not os.path.isfile(path):
+            raise ObjectNotFound(key)
+        yield path
+        return
+
+    stored_object = backend.stream(key, chunk_size)
+    # Keep the document's own extension (".txt", not ".zst") for libraries that look at it
+    original_key = key[:-len(ENCODING_SUFFIXES[content_encoding])] if content_encoding else key
+    temp_file = tempfile.NamedTemporaryFile(suffix=os.path.splitext(original_key)[1], delete=False)
+    try:
+        with temp_file:
+            try:
+                for chunk in decompress_chunks(stored_object.chunks, content_encoding):
+                    temp_file.write(chunk)
+            finally:
+                stored_object.close()
+        yield temp_file.name
+    finally:
+        os.unlink(temp_file.name)
@@ -0,0 +1,81 @@
+class ObjectNotFound(Exception):
+    """Raised when a stored object does not exist."""
+
+
+class InvalidRange(Exception):
+    """Raised when a requested byte range cannot be satisfied."""
+
+
+class StoredObject:
+    """
+    An opened stored object: its body as an iterator of chunks plus the metadata
+    needed to build a download response.
+    """
+
+    def __init__(self, chunks, content_length, content_range=None, etag=None, last_modified=None, close=None):
+        self.chunks = chunks
+        self.content_length = content_length
+        # e.g. "bytes 0-1023/4096" when only part of the object was opened
+        self.content_range = content_range
+        self.etag = etag
+        self.last_modified = last_modified
+        self._close = close
+
+    def close(self):
+        if self._close:
+            self._close()
+
+
+class StorageBackend:
+    """
+    Interface every document storage backend implements.
+
+    Objects are addressed by a key such as "businesses/1/customers/2/documents/<uuid>.pdf".
+    The full document_path stored on CustomerDocument is "<scheme>://..." and is what
+    storage_for_path() uses to find the backend that owns an object.
+    """
+
+    scheme = None
+
+    def path_for(self, key):
+        """Returns the document_path to store for an object key."""
+        raise NotImplementedError
+
+    def key_for(self, document_path):
+        """Returns the object key for a document_path owned by this backend (ValueError otherwise)."""
+        raise NotImplementedError
+
+    def put(self, key, stream, content_type=None, content_encoding=None):
+        """
+        Streams a file-like object into storage and returns the number of bytes written.
+        `content_encoding` labels bytes that were compressed before storing (served as Content-Encoding).
+        """
+        raise NotImplementedError
+
+    def get(self, key):
+        """Returns the whole object as bytes. Only meant for small objects."""
+        raise NotImplementedError
+
+    def stream(self, key, chunk_size, range_header=None, if_range=None):
+        """Opens an object, or the part of it selected by an HTTP Range header, as a StoredObject."""
+        raise NotImplementedError
+
+    def size(self, key):
+        """Returns the stored size of an object in bytes."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Deletes an object; deleting a missing object is not an error."""
+        raise NotImplementedError
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.delete(key)
+
+    def presign(self, key, expires_in, content_disposition=None, content_type=None):
+        """Returns a short-lived URL the client can download from directly, or None if unsupported."""
+        return None
+
+    def local_path(self, key):
+        """Returns a filesystem path the object can be served from with sendfile, or None."""
+        return None
@@ -0,0 +1,141 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from werkzeug.http import parse_range_header, parse_date, http_date
+
+from .base import StorageBackend, StoredObject, ObjectNotFound, InvalidRange
+
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalStorage(StorageBackend):
+    """
+    Stores documents on the local filesystem under a root directory.
+    document_path format: "file://<absolute root>/<key>".
+
+    Uploads are streamed into a temporary file next to the target and atomically renamed
+    into place, so a reader never sees a half-written file. Downloads are served from
+    local_path() with send_file, which the WSGI server turns into a zero-copy sendfile.
+    """
+
+    scheme = 'file'
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+
+    def _full_path(self, key):
+        full_path = os.path.realpath(os.path.join(self.root, key))
+        # Keys never contain "..", but refuse anything that would escape the storage root
+        if not full_path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return full_path
+
+    def path_for(self, key):
+        return f"file://{self._full_path(key)}"
+
+    def key_for(self, document_path):
+        path_prefix = f"file://{self.root}{os.sep}"
+        if not document_path.startswith(path_prefix):
+            raise ValueError(f"Invalid local storage path format: {document_path}")
+        return document_path[len(path_prefix):]
+
+    def _etag(self, stat_result):
+        return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+    def put(self, key, stream, content_type=None, content_encoding=None):
+        full_path = self._full_path(key)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        bytes_written = 0
+        temp_file = tempfile.NamedTemporaryFile(dir=os.path.dirname(full_path), prefix='.upload-', delete=False)
+        try:
+            with temp_file:
+                while True:
+                    chunk = stream.read(WRITE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    temp_file.write(chunk)
+                    bytes_written += len(chunk)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_file.name, full_path)
+        except BaseException:
+            os.unlink(temp_file.name)
+            raise
+
+        return bytes_written
+
+    def get(self, key):
+        try:
+            with open(self._full_path(key), 'rb') as file:
+                return file.read()
+        except FileNotFoundError as e:
+            raise ObjectNotFound(key) from e
+
+    def stream(self, key, chunk_size, range_header=None, if_range=None):
+        try:
+            file = open(self._full_path(key), 'rb')
+        except FileNotFoundError as e:
+            raise ObjectNotFound(key) from e
+
+        stat_result = os.fstat(file.fileno())
+        total_size = stat_result.st_size
+        etag = self._etag(stat_result)
+        last_modified = datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
+
+        start, end = 0, total_size
+        content_range = None
+        if range_header and self._if_range_matches(if_range, etag, last_modified):
+            byte_range = parse_range_header(range_header)
+            selected = byte_range.range_for_length(total_size) if byte_range else None
+            if selected is None:
+                file.close()
+                raise InvalidRange(range_header)
+            start, end = selected
+            content_range = f"bytes {start}-{end - 1}/{total_size}"
+
+        def read_chunks():
+            try:
+                file.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    chunk = file.read(min(chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+            finally:
+                file.close()
+
+        return StoredObject(
+            chunks=read_chunks(),
+            content_length=end - start,
+            content_range=content_range,
+            etag=etag,
+            last_modified=last_modified,
+            close=file.close
+        )
+
+    def _if_range_matches(self, if_range, etag, last_modified):
+        if not if_range:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
+        if_range_date = parse_date(if_range)
+        return if_range_date is not None and http_date(last_modified) == http_date(if_range_date)
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self._full_path(key))
+        except FileNotFoundError as e:
+            raise ObjectNotFound(key) from e
+
+    def delete(self, key):
+        try:
+            os.unlink(self._full_path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key):
+        return self._full_path(key)
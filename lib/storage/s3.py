@@ -0,0 +1,98 @@
+from botocore.exceptions import ClientError
+
+from lib import s3
+from .base import StorageBackend, StoredObject, ObjectNotFound, InvalidRange
+
+
+class S3Storage(StorageBackend):
+    """
+    Stores documents in an S3 bucket using the worker's shared, pooled S3 client.
+    document_path format: "s3://<bucket>/<key>".
+    """
+
+    scheme = 's3'
+
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+
+    @property
+    def client(self):
+        return s3.get_s3_client()
+
+    def path_for(self, key):
+        return f"s3://{self.bucket_name}/{key}"
+
+    def key_for(self, document_path):
+        return s3.key_from_path(document_path, self.bucket_name)
+
+    def put(self, key, stream, content_type=None, content_encoding=None):
+        extra_args = {'ACL': 'private'} # Access only through this app or presigned URLs
+        if content_type:
+            extra_args['ContentType'] = content_type
+        if content_encoding:
+            # S3 returns it as Content-Encoding, so presigned downloads are decoded by the browser
+            extra_args['ContentEncoding'] = content_encoding
+        return s3.upload_stream(self.client, stream, self.bucket_name, key, extra_args=extra_args)
+
+    def get(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket_name, Key=key)['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                raise ObjectNotFound(key) from e
+            raise
+
+    def stream(self, key, chunk_size, range_header=None, if_range=None):
+        try:
+            s3_response = s3.get_object_for_range(
+                self.client,
+                self.bucket_name,
+                key,
+                range_header=range_header,
+                if_range=if_range
+            )
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code in ('NoSuchKey', '404'):
+                raise ObjectNotFound(key) from e
+            if error_code == 'InvalidRange':
+                raise InvalidRange(range_header) from e
+            raise
+
+        body = s3_response['Body']
+        return StoredObject(
+            chunks=s3.iter_body(body, chunk_size),
+            content_length=s3_response['ContentLength'],
+            content_range=s3_response.get('ContentRange'),
+            etag=s3_response.get('ETag'),
+            last_modified=s3_response.get('LastModified'),
+            close=body.close
+        )
+
+    def size(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket_name, Key=key)['ContentLength']
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                raise ObjectNotFound(key) from e
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket_name, Key=key)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        # DeleteObjects accepts at most 1000 keys per call
+        for start in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': key} for key in keys[start:start + 1000]]}
+            )
+
+    def presign(self, key, expires_in, content_disposition=None, content_type=None):
+        params = {'Bucket': self.bucket_name, 'Key': key}
+        if content_disposition:
+            params['ResponseContentDisposition'] = content_disposition
+        if content_type:
+            params['ResponseContentType'] = content_type
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires_in)
@@ -0,0 +1,217 @@
+import codecs
+import zipfile
+from xml.etree import ElementTree
+
+import pypdfium2
+from flask import current_app
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
+
+from models import db, Customer, CustomerDocument, DocumentText
+from lib.processing import document_stage
+from lib.previews import same_object_filter
+from lib.search import ranked_page
+from lib.storage import local_copy, ObjectNotFound
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+TEXT_READ_SIZE = 64 * 1024
+
+# Characters shown around the first matching term in a content search result
+SNIPPET_CONTEXT = 80
+SNIPPET_LENGTH = 240
+
+
+def extract_pdf(path):
+    # Pages are loaded and released one at a time, so a large PDF is never held whole
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                text_page = page.get_textpage()
+                try:
+                    yield text_page.get_text_range() + '\n'
+                finally:
+                    text_page.close()
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+
+
+def extract_txt(path):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(path, 'rb') as text_file:
+        while True:
+            data = text_file.read(TEXT_READ_SIZE)
+            if not data:
+                break
+            yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+
+def extract_docx(path):
+    # word/document.xml is parsed as a stream, one paragraph at a time
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as xml_file:
+        parts = []
+        for _, element in ElementTree.iterparse(xml_file):
+            if element.tag == WORD_NS + 't':
+                parts.append(element.text or '')
+            elif element.tag == WORD_NS + 'tab':
+                parts.append('\t')
+            elif element.tag == WORD_NS + 'p':
+                yield ''.join(parts) + '\n'
+                parts = []
+                element.clear()
+
+
+def _sheet_number(name):
+    digits = ''.join(character for character in name if character.isdigit())
+    return int(digits) if digits else 0
+
+
+def extract_xlsx(path):
+    # Shared strings are read once, then every sheet is parsed as a stream, one row at a time
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in names:
+            with archive.open('xl/sharedStrings.xml') as xml_file:
+                for _, element in ElementTree.iterparse(xml_file):
+                    if element.tag == SHEET_NS + 'si':
+                        shared_strings.append(''.join(element.itertext()))
+                        element.clear()
+
+        sheets = sorted(
+            (name for name in names if name.startswith('xl/worksheets/sheet') and name.endswith('.xml')),
+            key=_sheet_number
+        )
+        for sheet in sheets:
+            with archive.open(sheet) as xml_file:
+                for _, element in ElementTree.iterparse(xml_file):
+                    if element.tag != SHEET_NS + 'row':
+                        continue
+                    values = []
+                    for cell in element.iter(SHEET_NS + 'c'):
+                        if cell.get('t') == 'inlineStr':
+                            values.append(''.join(cell.itertext()))
+                            continue
+                        value = cell.find(SHEET_NS + 'v')
+                        if value is None or value.text is None:
+                            continue
+                        if cell.get('t') == 's':
+                            index = int(value.text)
+                            values.append(shared_strings[index] if index < len(shared_strings) else '')
+                        else:
+                            values.append(value.text)
+                    yield ' '.join(values) + '\n'
+                    element.clear()
+
+
+# file_type -> generator of text pieces for a file on disk
+TEXT_EXTRACTORS = {
+    'pdf': extract_pdf,
+    'txt': extract_txt,
+    'docx': extract_docx,
+    'xlsx': extract_xlsx,
+}
+
+EXTRACTION_ERRORS = (zipfile.BadZipFile, KeyError, ValueError, ElementTree.ParseError, pypdfium2.PdfiumError, OSError)
+
+
+def collect_text(pieces, max_chars):
+    """
+    Joins extracted text pieces up to max_chars and returns (text, truncated).
+    Extraction stops as soon as the limit is reached, so the rest of the file is never read.
+    """
+    collected = []
+    length = 0
+    try:
+        for piece in pieces:
+            if length + len(piece) > max_chars:
+                collected.append(piece[:max_chars - length])
+                return ''.join(collected), True
+            collected.append(piece)
+            length += len(piece)
+    finally:
+        pieces.close()
+    return ''.join(collected), False
+
+
+@document_stage('text')
+def index_document_text(document):
+    """
+    Extracts the text of a new pdf/txt/docx/xlsx document into document_texts.
+    Documents that are already indexed are skipped; deduplicated copies reuse the text
+    of the document they share an object with.
+    """
+    extractor = TEXT_EXTRACTORS.get(document.file_type)
+    if extractor is None:
+        return
+    if DocumentText.query.filter_by(document_id=document.id).options(load_only(DocumentText.id)).first():
+        return
+
+    shared = DocumentText.query.join(
+        CustomerDocument, CustomerDocument.id == DocumentText.document_id
+    ).filter(same_object_filter(document), CustomerDocument.id != document.id).first()
+
+    if shared:
+        content, truncated = shared.content, shared.truncated
+    else:
+        try:
+            with local_copy(document.document_path, document.content_encoding) as path:
+                content, truncated = collect_text(extractor(path), current_app.config['TEXT_INDEX_MAX_CHARS'])
+        except ObjectNotFound:
+            current_app.logger.warning(f"Stored object for document {document.guid} is gone, no text extracted")
+            return
+        except EXTRACTION_ERRORS as e:
+            # Damaged or encrypted files will not extract on retry either
+            current_app.logger.warning(f"Could not extract text from document {document.guid}: {e}")
+            return
+
+    db.session.add(DocumentText(
+        document_id=document.id,
+        business_id=document.business_id,
+        content=content,
+        truncated=truncated
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Indexed by another worker in the meantime
+        db.session.rollback()
+
+
+def _snippet_expression(term):
+    # The text around the first occurrence of the first search term, cut in SQL so only the
+    # snippet (not the whole extracted text) is sent back for each result
+    position = func.instr(func.lower(DocumentText.content), term)
+    start = case((position > SNIPPET_CONTEXT, position - SNIPPET_CONTEXT), else_=1)
+    return func.substr(DocumentText.content, start, SNIPPET_LENGTH)
+
+
+def clean_snippet(snippet):
+    return ' '.join((snippet or '').split())
+
+
+def search_content(business_id, terms, cursor, per_page):
+    """
+    Searches the extracted text of a business's active documents.
+    Rows are (document text, document, customer guid, snippet, score) tuples.
+    """
+    query = db.session.query(DocumentText).options(
+        load_only(DocumentText.id, DocumentText.document_id)
+    ).join(
+        CustomerDocument, CustomerDocument.id == DocumentText.document_id
+    ).join(
+        Customer, Customer.id == CustomerDocument.customer_id
+    ).filter(
+        DocumentText.business_id == business_id,
+        CustomerDocument.status == 'active',
+        CustomerDocument.deleted == 0,
+        Customer.deleted == 0
+    ).add_columns(CustomerDocument, Customer.guid, _snippet_expression(terms[0]).label('snippet'))
+    return ranked_page(query, DocumentText, (DocumentText.content,), terms, cursor, per_page, match_anywhere=True)
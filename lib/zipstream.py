@@ -0,0 +1,70 @@
+import io
+import zipfile
+
+
+class _ZipSink(io.RawIOBase):
+    """
+    Write-only, non-seekable sink that zipfile writes into.
+    Bytes are handed back to the caller with drain() instead of being kept,
+    so the archive is never held in memory or on disk.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, *args):
+        # Forces zipfile into streaming mode (data descriptors after each entry)
+        raise io.UnsupportedOperation('seek')
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """
+    Builds a ZIP archive on the fly and yields it in chunks as each entry's data arrives.
+
+    `entries` is an iterable of dicts with:
+    - 'name': path of the file inside the archive
+    - 'date_time': datetime used as the entry's modification time
+    - 'size': expected uncompressed size (lets zipfile decide when ZIP64 is needed)
+    - 'compress': True to deflate the entry, False to store it as-is
+    - 'chunks': iterable of bytes with the entry's content
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode='w', allowZip64=True) as archive:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry['name'], date_time=entry['date_time'].timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if entry['compress'] else zipfile.ZIP_STORED
+            info.file_size = entry['size']
+
+            with archive.open(info, mode='w') as destination:
+                for chunk in entry['chunks']:
+                    destination.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+            data = sink.drain()
+            if data:
+                yield data
+
+    # Closing the archive writes the central directory
+    data = sink.drain()
+    if data:
+        yield data
@@ -0,0 +1,28 @@
+"""add upload status to customer_documents
+
+Revision ID: a1f3c9d27b40
+Revises:
+Create Date: 2026-10-17 09:12:44.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1f3c9d27b40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=False, server_default='active'))
+        batch_op.add_column(sa.Column('upload_id', sa.String(length=250), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.drop_column('upload_id')
+        batch_op.drop_column('status')
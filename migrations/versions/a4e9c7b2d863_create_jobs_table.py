@@ -0,0 +1,47 @@
+"""create jobs table
+
+Revision ID: a4e9c7b2d863
+Revises: f7b3d2e8a519
+Create Date: 2026-10-17 18:26:43.190572
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e9c7b2d863'
+down_revision = 'f7b3d2e8a519'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('jobs',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('guid', mysql.CHAR(length=36), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', mysql.DATETIME(), nullable=False),
+    sa.Column('locked_until', mysql.DATETIME(), nullable=True),
+    sa.Column('lock_token', mysql.CHAR(length=36), nullable=True),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('finished_at', mysql.DATETIME(), nullable=True),
+    sa.Column('created_at', mysql.DATETIME(), nullable=False),
+    sa.Column('updated_at', mysql.DATETIME(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('guid')
+    )
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_status_run_at', ['status', 'run_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_status_run_at')
+
+    op.drop_table('jobs')
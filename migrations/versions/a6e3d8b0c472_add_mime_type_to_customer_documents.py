@@ -0,0 +1,26 @@
+"""add mime_type to customer_documents
+
+Revision ID: a6e3d8b0c472
+Revises: d9a4f7c3b281
+Create Date: 2026-10-17 16:02:11.418530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e3d8b0c472'
+down_revision = 'd9a4f7c3b281'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mime_type', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.drop_column('mime_type')
@@ -0,0 +1,36 @@
+"""create document_blobs table
+
+Revision ID: b1d7e4a9c036
+Revises: c8f1e5a2d937
+Create Date: 2026-10-17 18:02:11.408215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1d7e4a9c036'
+down_revision = 'c8f1e5a2d937'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('document_blobs',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('business_id', sa.BigInteger(), nullable=False),
+    sa.Column('content_hash', mysql.CHAR(length=64), nullable=False),
+    sa.Column('document_path', sa.String(length=250), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', mysql.DATETIME(), nullable=False),
+    sa.Column('updated_at', mysql.DATETIME(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('business_id', 'content_hash', name='uq_document_blobs_business_id_content_hash')
+    )
+
+
+def downgrade():
+    op.drop_table('document_blobs')
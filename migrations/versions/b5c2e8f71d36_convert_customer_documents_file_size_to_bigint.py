@@ -0,0 +1,79 @@
+"""convert customer_documents.file_size from VARCHAR to BIGINT
+
+Revision ID: b5c2e8f71d36
+Revises: f3b8c6e92d15
+Create Date: 2026-10-17 14:22:09.518337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5c2e8f71d36'
+down_revision = 'f3b8c6e92d15'
+branch_labels = None
+depends_on = None
+
+# Rows converted per UPDATE round trip during the backfill
+BACKFILL_BATCH_SIZE = 1000
+
+customer_documents = sa.table(
+    'customer_documents',
+    sa.column('id', sa.BigInteger),
+    sa.column('file_size', sa.String(25)),
+    sa.column('file_size_bytes', sa.BigInteger),
+)
+
+
+def _parse_size(value):
+    # Sizes were always written as str(int); anything else is treated as unknown (0)
+    try:
+        return max(0, int(str(value).strip()))
+    except (TypeError, ValueError):
+        return 0
+
+
+def upgrade():
+    # 1. Add the numeric column next to the old one
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('file_size_bytes', sa.BigInteger(), nullable=True))
+
+    # 2. Backfill it in id order, one batch at a time, so no single statement locks the whole table
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(customer_documents.c.id, customer_documents.c.file_size)
+            .where(customer_documents.c.id > last_id)
+            .order_by(customer_documents.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            customer_documents.update()
+            .where(customer_documents.c.id == sa.bindparam('row_id'))
+            .values(file_size_bytes=sa.bindparam('size')),
+            [{'row_id': row.id, 'size': _parse_size(row.file_size)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+    # 3. Swap the columns
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.drop_column('file_size')
+        batch_op.alter_column('file_size_bytes', new_column_name='file_size', existing_type=sa.BigInteger(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.alter_column('file_size', new_column_name='file_size_bytes', existing_type=sa.BigInteger(), existing_nullable=False)
+
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('file_size', sa.String(length=25), nullable=True))
+
+    op.execute(customer_documents.update().values(file_size=sa.cast(customer_documents.c.file_size_bytes, sa.String(25))))
+
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.drop_column('file_size_bytes')
+        batch_op.alter_column('file_size', existing_type=sa.String(length=25), nullable=False)
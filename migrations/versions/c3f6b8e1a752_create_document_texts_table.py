@@ -0,0 +1,46 @@
+"""create document_texts table
+
+Revision ID: c3f6b8e1a752
+Revises: a4e9c7b2d863
+Create Date: 2026-10-17 18:31:20.447816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f6b8e1a752'
+down_revision = 'a4e9c7b2d863'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('document_texts',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('document_id', sa.BigInteger(), nullable=False),
+    sa.Column('business_id', sa.BigInteger(), nullable=False),
+    sa.Column('content', sa.Text().with_variant(mysql.MEDIUMTEXT(), 'mysql'), nullable=False),
+    sa.Column('truncated', sa.Boolean(), nullable=False),
+    sa.Column('created_at', mysql.DATETIME(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('document_id')
+    )
+    with op.batch_alter_table('document_texts', schema=None) as batch_op:
+        batch_op.create_index('ix_document_texts_business_id', ['business_id'], unique=False)
+
+    # FULLTEXT is MySQL-only; other databases use the LIKE fallback in lib/search.py
+    if op.get_bind().dialect.name == 'mysql':
+        op.create_index('ft_document_texts_content', 'document_texts', ['content'], unique=False, mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        op.drop_index('ft_document_texts_content', table_name='document_texts')
+
+    with op.batch_alter_table('document_texts', schema=None) as batch_op:
+        batch_op.drop_index('ix_document_texts_business_id')
+
+    op.drop_table('document_texts')
@@ -0,0 +1,29 @@
+"""add content_hash to customer_documents
+
+Revision ID: c4e8b2f61a93
+Revises: a1f3c9d27b40
+Create Date: 2026-10-17 10:03:18.552907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8b2f61a93'
+down_revision = 'a1f3c9d27b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', mysql.CHAR(length=64), nullable=True))
+        batch_op.create_index('ix_customer_documents_business_id_content_hash', ['business_id', 'content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.drop_index('ix_customer_documents_business_id_content_hash')
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,28 @@
+"""add content_encoding and original_size to customer_documents
+
+Revision ID: c8f1e5a2d937
+Revises: a6e3d8b0c472
+Create Date: 2026-10-17 17:21:45.093617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f1e5a2d937'
+down_revision = 'a6e3d8b0c472'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_encoding', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('original_size', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.drop_column('original_size')
+        batch_op.drop_column('content_encoding')
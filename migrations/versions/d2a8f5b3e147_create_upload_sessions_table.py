@@ -0,0 +1,52 @@
+"""create upload_sessions table
+
+Revision ID: d2a8f5b3e147
+Revises: b1d7e4a9c036
+Create Date: 2026-10-17 18:09:37.226840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8f5b3e147'
+down_revision = 'b1d7e4a9c036'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('upload_sessions',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('guid', mysql.CHAR(length=36), nullable=False),
+    sa.Column('business_id', sa.BigInteger(), nullable=False),
+    sa.Column('customer_id', sa.BigInteger(), nullable=False),
+    sa.Column('document_name', sa.String(length=50), nullable=False),
+    sa.Column('file_type', sa.String(length=25), nullable=False),
+    sa.Column('content_type', sa.String(length=100), nullable=True),
+    sa.Column('object_key', sa.String(length=250), nullable=False),
+    sa.Column('upload_length', sa.BigInteger(), nullable=False),
+    sa.Column('upload_offset', sa.BigInteger(), nullable=False),
+    sa.Column('upload_id', sa.String(length=250), nullable=True),
+    sa.Column('parts', sa.Text(), nullable=False),
+    sa.Column('tail_key', sa.String(length=250), nullable=True),
+    sa.Column('tail_size', sa.BigInteger(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('document_id', sa.BigInteger(), nullable=True),
+    sa.Column('expires_at', mysql.DATETIME(), nullable=False),
+    sa.Column('created_at', mysql.DATETIME(), nullable=False),
+    sa.Column('updated_at', mysql.DATETIME(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('guid')
+    )
+    with op.batch_alter_table('upload_sessions', schema=None) as batch_op:
+        batch_op.create_index('ix_upload_sessions_status_expires_at', ['status', 'expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('upload_sessions', schema=None) as batch_op:
+        batch_op.drop_index('ix_upload_sessions_status_expires_at')
+
+    op.drop_table('upload_sessions')
@@ -0,0 +1,26 @@
+"""add preview_path to customer_documents
+
+Revision ID: d9a4f7c3b281
+Revises: b5c2e8f71d36
+Create Date: 2026-10-17 15:10:37.804112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a4f7c3b281'
+down_revision = 'b5c2e8f71d36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview_path', sa.String(length=250), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.drop_column('preview_path')
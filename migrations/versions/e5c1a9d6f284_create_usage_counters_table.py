@@ -0,0 +1,37 @@
+"""create usage_counters table
+
+Revision ID: e5c1a9d6f284
+Revises: d2a8f5b3e147
+Create Date: 2026-10-17 18:15:52.671394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c1a9d6f284'
+down_revision = 'd2a8f5b3e147'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Starts empty; fill it for existing customers and documents with `flask reconcile-counters`
+    op.create_table('usage_counters',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('business_id', sa.BigInteger(), nullable=False),
+    sa.Column('customer_id', sa.BigInteger(), nullable=False),
+    sa.Column('customer_count', sa.BigInteger(), nullable=False),
+    sa.Column('document_count', sa.BigInteger(), nullable=False),
+    sa.Column('unverified_count', sa.BigInteger(), nullable=False),
+    sa.Column('total_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', mysql.DATETIME(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('business_id', 'customer_id', name='uq_usage_counters_business_id_customer_id')
+    )
+
+
+def downgrade():
+    op.drop_table('usage_counters')
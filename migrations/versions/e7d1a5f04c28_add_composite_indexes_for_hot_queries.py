@@ -0,0 +1,32 @@
+"""add composite indexes for document and customer hot queries
+
+Revision ID: e7d1a5f04c28
+Revises: c4e8b2f61a93
+Create Date: 2026-10-17 13:05:41.207614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7d1a5f04c28'
+down_revision = 'c4e8b2f61a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.create_index('ix_customer_documents_customer_listing', ['customer_id', 'business_id', 'status', 'deleted', 'created_at'], unique=False)
+
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.create_index('ix_customers_business_id_deleted_created_at', ['business_id', 'deleted', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.drop_index('ix_customers_business_id_deleted_created_at')
+
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.drop_index('ix_customer_documents_customer_listing')
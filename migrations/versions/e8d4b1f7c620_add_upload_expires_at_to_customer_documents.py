@@ -0,0 +1,39 @@
+"""add upload_expires_at to customer_documents
+
+Revision ID: e8d4b1f7c620
+Revises: c3f6b8e1a752
+Create Date: 2026-10-17 18:44:58.302117
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8d4b1f7c620'
+down_revision = 'c3f6b8e1a752'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('upload_expires_at', mysql.DATETIME(), nullable=True))
+        batch_op.create_index('ix_customer_documents_status_upload_expires_at', ['status', 'upload_expires_at'], unique=False)
+
+    # Uploads already pending get a day from now, like new ones with the default DIRECT_UPLOAD_EXPIRES
+    op.execute(
+        sa.text(
+            "UPDATE customer_documents SET upload_expires_at = :expires_at "
+            "WHERE status = 'pending' AND upload_expires_at IS NULL"
+        ).bindparams(expires_at=datetime.utcnow() + timedelta(days=1))
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('customer_documents', schema=None) as batch_op:
+        batch_op.drop_index('ix_customer_documents_status_upload_expires_at')
+        batch_op.drop_column('upload_expires_at')
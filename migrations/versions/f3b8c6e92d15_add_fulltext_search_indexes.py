@@ -0,0 +1,33 @@
+"""add fulltext search indexes on customers and customer_documents
+
+Revision ID: f3b8c6e92d15
+Revises: e7d1a5f04c28
+Create Date: 2026-10-17 13:48:09.530127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8c6e92d15'
+down_revision = 'e7d1a5f04c28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FULLTEXT is MySQL-only; other databases use the LIKE fallback in lib/search.py
+    if op.get_bind().dialect.name != 'mysql':
+        return
+
+    op.create_index('ft_customers_search', 'customers', ['firstname', 'lastname', 'email', 'phone', 'city'], unique=False, mysql_prefix='FULLTEXT')
+    op.create_index('ft_customer_documents_search', 'customer_documents', ['document_name', 'file_type'], unique=False, mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+
+    op.drop_index('ft_customer_documents_search', table_name='customer_documents')
+    op.drop_index('ft_customers_search', table_name='customers')
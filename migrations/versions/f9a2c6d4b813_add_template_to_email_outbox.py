@@ -0,0 +1,49 @@
+"""add template and customer_guid to email_outbox
+
+Revision ID: f9a2c6d4b813
+Revises: e8d4b1f7c620
+Create Date: 2026-10-17 19:12:40.582391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f9a2c6d4b813'
+down_revision = 'e8d4b1f7c620'
+branch_labels = None
+depends_on = None
+
+CREDENTIALS_SUBJECT = 'Welcome to CPA Application - Your Account Credentials'
+UNSENT_CREDENTIALS = (
+    "SELECT recipient FROM email_outbox "
+    "WHERE subject = :subject AND status IN ('pending', 'sending', 'dead') AND body IS NOT NULL"
+)
+
+
+def upgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('template', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('customer_guid', mysql.CHAR(length=36), nullable=True))
+
+    # Unsent credentials emails hold the plaintext password in their body. Their customers
+    # never received it, so the password is reset and the worker issues a new one at send time.
+    op.execute(
+        sa.text(f"UPDATE customers SET password = '!' WHERE email IN ({UNSENT_CREDENTIALS})")
+        .bindparams(subject=CREDENTIALS_SUBJECT)
+    )
+    op.execute(
+        sa.text(
+            "UPDATE email_outbox SET template = 'customer_credentials', body = NULL, html = NULL, "
+            "customer_guid = (SELECT guid FROM customers WHERE customers.email = email_outbox.recipient) "
+            "WHERE subject = :subject AND status IN ('pending', 'sending', 'dead') AND body IS NOT NULL"
+        ).bindparams(subject=CREDENTIALS_SUBJECT)
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_column('customer_guid')
+        batch_op.drop_column('template')
@@ -3,10 +3,16 @@ from sqlalchemy.dialects.mysql import CHAR
 from sqlalchemy.dialects.mysql import DATETIME
 from datetime import datetime
 from . import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from lib import passwords
 # User model
 class Customer(db.Model):
     __tablename__ = 'customers'
+    __table_args__ = (
+        # CPA customer list: a business's live customers in creation order
+        db.Index('ix_customers_business_id_deleted_created_at', 'business_id', 'deleted', 'created_at'),
+        # CPA search (MySQL FULLTEXT, see lib/search.py)
+        db.Index('ft_customers_search', 'firstname', 'lastname', 'email', 'phone', 'city', mysql_prefix='FULLTEXT'),
+    )
     id = db.Column(db.BigInteger, primary_key=True)
     guid = db.Column(CHAR(36), nullable=False, unique=True, default=lambda: str(uuid.uuid4()))
     business_id = db.Column(db.BigInteger,nullable=False)
@@ -25,11 +31,12 @@ class Customer(db.Model):
     created_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Hashing runs on the bounded process pool in lib.passwords, off the request thread
     def set_password(self, pwd):
-        self.password = generate_password_hash(pwd)
+        self.password = passwords.hash_password(pwd)
 
     def check_password(self, pwd):
-        return check_password_hash(self.password, pwd)
+        return passwords.verify_password(self.password, pwd)
     
     
     def to_dict(self,include_all=False):
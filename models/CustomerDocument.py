@@ -2,11 +2,22 @@ import uuid
 from sqlalchemy.dialects.mysql import CHAR
 from sqlalchemy.dialects.mysql import DATETIME
 from datetime import datetime
+from flask import url_for
 from . import db
 
 # CustomerDocument model
 class CustomerDocument(db.Model):
     __tablename__ = 'customer_documents'
+    __table_args__ = (
+        db.Index('ix_customer_documents_business_id_content_hash', 'business_id', 'content_hash'),
+        # Document list and ZIP export: one customer's live documents in upload order.
+        # Lookups by guid (download, delete) are served by the unique index on guid.
+        db.Index('ix_customer_documents_customer_listing', 'customer_id', 'business_id', 'status', 'deleted', 'created_at'),
+        # Cleanup of abandoned direct uploads
+        db.Index('ix_customer_documents_status_upload_expires_at', 'status', 'upload_expires_at'),
+        # CPA search (MySQL FULLTEXT, see lib/search.py)
+        db.Index('ft_customer_documents_search', 'document_name', 'file_type', mysql_prefix='FULLTEXT'),
+    )
     id = db.Column(db.BigInteger, primary_key=True)
     guid = db.Column(CHAR(36), nullable=False, unique=True, default=lambda: str(uuid.uuid4()))
     business_id = db.Column(db.BigInteger,nullable=False)
@@ -15,15 +26,30 @@ class CustomerDocument(db.Model):
     document_name = db.Column(db.String(50), nullable=False)
     document_path = db.Column(db.String(250),nullable=False)
     file_type = db.Column(db.String(25),nullable=False)
-    file_size = db.Column(db.String(25),nullable=False)
+    # Bytes held in storage; for a compressed document that is the compressed size
+    file_size = db.Column(db.BigInteger,nullable=False)
+    # 'gzip' or 'zstd' when the stored object is compressed (lib/compression.py), with the size before compression
+    content_encoding = db.Column(db.String(20),nullable=True)
+    original_size = db.Column(db.BigInteger,nullable=True)
+    # MIME type sniffed from the first bytes of the upload (lib/sniff.py); used as the stored ContentType
+    mime_type = db.Column(db.String(100),nullable=True)
+    # SHA-256 of the file content; documents with the same hash in a business share one DocumentBlob
+    content_hash = db.Column(CHAR(64),nullable=True)
+    # Storage path of the small image preview (lib/previews.py), once the background job has made it
+    preview_path = db.Column(db.String(250),nullable=True)
     verified_status = db.Column(db.Boolean,nullable=False,default=False)
+    # 'pending' while a direct-to-S3 multipart upload is in flight, 'active' once it is finalized
+    status = db.Column(db.String(20),nullable=False,default='active',server_default='active')
+    upload_id = db.Column(db.String(250),nullable=True)
+    # When a pending upload is given up on and its parts are discarded
+    upload_expires_at = db.Column(DATETIME, nullable=True)
     deleted = db.Column(db.Boolean,nullable=False,default=False)
     created_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
     
-    def to_dict(self):
+    def to_dict(self, preview_endpoint='customer_document.document_preview'):
         
         
         
@@ -31,10 +57,14 @@ class CustomerDocument(db.Model):
             'guid': self.guid,
             'documentName': self.document_name,
             'fileType': self.file_type,
-            'file_size': self.file_size,
+            # The size the customer uploaded, kept a string for existing API clients
+            'file_size': str(self.original_size if self.content_encoding else self.file_size),
             'createdAt': self.created_at.isoformat() if self.created_at else None,
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None
         }
+        if self.preview_path:
+            # Served by the customer or CPA preview route, whichever is listing the document
+            document_data['previewUrl'] = url_for(preview_endpoint, document_guid=self.guid)
                    
         return document_data
 
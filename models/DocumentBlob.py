@@ -0,0 +1,26 @@
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.dialects.mysql import DATETIME
+from datetime import datetime
+from . import db
+
+# DocumentBlob model
+# One row per distinct file content (SHA-256) stored for a business.
+# CustomerDocument rows with the same content_hash share the blob's S3 object.
+class DocumentBlob(db.Model):
+    __tablename__ = 'document_blobs'
+    __table_args__ = (
+        db.UniqueConstraint('business_id', 'content_hash', name='uq_document_blobs_business_id_content_hash'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    business_id = db.Column(db.BigInteger,nullable=False)
+    content_hash = db.Column(CHAR(64),nullable=False)
+    document_path = db.Column(db.String(250),nullable=False)
+    file_size = db.Column(db.BigInteger,nullable=False)
+    # Number of CustomerDocument rows pointing at this blob; the object is deleted when it reaches 0
+    ref_count = db.Column(db.Integer,nullable=False,default=1)
+    created_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<DocumentBlob {self.content_hash}>"
@@ -0,0 +1,22 @@
+from sqlalchemy.dialects.mysql import DATETIME, MEDIUMTEXT
+from datetime import datetime
+from . import db
+
+# DocumentText model
+# Text extracted from a document's content by the background jobs (lib/textindex.py),
+# searchable per business through the FULLTEXT index on content.
+class DocumentText(db.Model):
+    __tablename__ = 'document_texts'
+    __table_args__ = (
+        db.Index('ix_document_texts_business_id', 'business_id'),
+        # Content search (MySQL FULLTEXT, see lib/search.py)
+        db.Index('ft_document_texts_content', 'content', mysql_prefix='FULLTEXT'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    document_id = db.Column(db.BigInteger, nullable=False, unique=True)
+    business_id = db.Column(db.BigInteger, nullable=False)
+    content = db.Column(db.Text().with_variant(MEDIUMTEXT(), 'mysql'), nullable=False)
+    # True when extraction stopped at TEXT_INDEX_MAX_CHARS
+    truncated = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow)
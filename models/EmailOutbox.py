@@ -0,0 +1,39 @@
+import uuid
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.dialects.mysql import DATETIME
+from datetime import datetime
+from . import db
+
+# EmailOutbox model
+# Emails written by the routes in their own transaction and delivered later by the
+# `flask send-emails` worker (see lib/outbox.py).
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # The worker picks due messages by status and next attempt time
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    guid = db.Column(CHAR(36), nullable=False, unique=True, default=lambda: str(uuid.uuid4()))
+
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    # Literal content of plain messages. Never put secrets here: emails carrying credentials
+    # use a template instead and are only rendered by the worker when they are sent.
+    body = db.Column(db.Text, nullable=True)
+    html = db.Column(db.Text, nullable=True)
+    # Template rendered at send time (see lib/outbox.py TEMPLATES), with the customer it is about
+    template = db.Column(db.String(50), nullable=True)
+    customer_guid = db.Column(CHAR(36), nullable=True)
+
+    # 'pending', 'sending' (claimed by a worker until locked_until), 'sent', 'dead' or
+    # 'cancelled' (the customer a template message was for no longer exists)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(DATETIME, nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    sent_at = db.Column(DATETIME, nullable=True)
+    created_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
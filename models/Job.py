@@ -0,0 +1,34 @@
+import uuid
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.dialects.mysql import DATETIME
+from datetime import datetime
+from . import db
+
+# Job model
+# Background work queued with lib.jobs.enqueue() and run by the `flask run-jobs` worker.
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # The worker picks due jobs by status and run time
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    guid = db.Column(CHAR(36), nullable=False, unique=True, default=lambda: str(uuid.uuid4()))
+    # Handler name, e.g. 'document.process'
+    kind = db.Column(db.String(50), nullable=False)
+    # JSON arguments for the handler
+    payload = db.Column(db.Text, nullable=False, default='{}')
+
+    # 'queued', 'running' (claimed until locked_until), 'succeeded' or 'failed' (out of attempts)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(DATETIME, nullable=True)
+    # Changes on every claim, so a worker whose claim expired cannot overwrite a newer attempt
+    lock_token = db.Column(CHAR(36), nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    finished_at = db.Column(DATETIME, nullable=True)
+    created_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
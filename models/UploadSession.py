@@ -0,0 +1,42 @@
+import uuid
+from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy.dialects.mysql import DATETIME
+from datetime import datetime
+from . import db
+
+# UploadSession model
+# Tracks a resumable upload. Full parts go into an S3 multipart upload; bytes that do
+# not yet fill a part are kept in a small "tail" object until the next chunk arrives.
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    __table_args__ = (
+        db.Index('ix_upload_sessions_status_expires_at', 'status', 'expires_at'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    guid = db.Column(CHAR(36), nullable=False, unique=True, default=lambda: str(uuid.uuid4()))
+    business_id = db.Column(db.BigInteger,nullable=False)
+    customer_id = db.Column(db.BigInteger,nullable=False)
+
+    document_name = db.Column(db.String(50), nullable=False)
+    file_type = db.Column(db.String(25),nullable=False)
+    content_type = db.Column(db.String(100),nullable=True)
+    object_key = db.Column(db.String(250),nullable=False)
+    upload_length = db.Column(db.BigInteger,nullable=False)
+    upload_offset = db.Column(db.BigInteger,nullable=False,default=0)
+
+    upload_id = db.Column(db.String(250),nullable=True)
+    # JSON list of {"PartNumber", "ETag"} for the parts already in the multipart upload
+    parts = db.Column(db.Text,nullable=False,default='[]')
+    tail_key = db.Column(db.String(250),nullable=True)
+    tail_size = db.Column(db.BigInteger,nullable=False,default=0)
+
+    # 'active', 'completed', 'aborted' or 'expired'
+    status = db.Column(db.String(20),nullable=False,default='active')
+    document_id = db.Column(db.BigInteger,nullable=True)
+    expires_at = db.Column(DATETIME, nullable=False)
+    created_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<UploadSession {self.guid}>"
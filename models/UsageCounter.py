@@ -0,0 +1,39 @@
+from sqlalchemy.dialects.mysql import DATETIME
+from datetime import datetime
+from . import db
+
+# UsageCounter model
+# Running totals per business (customer_id = 0) and per customer, kept up to date in the
+# same transaction as the change they count, so list totals and dashboards are one row read.
+# Rebuild from scratch with `flask reconcile-counters`.
+class UsageCounter(db.Model):
+    __tablename__ = 'usage_counters'
+    __table_args__ = (
+        db.UniqueConstraint('business_id', 'customer_id', name='uq_usage_counters_business_id_customer_id'),
+    )
+
+    # customer_id used for the business-wide row
+    BUSINESS_ROW = 0
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    business_id = db.Column(db.BigInteger,nullable=False)
+    customer_id = db.Column(db.BigInteger,nullable=False,default=0)
+    # Live (not soft-deleted) customers; only maintained on the business row
+    customer_count = db.Column(db.BigInteger,nullable=False,default=0)
+    # Active, not soft-deleted documents
+    document_count = db.Column(db.BigInteger,nullable=False,default=0)
+    unverified_count = db.Column(db.BigInteger,nullable=False,default=0)
+    # Bytes as uploaded, before compression at rest (the unit of the storage quotas)
+    total_bytes = db.Column(db.BigInteger,nullable=False,default=0)
+    updated_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'customerCount': self.customer_count,
+            'documentCount': self.document_count,
+            'unverifiedCount': self.unverified_count,
+            'totalBytes': self.total_bytes
+        }
+
+    def __repr__(self):
+        return f"<UsageCounter {self.business_id}/{self.customer_id}>"
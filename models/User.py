@@ -5,7 +5,7 @@ from datetime import datetime  # Add this for using datetime.utcnow if needed
 
 from flask_sqlalchemy import SQLAlchemy
 from . import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from lib import passwords
 from sqlalchemy import text # <--- ADD THIS LINE
 # User model
 class User(db.Model):
@@ -23,11 +23,12 @@ class User(db.Model):
     created_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow, server_default=text('CURRENT_TIMESTAMP'))
     updated_at = db.Column(DATETIME, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=text('CURRENT_TIMESTAMP'))
 
+    # Hashing runs on the bounded process pool in lib.passwords, off the request thread
     def set_password(self, pwd):
-        self.password = generate_password_hash(pwd)
+        self.password = passwords.hash_password(pwd)
 
     def check_password(self, pwd):
-        return check_password_hash(self.password, pwd)
+        return passwords.verify_password(self.password, pwd)
 
 def __repr__(self):
         return f"<User {self.email}>"
\ No newline at end of file
@@ -6,3 +6,9 @@ from .User import User
 from .Business import Business
 from .Customer import Customer
 from .CustomerDocument import CustomerDocument
+from .DocumentBlob import DocumentBlob
+from .UploadSession import UploadSession
+from .UsageCounter import UsageCounter
+from .EmailOutbox import EmailOutbox
+from .Job import Job
+from .DocumentText import DocumentText
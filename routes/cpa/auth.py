@@ -1,10 +1,13 @@
 import re
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy.exc import SQLAlchemyError
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/cpa')
 
 from models import User, Business,db
 from flask_jwt_extended import create_access_token
+from lib.identity import identity_claims
+from lib import passwords
 
 
 # --- Registration API Endpoint ---
@@ -93,6 +96,10 @@ def signup():
         # Return success response
         return jsonify({"statuscode": 201, "message": "User registered successfully"}), 201
 
+    except passwords.PasswordHasherBusy:
+        # Answered with 503 + Retry-After by the handler in lib/passwords.py
+        db.session.rollback()
+        raise
     except Exception as e:
         # Rollback in case of database error
         db.session.rollback()
@@ -125,6 +132,15 @@ def login():
     if not user.check_password(requestpassword):
         return jsonify({"msg": "Bad email or password"}), 401
 
+    # Upgrade hashes made with older PASSWORD_HASH_METHOD settings while we have the plain password
+    if passwords.needs_rehash(user.password):
+        try:
+            user.set_password(requestpassword)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(f"Failed to upgrade password hash for {user.guid}: {e}")
+
      # Prepare user information to send back to the client
     user_info = {
         "guid": user.guid,
@@ -134,7 +150,8 @@ def login():
         "phone": user.phone 
     }
 
-    additional_claims = {"user_type": "cpa"} 
+    # Numeric ids are signed into the token so authenticated routes can skip the GUID lookup
+    additional_claims = identity_claims("cpa", user)
 
     access_token = create_access_token(identity=user.guid, additional_claims=additional_claims)
 
@@ -1,12 +1,24 @@
 import re
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity 
+import csv
+import io
+import uuid
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required
 
 cpa_customer_bp = Blueprint('cpa_customer', __name__, url_prefix='/cpa')
 
-from models import  Customer,User,db
-from lib import helpers
-from datetime import datetime
+from models import  Customer,User,CustomerDocument,db
+from lib import helpers, counters, search, outbox, passwords, previews, textindex, compression
+from lib.storage import prefetch_streams, ObjectNotFound
+from lib.identity import current_cpa_user, invalidate_identity
+from lib.pagination import keyset_page
+from lib.zipstream import stream_zip
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+# File types that are already compressed; deflating them again only burns CPU
+PRECOMPRESSED_FILE_TYPES = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'docx', 'xlsx', 'pptx'}
 
 
 # Customer list API
@@ -14,9 +26,10 @@ from datetime import datetime
 @jwt_required() 
 def list():
     """
-    Handles new customer registration.
-    Expects JSON payload with  'firstName', 'lastName', 'email',
-    'phone', 'address', 'password', 'passwordConfirmation'.
+    Lists the live customers of the CPA's business, oldest first.
+
+    Pass 'cursor' (empty for the first page) for keyset pagination with 'next_cursor',
+    or 'page' for the legacy page-number mode. Both accept 'perPage' (max 100).
     """
 
     page = request.args.get('page', 1, type=int)
@@ -24,16 +37,40 @@ def list():
     
     if per_page > 100: 
         per_page = 100
+    if per_page < 1:
+        per_page = 10
         
-    current_user_id = get_jwt_identity()
-    current_user = User.query.filter_by(guid=current_user_id).first() 
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
  
  
     try:
-        customerLists = Customer.query.filter_by(
+        customers_query = Customer.query.filter_by(
                         business_id=current_user.business_id,
                         deleted=0
-                    ).paginate(page=page, per_page=per_page, error_out=False)
+                    )
+
+        # Cursor mode: pass 'cursor' (empty for the first page); the total is opt-in via 'includeTotal=true'
+        if 'cursor' in request.args:
+            try:
+                customers, pagination = keyset_page(customers_query, Customer, request.args.get('cursor'), per_page)
+            except ValueError:
+                return jsonify({"statuscode": 400, "message": "Invalid 'cursor'."}), 400
+
+            if request.args.get('includeTotal', 'false').lower() == 'true':
+                pagination['total_items'] = counters.get_counters(current_user.business_id).customer_count
+
+            return jsonify({
+                'customers': [customer.to_dict() for customer in customers],
+                'pagination': pagination,
+                'message': 'Customers fetched successfully',
+                'status': 200
+            }), 200
+
+        # The total comes from the maintained counters instead of a COUNT(*) per page
+        customerLists = customers_query.order_by(Customer.created_at, Customer.id).paginate(page=page, per_page=per_page, error_out=False, count=False)
+        customerLists.total = counters.get_counters(current_user.business_id).customer_count
    
    
         # Prepare customer data for JSON serialization
@@ -73,8 +110,9 @@ def list():
 @cpa_customer_bp.route('/customer-show/<string:customer_guid>', methods=['GET'])
 @jwt_required() 
 def show(customer_guid):
-    current_user_id = get_jwt_identity()
-    current_user = User.query.filter_by(guid=current_user_id).first() 
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
     
     try:
         customer = Customer.query.filter_by(
@@ -95,6 +133,62 @@ def show(customer_guid):
 
 
 
+# Column sizes of the customers table, so bad input is rejected before it reaches the database
+CUSTOMER_FIELD_MAX_LENGTHS = {
+    'firstName': 25,
+    'lastName': 25,
+    'email': 50,
+    'phone': 20,
+    'streetAddress': 100,
+    'city': 25,
+}
+
+def validate_customer_data(data):
+    """
+    Validates the customer fields shared by create, update and CSV import.
+    Returns a dict of field errors, empty when the data is valid.
+    """
+    errors = {}
+
+    if not data.get('firstName'):
+        errors['firstName'] = 'First name is required.'
+    if not data.get('lastName'):
+        errors['lastName'] = 'Last name is required.'
+
+    email = data.get('email')
+    if not email:
+        errors['email'] = 'Email address is required.'
+    elif not re.match(r"[^@]+@[^@]+\.[^@]+", email):
+        errors['email'] = 'Email address is invalid.'
+
+    if not data.get('phone'):
+        errors['phone'] = 'Phone is required.'
+
+    if not data.get('streetAddress'):
+        errors['streetAddress'] = 'streetAddress is required.'
+
+    if not data.get('city'):
+        errors['city'] = 'City is required.'
+
+    state = data.get('state')
+    if not state:
+        errors['state'] = 'State is required.'
+    elif len(state) != 2:
+        errors['state'] = 'State must be a 2-character abbreviation.'
+
+    zip_code = data.get('zipCode')
+    if not zip_code:
+        errors['zipCode'] = 'zip code is required.'
+    elif len(zip_code) != 5:
+        errors['zipCode'] = 'Zip code must be a 5-characters long.'
+
+    for field, max_length in CUSTOMER_FIELD_MAX_LENGTHS.items():
+        if field not in errors and data.get(field) and len(data[field]) > max_length:
+            errors[field] = f"{field} must be at most {max_length} characters."
+
+    return errors
+
+
 # --- Registration  of customer  ---
 @cpa_customer_bp.route('/create-customer', methods=['POST'])
 @jwt_required() 
@@ -106,10 +200,9 @@ def store():
     """
 
  
-    current_user_id = get_jwt_identity()
-    print(f"[DEBUG] JWT Identity (current_user_id): {current_user_id}") 
-    current_user = User.query.filter_by(guid=current_user_id).first() 
-    print(f"[DEBUG] Retrieved current_user object: {current_user}") 
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
 
 
     data = request.get_json()
@@ -123,42 +216,9 @@ def store():
     city = data.get('city')
     state = data.get('state')
     zip_code = data.get('zipCode')
-    pwd = helpers.generate_random_string(8)
 
     # Server-side Validation
-    errors = {}
-
-
-    if not first_name:
-        errors['firstName'] = 'First name is required.'
-    if not last_name:
-        errors['lastName'] = 'Last name is required.'
-
-    if not email:
-        errors['email'] = 'Email address is required.'
-    elif not re.match(r"[^@]+@[^@]+\.[^@]+", email):
-        errors['email'] = 'Email address is invalid.'
-
-    if not phone:
-        errors['phone'] = 'Phone is required.'
-   
-    if not street_address:
-        errors['streetAddress'] = 'streetAddress is required.'
-        
-    if not city:
-        errors['city'] = 'City is required.'
-        
-    if not state:
-        errors['state'] = 'State is required.'
-        
-    if len(state) != 2:
-        errors['state'] = 'State must be a 2-character abbreviation.'
-        
-    if not zip_code:
-        errors['zipCode'] = 'zip code is required.'
-    
-    if len(zip_code) != 5:
-        errors['state'] = 'Zip code must be a 5-characters long.'
+    errors = validate_customer_data(data)
     # If any validation errors, return them
     if errors:
         return jsonify({"statuscode": 422, "errors": errors, "message": "Validation failed"}), 400
@@ -184,15 +244,18 @@ def store():
 
         )
 
-       
-        new_customer.set_password(pwd) # Hash and set the password
+
+        # The password is generated and set by the outbox worker when it sends the credentials email
+        new_customer.password = passwords.UNUSABLE_PASSWORD
 
         # Add to session and commit to database
         db.session.add(new_customer)
+        db.session.flush() # Assigns new_customer.guid for the outbox row
+        counters.adjust_customer_count(current_user.business_id, 1)
+        # Written with the customer; the outbox worker sends it after the commit
+        outbox.enqueue_credentials_email(email, new_customer.guid)
     
         db.session.commit()
-        
-        helpers.sendCustomerCredentialsEmail(email,pwd)
 
         # Return success response
         return jsonify({"statuscode": 201, "message": "Customer registered successfully"}), 201
@@ -205,6 +268,159 @@ def store():
         return jsonify({"statuscode": 500, "message": "An internal server error occurred during registration."}), 500
 
 
+# --- Bulk import of customers from CSV ---
+CUSTOMER_IMPORT_COLUMNS = ('firstName', 'lastName', 'email', 'phone', 'streetAddress', 'city', 'state', 'zipCode')
+
+@cpa_customer_bp.route('/import-customers', methods=['POST'])
+@jwt_required() 
+def import_customers():
+    """
+    Creates customers in bulk from an uploaded CSV file ('file' form field).
+
+    The header row must contain firstName, lastName, email, phone, streetAddress, city,
+    state and zipCode. Rows are validated with the same rules as create-customer and
+    processed in batches of CUSTOMER_IMPORT_BATCH_SIZE:
+    1. one query checks the batch's emails against existing customers
+    2. the batch is inserted with one statement and committed
+    3. credential emails are written to the outbox with the batch; the outbox worker
+       generates and hashes the passwords when it sends them
+    Returns a per-row report (row numbers count the header as row 1).
+    """
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
+
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({"statuscode": 400, "message": "No CSV file provided."}), 400
+
+    # The upload is read row by row, never loaded into memory as a whole
+    reader = csv.DictReader(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''))
+    try:
+        missing_columns = [column for column in CUSTOMER_IMPORT_COLUMNS if column not in (reader.fieldnames or [])]
+    except (UnicodeDecodeError, csv.Error):
+        return jsonify({"statuscode": 400, "message": "The file is not a valid UTF-8 CSV file."}), 400
+    if missing_columns:
+        return jsonify({"statuscode": 422, "message": f"Missing CSV columns: {', '.join(missing_columns)}"}), 422
+
+    batch_size = current_app.config['CUSTOMER_IMPORT_BATCH_SIZE']
+    max_rows = current_app.config['CUSTOMER_IMPORT_MAX_ROWS']
+    results = []
+    seen_emails = set()
+    skipped_rows = 0
+
+    def import_batch(batch):
+        # 1. Validate, and drop emails repeated within the file or already registered
+        batch_emails = {data['email'] for _, data in batch if data.get('email')}
+        registered = {
+            email.lower() for (email,) in db.session.query(Customer.email).filter(Customer.email.in_(batch_emails))
+        } if batch_emails else set()
+
+        valid = []
+        for row_number, data in batch:
+            errors = validate_customer_data(data)
+            email_key = (data.get('email') or '').lower()
+            if 'email' not in errors:
+                if email_key in registered:
+                    errors['email'] = 'Email address is already registered.'
+                elif email_key in seen_emails:
+                    errors['email'] = 'Email address appears more than once in the file.'
+            if errors:
+                results.append({"row": row_number, "email": data.get('email'), "status": "failed", "errors": errors})
+                continue
+            seen_emails.add(email_key)
+            valid.append((row_number, data))
+
+        if not valid:
+            return
+
+        # 2. One INSERT for the whole batch, counted in the same transaction
+        now = datetime.utcnow()
+        rows = []
+        for row_number, data in valid:
+            rows.append({
+                "guid": str(uuid.uuid4()),
+                "business_id": current_user.business_id,
+                "firstname": data['firstName'],
+                "lastname": data['lastName'],
+                "email": data['email'],
+                "password": passwords.UNUSABLE_PASSWORD,
+                "phone": data['phone'],
+                "street_address": data['streetAddress'],
+                "city": data['city'],
+                "state": data['state'],
+                "zip_code": data['zipCode'],
+                "deleted": False,
+                "account_verified": True,
+                "created_at": now,
+                "updated_at": now
+            })
+
+        try:
+            db.session.execute(insert(Customer), rows)
+            counters.adjust_customer_count(current_user.business_id, len(rows))
+            # Credentials emails are written with the batch and sent by the outbox worker
+            for row in rows:
+                outbox.enqueue_credentials_email(row['email'], row['guid'])
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(f"Database error importing customers (rows {valid[0][0]}-{valid[-1][0]}): {e}")
+            for row_number, data in valid:
+                results.append({"row": row_number, "email": data['email'], "status": "failed", "errors": {"database": "Could not save this batch."}})
+            return
+
+        for (row_number, data), row in zip(valid, rows):
+            results.append({"row": row_number, "email": data['email'], "status": "created", "guid": row['guid']})
+
+    batch = []
+    read_error = None
+    try:
+        for row_number, row in enumerate(reader, start=2):
+            if row_number - 1 > max_rows:
+                skipped_rows += 1
+                continue
+            data = {column: (row.get(column) or '').strip() for column in CUSTOMER_IMPORT_COLUMNS}
+            batch.append((row_number, data))
+            if len(batch) >= batch_size:
+                import_batch(batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Keep what was read so far; the report says where reading stopped
+        read_error = str(e)
+    if batch:
+        import_batch(batch)
+
+    results.sort(key=lambda result: result['row'])
+    created_count = sum(1 for result in results if result['status'] == 'created')
+    failed_count = len(results) - created_count
+
+    if not results and not read_error:
+        return jsonify({"statuscode": 422, "message": "The CSV file has no customer rows."}), 422
+
+    if read_error:
+        status_code, message = 400, f"The CSV file could not be read after row {results[-1]['row'] if results else 1}: {read_error}"
+    elif failed_count == 0 and not skipped_rows:
+        status_code, message = 201, "All customers imported successfully."
+    elif created_count:
+        status_code, message = 207, "Some customers could not be imported."
+    else:
+        status_code, message = 422, "No customers were imported."
+
+    response_data = {
+        "statuscode": status_code,
+        "message": message,
+        "created_count": created_count,
+        "failed_count": failed_count,
+        "results": results
+    }
+    if skipped_rows:
+        response_data["skipped_rows"] = skipped_rows
+        response_data["message"] += f" Only the first {max_rows} rows are imported per file."
+
+    return jsonify(response_data), status_code
+
+
 # --- Update  of customer  ---
 @cpa_customer_bp.route('/update-customer/<string:customer_guid>', methods=['PUT','PATCH'])
 @jwt_required() 
@@ -216,10 +432,9 @@ def update(customer_guid):
     """
 
  
-    current_user_id = get_jwt_identity()
-    print(f"[DEBUG] JWT Identity (current_user_id): {current_user_id}") 
-    current_user = User.query.filter_by(guid=current_user_id).first() 
-    print(f"[DEBUG] Retrieved current_user object: {current_user}") 
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
 
     customer = Customer.query.filter_by(guid=customer_guid,business_id=current_user.business_id,deleted=0).first()
 
@@ -241,42 +456,9 @@ def update(customer_guid):
     city = data.get('city')
     state = data.get('state')
     zip_code = data.get('zipCode')
-    pwd = helpers.generate_random_string(8)
 
     # Server-side Validation
-    errors = {}
-
-
-    if not first_name:
-        errors['firstName'] = 'First name is required.'
-    if not last_name:
-        errors['lastName'] = 'Last name is required.'
-
-    if not email:
-        errors['email'] = 'Email address is required.'
-    elif not re.match(r"[^@]+@[^@]+\.[^@]+", email):
-        errors['email'] = 'Email address is invalid.'
-
-    if not phone:
-        errors['phone'] = 'Phone is required.'
-   
-    if not street_address:
-        errors['streetAddress'] = 'streetAddress is required.'
-        
-    if not city:
-        errors['city'] = 'City is required.'
-        
-    if not state:
-        errors['state'] = 'State is required.'
-        
-    if len(state) != 2:
-        errors['state'] = 'State must be a 2-character abbreviation.'
-        
-    if not zip_code:
-        errors['zipCode'] = 'zip code is required.'
-    
-    if len(zip_code) != 5:
-        errors['state'] = 'Zip code must be a 5-characters long.'
+    errors = validate_customer_data(data)
   
   
     existing_customer_with_email = Customer.query.filter(
@@ -304,11 +486,7 @@ def update(customer_guid):
         customer.zip_code = zip_code 
         customer.updated_at = datetime.utcnow()
 
-        # Add to session and commit to database
-    
         db.session.commit()
-        
-        helpers.sendCustomerCredentialsEmail(email,pwd)
 
         # Return success response
         return jsonify({"statuscode": 201, "message": "Customer registered successfully"}), 201
@@ -320,3 +498,340 @@ def update(customer_guid):
         # Return a generic server error
         return jsonify({"statuscode": 500, "message": "An internal server error occurred during registration."}), 500
 
+
+
+# --- Soft-delete of customer ---
+@cpa_customer_bp.route('/delete-customer/<string:customer_guid>', methods=['DELETE'])
+@jwt_required() 
+def delete(customer_guid):
+    """
+    Soft-deletes a customer of the CPA's business. The customer's tokens stop working
+    right away in this worker; other workers drop the cached identity within IDENTITY_CACHE_TTL.
+    """
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
+
+    customer = Customer.query.filter_by(guid=customer_guid,business_id=current_user.business_id,deleted=0).first()
+
+    if not customer:
+        return jsonify({
+            'message': 'Customer not found or does not belong to your business.',
+            'status': 404
+        }), 404
+
+    try:
+        customer.deleted = True
+        customer.updated_at = datetime.utcnow()
+        counters.adjust_customer_count(customer.business_id, -1)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error deleting customer {customer_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "An internal server error occurred while deleting the customer."}), 500
+
+    invalidate_identity('customer', customer_guid)
+
+    return jsonify({"statuscode": 200, "message": "Customer deleted successfully"}), 200
+
+
+# --- Verification of a customer document ---
+@cpa_customer_bp.route('/verify-document/<string:document_guid>', methods=['PATCH'])
+@jwt_required() 
+def verify_document(document_guid):
+    """
+    Marks a document of the CPA's business as verified or unverified.
+    Expects JSON payload with 'verified': true or false.
+    """
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
+
+    data = request.get_json(silent=True) or {}
+    verified = data.get('verified')
+    if not isinstance(verified, bool):
+        return jsonify({"statuscode": 422, "message": "'verified' must be true or false."}), 422
+
+    try:
+        document = CustomerDocument.query.filter_by(
+                    guid=document_guid,
+                    business_id=current_user.business_id,
+                    status='active',
+                    deleted=0
+                ).with_for_update().first()
+
+        if not document:
+            return jsonify({"statuscode": 404, "message": "Document not found or does not belong to your business."}), 404
+
+        if bool(document.verified_status) != verified:
+            document.verified_status = verified
+            counters.adjust_document_counters(document.business_id, document.customer_id, unverified=-1 if verified else 1)
+            db.session.commit()
+
+        return jsonify({"statuscode": 200, "message": "Document verification updated.", "verified": verified}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error updating verification of document {document_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "An internal server error occurred while updating the document."}), 500
+
+
+# --- Business / customer summary ---
+@cpa_customer_bp.route('/summary', methods=['GET'])
+@jwt_required() 
+def summary():
+    """
+    Returns the customer, document, unverified document and byte totals of the CPA's business,
+    or of one customer with the 'customerGuid' query parameter. Read from the maintained
+    usage counters, so it is a single-row lookup whatever the size of the business.
+    """
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
+
+    customer_guid = request.args.get('customerGuid')
+    if customer_guid:
+        customer = Customer.query.filter_by(guid=customer_guid, business_id=current_user.business_id, deleted=0).first()
+        if not customer:
+            return jsonify({
+                'message': 'Customer not found or does not belong to your business.',
+                'status': 404
+            }), 404
+        summary_data = counters.get_counters(current_user.business_id, customer.id).to_dict()
+        # Customer counts only exist at business level
+        summary_data.pop('customerCount')
+    else:
+        summary_data = counters.get_counters(current_user.business_id).to_dict()
+
+    return jsonify({
+        'summary': summary_data,
+        'message': 'Summary fetched successfully',
+        'status': 200
+    }), 200
+
+
+# --- Search across customers and documents ---
+SEARCH_TYPES = ('all', 'customers', 'documents', 'content')
+
+@cpa_customer_bp.route('/search', methods=['GET'])
+@jwt_required() 
+def search_business():
+    """
+    Ranked prefix search over the business's customers (name, email, phone, city) and
+    documents (name, file type), or over the text inside the documents.
+
+    Query parameters:
+    - 'q': search text; every word must match the start of a word in one of the fields
+    - 'type': 'all' (default, first page of customers and documents), 'customers', 'documents'
+      or 'content' (extracted text of pdf/txt/docx/xlsx documents, with a snippet per match)
+    - 'cursor': the 'next_cursor' of a previous page, together with a 'type' other than all
+    - 'perPage': results per type (default 10, max 100)
+    """
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
+
+    terms = search.search_terms(request.args.get('q'))
+    if not terms:
+        return jsonify({"statuscode": 422, "message": "'q' must contain at least one word."}), 422
+
+    search_type = request.args.get('type', 'all')
+    if search_type not in SEARCH_TYPES:
+        return jsonify({"statuscode": 400, "message": f"Invalid search type. Allowed types: {', '.join(SEARCH_TYPES)}"}), 400
+
+    cursor = request.args.get('cursor')
+    if cursor and search_type == 'all':
+        return jsonify({"statuscode": 400, "message": "'cursor' needs 'type' customers, documents or content."}), 400
+
+    per_page = request.args.get('perPage', 10, type=int)
+    per_page = min(max(per_page, 1), 100)
+
+    response_data = {'pagination': {}, 'message': 'Search results fetched successfully', 'status': 200}
+    try:
+        if search_type in ('all', 'customers'):
+            results, pagination = search.search_customers(current_user.business_id, terms, cursor, per_page)
+            response_data['customers'] = [
+                dict(customer.to_dict(), score=float(score)) for customer, score in results
+            ]
+            response_data['pagination']['customers'] = pagination
+
+        if search_type in ('all', 'documents'):
+            results, pagination = search.search_documents(current_user.business_id, terms, cursor, per_page)
+            response_data['documents'] = [
+                dict(document.to_dict(preview_endpoint='cpa_customer.document_preview'), customerGuid=customer_guid, score=float(score))
+                for document, customer_guid, score in results
+            ]
+            response_data['pagination']['documents'] = pagination
+
+        if search_type == 'content':
+            results, pagination = textindex.search_content(current_user.business_id, terms, cursor, per_page)
+            response_data['documents'] = [
+                dict(
+                    document.to_dict(preview_endpoint='cpa_customer.document_preview'),
+                    customerGuid=customer_guid,
+                    snippet=textindex.clean_snippet(snippet),
+                    score=float(score)
+                )
+                for document_text, document, customer_guid, snippet, score in results
+            ]
+            response_data['pagination']['documents'] = pagination
+
+    except ValueError:
+        return jsonify({"statuscode": 400, "message": "Invalid 'cursor'."}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error searching business {current_user.business_id}: {e}")
+        return jsonify({"statuscode": 500, "message": "An error occurred while searching."}), 500
+
+    return jsonify(response_data), 200
+
+
+@cpa_customer_bp.route('/document-preview/<string:document_guid>', methods=['GET'])
+@jwt_required() 
+def document_preview(document_guid):
+    """
+    Returns the small preview image of any document of the CPA's business.
+    """
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
+
+    try:
+        document = CustomerDocument.query.filter_by(
+            guid=document_guid,
+            business_id=current_user.business_id,
+            status='active',
+            deleted=0
+        ).first()
+
+        if not document or not document.preview_path:
+            return jsonify({"statuscode": 404, "message": "Preview not found."}), 404
+
+        return previews.preview_response(document)
+
+    except ObjectNotFound:
+        current_app.logger.error(f"Stored preview missing for document {document_guid}: {document.preview_path}")
+        return jsonify({"statuscode": 404, "message": "Preview not found."}), 404
+    except Exception as e:
+        current_app.logger.error(f"Error serving preview of document {document_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Error retrieving the preview."}), 500
+
+
+# --- Download all documents of a customer as a ZIP ---
+@cpa_customer_bp.route('/customer-documents-zip/<string:customer_guid>', methods=['GET'])
+@jwt_required() 
+def download_documents_zip(customer_guid):
+    """
+    Streams every active document of a customer as a single ZIP archive.
+
+    Optional query parameters:
+    - 'createdFrom' / 'createdTo': YYYY-MM-DD bounds on the upload date (inclusive)
+    - 'verified': 'true' or 'false' to filter on verified_status
+    Objects are opened from storage with a bounded prefetch and written straight into the
+    response, so memory stays flat and nothing is written to disk however large the archive is.
+    """
+    current_user = current_cpa_user()
+    if not current_user:
+        return jsonify({"statuscode": 404, "message": "Authenticated user not found."}), 404
+
+    customer = Customer.query.filter_by(
+                    guid=customer_guid,
+                    business_id=current_user.business_id,
+                    deleted=0
+                ).first()
+
+    if not customer:
+        return jsonify({
+            'message': 'Customer not found or does not belong to your business.',
+            'status': 404
+        }), 404
+
+    query = CustomerDocument.query.filter_by(
+                customer_id=customer.id,
+                business_id=customer.business_id,
+                status='active',
+                deleted=0
+            )
+
+    # Optional filters
+    try:
+        if request.args.get('createdFrom'):
+            query = query.filter(CustomerDocument.created_at >= datetime.strptime(request.args['createdFrom'], '%Y-%m-%d'))
+        if request.args.get('createdTo'):
+            created_to = datetime.strptime(request.args['createdTo'], '%Y-%m-%d') + timedelta(days=1)
+            query = query.filter(CustomerDocument.created_at < created_to)
+    except ValueError:
+        return jsonify({"statuscode": 400, "message": "'createdFrom' and 'createdTo' must be dates in YYYY-MM-DD format."}), 400
+
+    verified = request.args.get('verified')
+    if verified is not None:
+        if verified.lower() not in ('true', 'false'):
+            return jsonify({"statuscode": 400, "message": "'verified' must be 'true' or 'false'."}), 400
+        query = query.filter(CustomerDocument.verified_status == (verified.lower() == 'true'))
+
+    documents = query.order_by(CustomerDocument.created_at, CustomerDocument.id).all()
+    if not documents:
+        return jsonify({"statuscode": 404, "message": "No documents found for this customer."}), 404
+
+    chunk_size = current_app.config['S3_DOWNLOAD_CHUNK_SIZE']
+    logger = current_app.logger
+
+    document_paths = [document.document_path for document in documents]
+    documents_by_path = {}
+    for document in documents:
+        documents_by_path.setdefault(document.document_path, []).append(document)
+
+    def zip_entries():
+        used_names = set()
+        missing = []
+        fetched = prefetch_streams(document_paths, chunk_size, current_app.config['ZIP_PREFETCH_DEPTH'])
+
+        for document_path, stored_object in fetched:
+            document = documents_by_path[document_path].pop(0)
+            if isinstance(stored_object, Exception):
+                logger.error(f"Could not fetch {document_path} for ZIP export: {stored_object}")
+                missing.append(document.document_name)
+                continue
+
+            # Compressed documents are decompressed into the archive, which deflates them again
+            yield {
+                'name': zip_entry_name(document, used_names),
+                'date_time': document.created_at,
+                'size': document.original_size if document.content_encoding else stored_object.content_length,
+                'compress': document.file_type not in PRECOMPRESSED_FILE_TYPES,
+                'chunks': compression.decompress_chunks(stored_object.chunks, document.content_encoding)
+            }
+
+        # Files that could not be fetched are listed inside the archive, since the response has already started
+        if missing:
+            listing = ("The following documents could not be included:\n" + "\n".join(missing) + "\n").encode('utf-8')
+            yield {
+                'name': 'MISSING_FILES.txt',
+                'date_time': datetime.utcnow(),
+                'size': len(listing),
+                'compress': True,
+                'chunks': [listing]
+            }
+
+    response = Response(stream_with_context(stream_zip(zip_entries())), mimetype='application/zip')
+    response.headers['Content-Disposition'] = helpers.content_disposition('attachment', f"{customer.firstname}_{customer.lastname}_documents.zip")
+    return response
+
+
+def zip_entry_name(document, used_names):
+    """
+    Returns a unique, path-safe file name for a document inside the ZIP archive.
+    """
+    base_name = re.sub(r'[\\/:*?"<>|]+', '_', document.document_name).strip() or document.guid
+    extension = f".{document.file_type}"
+    if base_name.lower().endswith(extension):
+        base_name = base_name[:-len(extension)]
+
+    name = f"{base_name}{extension}"
+    counter = 2
+    while name.lower() in used_names:
+        name = f"{base_name} ({counter}){extension}"
+        counter += 1
+
+    used_names.add(name.lower())
+    return name
@@ -5,7 +5,10 @@ mail_bp = Blueprint('mail', __name__, url_prefix='/cpa')
 
 
 from flask import  request
-from flask_mail import  Message
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db
+from lib import outbox
 
 # --- Registration API Endpoint ---
 @mail_bp.route('/send-email', methods=['POST'])
@@ -26,22 +29,11 @@ def sendEmail():
         return jsonify(error="Missing required fields: recipient_email, subject, and either 'body' or 'html'"), 400
 
     try:
-        msg = Message(
-            subject=email_subject,
-            recipients=[recipient_email]
-        )
-        
-        # Set body or html based on what's provided
-        if email_body:
-            msg.body = email_body
-        if email_html:
-            msg.html = email_html
-        
-        mail_instance = current_app.extensions.get('mail') 
-
-        
-        mail_instance.send(msg)
-        return jsonify(message=f"Email to {recipient_email} sent successfully!"), 200
-    except Exception as e:
-        # Log the error for debugging, but return a generic error to the client
-        return jsonify(error=f"Failed to send email. Details: {str(e)}"), 500 # Return 500 for server errors
+        # Only the outbox row is written here; the `flask send-emails` worker delivers it
+        message = outbox.enqueue_email(recipient_email, email_subject, body=email_body, html=email_html)
+        db.session.commit()
+        return jsonify(message=f"Email to {recipient_email} queued for delivery.", email_guid=message.guid), 202
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error queueing email to {recipient_email}: {e}")
+        return jsonify(error="Failed to queue email."), 500
@@ -1,10 +1,13 @@
 import re
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy.exc import SQLAlchemyError
 
 customer_auth_bp = Blueprint('auth', __name__, url_prefix='/customer')
 
 from models import Customer,db
 from flask_jwt_extended import create_access_token
+from lib.identity import identity_claims
+from lib import passwords
 
 
 
@@ -33,6 +36,15 @@ def login():
     if not customer.check_password(requestpassword):
         return jsonify({"msg": "Bad email or password"}), 401
 
+    # Upgrade hashes made with older PASSWORD_HASH_METHOD settings while we have the plain password
+    if passwords.needs_rehash(customer.password):
+        try:
+            customer.set_password(requestpassword)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(f"Failed to upgrade password hash for {customer.guid}: {e}")
+
      # Prepare user information to send back to the client
     user_info = {
         "guid": customer.guid,
@@ -42,7 +54,8 @@ def login():
         "phone": customer.phone 
     }
 
-    additional_claims = {"user_type": "customer"} 
+    # Numeric ids are signed into the token so authenticated routes can skip the GUID lookup
+    additional_claims = identity_claims("customer", customer)
 
     access_token = create_access_token(identity=customer.guid, additional_claims=additional_claims)
 
@@ -1,19 +1,25 @@
 import os
 import uuid
-from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app
-import boto3
+from datetime import datetime, timedelta
+import mimetypes
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, redirect, send_file
 from botocore.exceptions import NoCredentialsError, ClientError
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import tempfile
 
 # Assuming these are defined in your models.py
-from models import Customer, db, CustomerDocument
-from flask import send_file
+from models import db, CustomerDocument, DocumentBlob
+from lib import s3, dedup, helpers, counters, quotas, processing, previews, sniff, compression
+from lib.s3 import get_s3_client
+from lib.cache import TTLCache
+from lib.identity import current_customer
+from lib.pagination import keyset_page
+from lib.storage import get_storage, storage_for_path, S3Storage, ObjectNotFound, InvalidRange
 
-# Assuming helpers contains get_s3_client or similar if you moved it
 customer_document_bp = Blueprint('customer_document', __name__, url_prefix='/customer')
 
 # Allowed file extensions (can be moved to config.py for better centralization)
@@ -26,17 +32,17 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_s3_client():
+def guess_mimetype(file_type):
     """
-    Initializes and returns an S3 client using credentials from Flask's current_app config.
-    This ensures the client uses the app's loaded configuration.
+    Returns the MIME type for a stored file extension, falling back to a generic binary type.
     """
-    return boto3.client(
-        's3',
-        aws_access_key_id=current_app.config['AWS_ACCESS_KEY_ID'],
-        aws_secret_access_key=current_app.config['AWS_SECRET_ACCESS_KEY'],
-        region_name=current_app.config['AWS_REGION']
-    )
+    return mimetypes.guess_type(f"document.{file_type}")[0] or 'application/octet-stream'
+
+def build_document_key(business_id, customer_id, file_extension):
+    """
+    Returns a unique S3 object key for a new document, organized by business and customer.
+    """
+    return f"businesses/{business_id}/customers/{customer_id}/documents/{uuid.uuid4()}.{file_extension}"
 
 @customer_document_bp.route('/document-upload', methods=['POST'])
 @jwt_required() # Ensures only authenticated users can access this route
@@ -51,20 +57,15 @@ def upload_customer_document():
     """
     # Get the current authenticated customer's GUID from the JWT
     current_customer_guid = get_jwt_identity()
-    document_name = request.form.get('document_name')
-
-    if not document_name:
-        return jsonify({"statuscode": 422, "message": "Document Name field is required"}), 422
-
 
-    # 1. Fetch Customer details from the database using the GUID
-    # This step is crucial to get the BIGINT customer_id and business_id for the CustomerDocument schema.
+    # 1. Resolve the customer's BIGINT customer_id and business_id for the CustomerDocument schema.
+    # They come from the signed token claims and the identity cache, so this rarely hits the database.
     try:
-        customer_obj = Customer.query.filter_by(guid=current_customer_guid).first()
+        customer_obj = current_customer()
         if not customer_obj:
             return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
 
-        # Extract the customer_id and business_id (BIGINT) from the fetched Customer object
+        # Extract the customer_id and business_id (BIGINT) from the resolved identity
         customer_id_for_db = customer_obj.id
         business_id_for_db = customer_obj.business_id
 
@@ -73,16 +74,28 @@ def upload_customer_document():
         current_app.logger.error(f"Error fetching customer details for GUID {current_customer_guid}: {e}")
         return jsonify({"statuscode": 500, "message": "Failed to retrieve customer information."}), 500
 
-    # 2. Check for file in the request
+    # 2. Reject the upload before its body is read when the request alone would exceed the storage quota.
+    # Content-Length includes the multipart framing, so it slightly overstates the file size.
+    try:
+        quotas.check_quota(business_id_for_db, customer_id_for_db, request.content_length or 0)
+    except quotas.QuotaExceeded as e:
+        return jsonify({"statuscode": 413, "message": str(e)}), 413
+
+    document_name = request.form.get('document_name')
+
+    if not document_name:
+        return jsonify({"statuscode": 422, "message": "Document Name field is required"}), 422
+
+    # 3. Check for file in the request
     if 'file' not in request.files:
         return jsonify({"statuscode": 400, "message": "No file part in the request"}), 400
     file = request.files['file']
 
-    # 3. Check if a file was actually selected (filename is not empty)
+    # 4. Check if a file was actually selected (filename is not empty)
     if file.filename == '':
         return jsonify({"statuscode": 400, "message": "No selected file"}), 400
 
-    # 4. Validate the file type/extension
+    # 5. Validate the file type/extension
     if not allowed_file(file.filename):
         return jsonify({"statuscode": 400, "message": f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"}), 400
 
@@ -91,53 +104,90 @@ def upload_customer_document():
         original_filename = file.filename
         file_extension = original_filename.rsplit('.', 1)[1].lower()
 
-        # Read the entire file content to get its size.
-        # IMPORTANT: After reading, the file stream's position is at the end.
-        # We must seek(0) to reset it for boto3.upload_fileobj to read from the beginning.
-        file_content_bytes = file.read()
-        file_size = len(file_content_bytes)
-        file.seek(0) # Reset stream position to the beginning
-
-        # Generate a unique filename for S3 to prevent collisions and ensure uniqueness.
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
+        # 6. Check the first bytes against the claimed type, so a mislabelled, encrypted or
+        # bomb-like file is turned away before it is hashed or sent to storage
+        try:
+            mime_type = sniff.sniff_stream(file.stream, file_extension)
+        except sniff.ContentRejected as e:
+            return jsonify({"statuscode": 415, "message": str(e)}), 415
 
-        # Define the S3 object key (path within the S3 bucket).
+        # Generate a unique object key to prevent collisions and ensure uniqueness.
         # This structure helps organize files by business and customer.
-        s3_object_key = f"businesses/{business_id_for_db}/customers/{customer_id_for_db}/documents/{unique_filename}"
+        object_key = build_document_key(business_id_for_db, customer_id_for_db, file_extension)
 
-        # Get the S3 client and bucket name from the application configuration
-        s3_client_instance = get_s3_client()
-        bucket_name = current_app.config['S3_BUCKET_NAME']
-        # aws_region = current_app.config['AWS_REGION'] # Not directly used in upload_fileobj, but good for constructing public URLs if needed
+        # New documents go to the configured storage backend (S3 or local disk)
+        storage = get_storage()
 
         try:
-            # 5. Upload the file to AWS S3
-            s3_client_instance.upload_fileobj(
-                file, # The file-like object from request.files
-                bucket_name,
-                s3_object_key,
-                ExtraArgs={
-                    'ContentType': file.content_type or f'application/{file_extension}', # Set MIME type
-                    'ACL': 'private' # Set ACL to private for security. Access via presigned URLs.
-                }
-            )
+            # 7. Hash the file (read from werkzeug's local spool, not from storage) and check
+            # whether this business already stores identical content. Reading stops with
+            # QuotaExceeded as soon as the file outgrows the remaining quota, before any transfer.
+            content_hash, file_size = dedup.hash_stream(quotas.limit_stream(file.stream, business_id_for_db, customer_id_for_db))
+            blob = dedup.acquire_blob(business_id_for_db, content_hash)
+            deduplicated = blob is not None
+
+            if blob:
+                # Duplicate content: point the new document at the existing object and skip the upload
+                document_path_for_db = blob.document_path
+                object_key = storage_for_path(blob.document_path)[1]
+            else:
+                # Compressible types are compressed on the way to storage when a sample shows it pays off.
+                # The encoding suffix on the key tells every document that later shares the object how it is stored.
+                upload_stream = file.stream # The file-like object from request.files
+                content_encoding = compression.choose_encoding(file.stream, file_extension)
+                if content_encoding:
+                    object_key += compression.ENCODING_SUFFIXES[content_encoding]
+                    upload_stream = compression.compressed_stream(file.stream, content_encoding)
+
+                # Stream the file to storage chunk by chunk.
+                # The size is counted as the bytes flow, so the file is never read fully into memory.
+                stored_size = storage.put(
+                    object_key,
+                    upload_stream,
+                    content_type=mime_type,
+                    content_encoding=content_encoding
+                )
 
-            # Construct the internal S3 path to store in the database.
-            # This is more robust than a public URL if bucket names or regions change.
-            s3_object_path_for_db = f"s3://{bucket_name}/{s3_object_key}"
+                # Store the internal "<scheme>://" path; it decides which backend serves the document later.
+                document_path_for_db = storage.path_for(object_key)
 
-            # 6. Save document metadata to the database using SQLAlchemy
+                try:
+                    dedup.register_blob(business_id_for_db, content_hash, document_path_for_db, stored_size)
+                except IntegrityError:
+                    # A concurrent upload stored the same content first: use its object and drop ours
+                    db.session.rollback()
+                    storage.delete(object_key)
+                    blob = dedup.acquire_blob(business_id_for_db, content_hash)
+                    if not blob:
+                        raise
+                    deduplicated = True
+                    document_path_for_db = blob.document_path
+                    object_key = storage_for_path(blob.document_path)[1]
+
+            # A shared object may be stored compressed; the document records what storage actually holds
+            content_encoding = compression.encoding_for_path(document_path_for_db)
+            if blob:
+                stored_size = blob.file_size
+
+            # 8. Save document metadata to the database using SQLAlchemy
             new_document = CustomerDocument(
                 business_id=business_id_for_db,
                 customer_id=customer_id_for_db,
                 document_name=document_name,
-                document_path=s3_object_path_for_db, # Store the internal S3 path
+                document_path=document_path_for_db, # Store the internal storage path
                 file_type=file_extension,
-                file_size=str(file_size), # Convert file size to string as per your VARCHAR(25) schema
+                file_size=stored_size,
+                content_encoding=content_encoding,
+                original_size=file_size if content_encoding else None,
+                mime_type=mime_type,
+                content_hash=content_hash,
                 created_at=datetime.utcnow() # Set the creation timestamp
             )
 
             db.session.add(new_document) # Add the new document object to the session
+            counters.document_added(new_document) # Counted in the same transaction as the insert
+            # Slower work (previews, text extraction) runs in the background job worker
+            processing.enqueue_document_processing(new_document.guid)
             db.session.commit() # Commit the transaction to save to the database
 
             # Return a success response with relevant metadata
@@ -147,10 +197,14 @@ def upload_customer_document():
                 "document_id": new_document.id, # The auto-generated ID from the DB
                 "document_guid": new_document.guid, # The auto-generated GUID
                 "original_filename": original_filename,
-                "s3_object_key": s3_object_key, # The key used in S3
-                "file_size": file_size
+                "s3_object_key": object_key, # The key used in storage
+                "file_size": file_size,
+                "deduplicated": deduplicated
             }), 201
 
+        except quotas.QuotaExceeded as e:
+            db.session.rollback()
+            return jsonify({"statuscode": 413, "message": str(e)}), 413
         except NoCredentialsError:
             db.session.rollback() # Rollback DB session if AWS credentials are missing
             current_app.logger.error("AWS credentials not available or configured incorrectly.")
@@ -174,13 +228,705 @@ def upload_customer_document():
     return jsonify({"statuscode": 400, "message": "Something went wrong during file processing"}), 400
 
 
+@customer_document_bp.route('/document-upload/batch', methods=['POST'])
+@jwt_required()
+def upload_customer_documents_batch():
+    """
+    Uploads many documents in a single multipart request.
+
+    Expects:
+    - Files under the repeated 'files' key.
+    - Optionally a 'document_names' value per file (same order); the original filename is used otherwise.
+
+    Files are hashed and deduplicated against the business's stored content, the new
+    distinct blobs are streamed to S3 concurrently through a bounded thread pool, then
+    every successful upload is saved with bulk inserts and a single commit.
+    Returns a per-file result list; 207 is returned when only some files succeeded.
+    """
+    current_customer_guid = get_jwt_identity()
+
+    # 1. Resolve the customer once for the whole batch
+    try:
+        customer_obj = current_customer()
+        if not customer_obj:
+            return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
+
+    except Exception as e:
+        current_app.logger.error(f"Error fetching customer details for GUID {current_customer_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Failed to retrieve customer information."}), 500
+
+    # Reject the batch before its body is read when the request alone would exceed the storage quota
+    try:
+        quotas.check_quota(customer_obj.business_id, customer_obj.id, request.content_length or 0)
+    except quotas.QuotaExceeded as e:
+        return jsonify({"statuscode": 413, "message": str(e)}), 413
+
+    files = request.files.getlist('files')
+    document_names = request.form.getlist('document_names')
+
+    if not files:
+        return jsonify({"statuscode": 400, "message": "No files part in the request"}), 400
+
+    max_files = current_app.config['MAX_BATCH_UPLOAD_FILES']
+    if len(files) > max_files:
+        return jsonify({"statuscode": 400, "message": f"A batch may contain at most {max_files} files."}), 400
+
+    # 2. Validate every file's name and leading bytes up front so only acceptable files are sent to S3
+    results = []
+    pending_uploads = []
+    for index, file in enumerate(files):
+        result = {"index": index, "original_filename": file.filename}
+        results.append(result)
+
+        if file.filename == '':
+            result.update({"status": "failed", "error": "No selected file"})
+            continue
+        if not allowed_file(file.filename):
+            result.update({"status": "failed", "error": f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"})
+            continue
+
+        file_extension = file.filename.rsplit('.', 1)[1].lower()
+        # Only the first bytes are read, so a bad file is dropped before it is hashed
+        try:
+            mime_type = sniff.sniff_stream(file.stream, file_extension)
+        except sniff.ContentRejected as e:
+            result.update({"status": "failed", "error": str(e)})
+            continue
+
+        document_name = document_names[index] if index < len(document_names) and document_names[index] else file.filename
+        pending_uploads.append({
+            "result": result,
+            "file": file,
+            "document_name": document_name[:50], # document_name is VARCHAR(50)
+            "file_extension": file_extension,
+            "mime_type": mime_type,
+            "object_key": build_document_key(customer_obj.business_id, customer_obj.id, file_extension)
+        })
+
+    app = current_app._get_current_object()
+    storage = get_storage()
+    max_workers = max(1, min(current_app.config['S3_UPLOAD_CONCURRENCY'], len(pending_uploads)))
+
+    # 3. Hash every file concurrently and group identical content so each distinct blob is stored once
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for upload, (content_hash, file_size) in zip(pending_uploads, executor.map(lambda upload: dedup.hash_stream(upload["file"].stream), pending_uploads)):
+            upload["content_hash"] = content_hash
+            upload["file_size"] = file_size
+
+    # Keep the files that fit in the remaining storage quota, in request order
+    quota = quotas.remaining_bytes(customer_obj.business_id, customer_obj.id)
+    if quota is not None:
+        scope, quota_bytes, used_bytes, remaining = quota
+        within_quota = []
+        for upload in pending_uploads:
+            if upload["file_size"] > remaining:
+                upload["result"].update({"status": "failed", "error": str(quotas.QuotaExceeded(scope, quota_bytes, used_bytes))})
+                continue
+            remaining -= upload["file_size"]
+            within_quota.append(upload)
+        pending_uploads = within_quota
+
+    groups = {}
+    for upload in pending_uploads:
+        groups.setdefault(upload["content_hash"], []).append(upload)
+
+    # One set-based lookup for content this business already stores
+    existing_blobs = dedup.find_blobs(customer_obj.business_id, groups.keys(), lock=False)
+
+    for content_hash, group in groups.items():
+        blob = existing_blobs.get(content_hash)
+        for upload in group:
+            upload["deduplicated"] = blob is not None or upload is not group[0]
+            if blob:
+                upload["document_path"] = blob.document_path
+                upload["stored_size"] = blob.file_size
+
+    # 4. Stream the new distinct blobs to storage concurrently, compressing the types that benefit
+    def upload_one(upload):
+        with app.app_context():
+            file = upload["file"]
+            upload_stream = file.stream
+            content_encoding = compression.choose_encoding(file.stream, upload["file_extension"])
+            if content_encoding:
+                upload["object_key"] += compression.ENCODING_SUFFIXES[content_encoding]
+                upload_stream = compression.compressed_stream(file.stream, content_encoding)
+            return storage.put(
+                upload["object_key"],
+                upload_stream,
+                content_type=upload["mime_type"],
+                content_encoding=content_encoding
+            )
+
+    new_blobs = []
+    leaders = [group[0] for content_hash, group in groups.items() if content_hash not in existing_blobs]
+    if leaders:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(upload_one, upload): upload for upload in leaders}
+            for future in as_completed(futures):
+                leader = futures[future]
+                group = groups[leader["content_hash"]]
+                try:
+                    stored_size = future.result()
+                    new_blobs.append(leader)
+                    for upload in group:
+                        upload["document_path"] = storage.path_for(leader["object_key"])
+                        upload["stored_size"] = stored_size
+                except ClientError as e:
+                    current_app.logger.error(f"S3 Client Error uploading {leader['object_key']}: {e.response['Error']['Message']}")
+                    for upload in group:
+                        upload["result"].update({"status": "failed", "error": f"S3 upload failed: {e.response['Error']['Message']}"})
+                except Exception as e:
+                    current_app.logger.error(f"Unexpected error uploading {leader['object_key']}: {e}")
+                    for upload in group:
+                        upload["result"].update({"status": "failed", "error": f"An unexpected error occurred: {str(e)}"})
+
+    stored_hashes = set(existing_blobs) | {leader["content_hash"] for leader in new_blobs}
+    uploaded = [upload for upload in pending_uploads if upload["content_hash"] in stored_hashes]
+
+    # 5. Save blobs and documents with bulk statements and a single commit
+    if uploaded:
+        created_at = datetime.utcnow()
+        rows = []
+        for upload in uploaded:
+            upload["guid"] = str(uuid.uuid4())
+            content_encoding = compression.encoding_for_path(upload["document_path"])
+            rows.append({
+                "guid": upload["guid"],
+                "business_id": customer_obj.business_id,
+                "customer_id": customer_obj.id,
+                "document_name": upload["document_name"],
+                "document_path": upload["document_path"],
+                "file_type": upload["file_extension"],
+                "file_size": upload["stored_size"],
+                "content_encoding": content_encoding,
+                "original_size": upload["file_size"] if content_encoding else None,
+                "mime_type": upload["mime_type"],
+                "content_hash": upload["content_hash"],
+                "created_at": created_at,
+                "updated_at": created_at
+            })
+
+        try:
+            if new_blobs:
+                db.session.execute(insert(DocumentBlob), [
+                    {
+                        "business_id": customer_obj.business_id,
+                        "content_hash": leader["content_hash"],
+                        "document_path": leader["document_path"],
+                        "file_size": leader["stored_size"],
+                        "ref_count": len(groups[leader["content_hash"]]),
+                        "created_at": created_at,
+                        "updated_at": created_at
+                    }
+                    for leader in new_blobs
+                ])
+
+            for content_hash, blob in existing_blobs.items():
+                # Atomic increment; a blob released since the lookup above no longer matches
+                updated = DocumentBlob.query.filter_by(id=blob.id, content_hash=content_hash).update(
+                    {DocumentBlob.ref_count: DocumentBlob.ref_count + len(groups[content_hash])},
+                    synchronize_session=False
+                )
+                if not updated:
+                    raise SQLAlchemyError(f"Blob {content_hash} was deleted while the batch was uploading")
+
+            db.session.execute(insert(CustomerDocument), rows)
+            counters.adjust_document_counters(
+                customer_obj.business_id,
+                customer_obj.id,
+                documents=len(rows),
+                unverified=len(rows),
+                total_bytes=sum(upload["file_size"] for upload in uploaded)
+            )
+            for row in rows:
+                processing.enqueue_document_processing(row["guid"])
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(f"Database error saving batch document metadata: {e}")
+            # The rows were not saved, so remove the objects that were uploaded for them
+            if new_blobs:
+                try:
+                    storage.delete_many([leader["object_key"] for leader in new_blobs])
+                except Exception as cleanup_error:
+                    current_app.logger.error(f"Failed to clean up stored objects after batch rollback: {cleanup_error}")
+            for upload in uploaded:
+                upload["result"].update({"status": "failed", "error": "Error saving document metadata to database"})
+            return jsonify({"statuscode": 500, "message": "Error saving document metadata to database", "results": results}), 500
+
+        for upload in uploaded:
+            upload["result"].update({
+                "status": "uploaded",
+                "document_guid": upload["guid"],
+                "s3_object_key": storage_for_path(upload["document_path"])[1],
+                "file_size": upload["file_size"],
+                "deduplicated": upload["deduplicated"]
+            })
+
+    # 6. Report per-file results
+    if len(uploaded) == len(files):
+        statuscode, message = 201, "All files uploaded successfully and metadata saved!"
+    elif uploaded:
+        statuscode, message = 207, "Some files could not be uploaded."
+    else:
+        statuscode, message = 400, "No files could be uploaded."
+
+    return jsonify({
+        "statuscode": statuscode,
+        "message": message,
+        "uploaded_count": len(uploaded),
+        "failed_count": len(files) - len(uploaded),
+        "results": results
+    }), statuscode
+
+
+# --- Direct-to-S3 Upload Routes ---
+@customer_document_bp.route('/document-upload/initiate', methods=['POST'])
+@jwt_required()
+def initiate_direct_upload():
+    """
+    Starts a direct-to-S3 multipart upload and returns presigned part URLs.
+
+    Expects JSON payload with 'document_name', 'file_name', 'file_size' and optionally 'content_type'.
+    The CustomerDocument row is created in a 'pending' state; the browser PUTs each part
+    straight to S3 and then calls the complete endpoint with the returned ETags.
+    """
+    if not isinstance(get_storage(), S3Storage):
+        return jsonify({"statuscode": 400, "message": "Direct uploads require the S3 storage backend."}), 400
+
+    current_customer_guid = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+
+    document_name = data.get('document_name')
+    file_name = data.get('file_name')
+    content_type = data.get('content_type')
+
+    # Server-side Validation
+    errors = {}
+
+    if not document_name:
+        errors['document_name'] = 'Document Name field is required'
+
+    if not file_name:
+        errors['file_name'] = 'File name is required.'
+    elif not allowed_file(file_name):
+        errors['file_name'] = f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+
+    try:
+        file_size = int(data.get('file_size'))
+        if file_size < 1:
+            errors['file_size'] = 'File size must be a positive integer.'
+    except (TypeError, ValueError):
+        errors['file_size'] = 'File size must be a positive integer.'
+
+    if errors:
+        return jsonify({"statuscode": 422, "errors": errors, "message": "Validation failed"}), 422
+
+    try:
+        customer_obj = current_customer()
+        if not customer_obj:
+            return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
+
+    except Exception as e:
+        current_app.logger.error(f"Error fetching customer details for GUID {current_customer_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Failed to retrieve customer information."}), 500
+
+    # The declared size is checked now and again on completion, before the parts are stitched together
+    try:
+        quotas.check_quota(customer_obj.business_id, customer_obj.id, file_size)
+    except quotas.QuotaExceeded as e:
+        return jsonify({"statuscode": 413, "message": str(e)}), 413
+
+    file_extension = file_name.rsplit('.', 1)[1].lower()
+    s3_object_key = build_document_key(customer_obj.business_id, customer_obj.id, file_extension)
+
+    s3_client_instance = get_s3_client()
+    bucket_name = current_app.config['S3_BUCKET_NAME']
+    part_size, part_count = s3.plan_parts(file_size)
+
+    upload_id = None
+    try:
+        multipart = s3_client_instance.create_multipart_upload(
+            Bucket=bucket_name,
+            Key=s3_object_key,
+            ContentType=content_type or f'application/{file_extension}',
+            ACL='private'
+        )
+        upload_id = multipart['UploadId']
+
+        new_document = CustomerDocument(
+            business_id=customer_obj.business_id,
+            customer_id=customer_obj.id,
+            document_name=document_name,
+            document_path=f"s3://{bucket_name}/{s3_object_key}",
+            file_type=file_extension,
+            file_size=file_size, # Declared size, verified against S3 on completion
+            status='pending',
+            upload_id=upload_id,
+            upload_expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['DIRECT_UPLOAD_EXPIRES']),
+            created_at=datetime.utcnow()
+        )
+        db.session.add(new_document)
+        db.session.commit()
+
+        part_urls = s3.presign_upload_part_urls(
+            s3_client_instance,
+            bucket_name,
+            s3_object_key,
+            upload_id,
+            part_count,
+            current_app.config['S3_PRESIGNED_UPLOAD_EXPIRES']
+        )
+
+        return jsonify({
+            "statuscode": 201,
+            "message": "Upload initiated. PUT each part to its URL, then call the complete endpoint.",
+            "document_guid": new_document.guid,
+            "part_size": part_size,
+            "parts": part_urls
+        }), 201
+
+    except ClientError as e:
+        db.session.rollback()
+        error_message = e.response['Error']['Message']
+        current_app.logger.error(f"S3 Client Error initiating multipart upload: {e.response['Error']['Code']} - {error_message}")
+        return jsonify({"statuscode": 500, "message": f"S3 upload initiation failed: {error_message}"}), 500
+    except NoCredentialsError:
+        db.session.rollback()
+        current_app.logger.error("AWS credentials not available or configured incorrectly.")
+        return jsonify({"statuscode": 500, "message": "AWS credentials not available or configured incorrectly."}), 500
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        # Do not leave an orphaned multipart upload behind when the row could not be saved
+        if upload_id:
+            s3_client_instance.abort_multipart_upload(Bucket=bucket_name, Key=s3_object_key, UploadId=upload_id)
+        current_app.logger.error(f"Database error saving pending document: {e}")
+        return jsonify({"statuscode": 500, "message": "Error saving document metadata to database", "error": str(e)}), 500
+
+
+@customer_document_bp.route('/document-upload/complete/<string:document_guid>', methods=['POST'])
+@jwt_required()
+def complete_direct_upload(document_guid):
+    """
+    Finalizes a direct-to-S3 multipart upload and activates its CustomerDocument row.
+
+    Expects JSON payload with 'parts': a list of {'part_number', 'etag'} as returned by S3
+    for each part PUT. The ETags and total size are checked against what S3 actually
+    received before the upload is completed.
+    """
+    current_customer_guid = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    client_parts = data.get('parts')
+
+    if not isinstance(client_parts, list) or not client_parts:
+        return jsonify({"statuscode": 422, "message": "'parts' must be a non-empty list."}), 422
+
+    try:
+        client_etags = {int(part['part_number']): str(part['etag']).strip('"') for part in client_parts}
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"statuscode": 422, "message": "Each part needs a 'part_number' and an 'etag'."}), 422
+
+    try:
+        customer_obj = current_customer()
+        if not customer_obj:
+            return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
+
+        document = CustomerDocument.query.filter_by(
+            guid=document_guid,
+            customer_id=customer_obj.id,
+            business_id=customer_obj.business_id,
+            status='pending',
+            deleted=0
+        ).first()
+
+        if not document:
+            return jsonify({"statuscode": 404, "message": "Pending upload not found or unauthorized access."}), 404
+
+        # Its parts may already be discarded by the cleanup
+        if document.upload_expires_at and document.upload_expires_at < datetime.utcnow():
+            return jsonify({"statuscode": 410, "message": "The upload has expired."}), 410
+
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error retrieving pending document {document_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Error retrieving document metadata from database."}), 500
+
+    s3_client_instance = get_s3_client()
+    bucket_name = current_app.config['S3_BUCKET_NAME']
+    s3_object_key = document.document_path[len(f"s3://{bucket_name}/"):]
+
+    try:
+        # 1. Compare what the client claims it uploaded with what S3 actually received
+        uploaded_parts = s3.list_uploaded_parts(s3_client_instance, bucket_name, s3_object_key, document.upload_id)
+        s3_etags = {part['PartNumber']: part['ETag'].strip('"') for part in uploaded_parts}
+
+        if s3_etags != client_etags:
+            return jsonify({"statuscode": 422, "message": "Uploaded parts do not match the parts received by S3."}), 422
+
+        uploaded_size = sum(part['Size'] for part in uploaded_parts)
+        if uploaded_size != document.file_size:
+            return jsonify({
+                "statuscode": 422,
+                "message": f"Uploaded size {uploaded_size} does not match the declared size {document.file_size}."
+            }), 422
+
+        # 2. Other uploads may have used up the quota since this one was initiated
+        try:
+            quotas.check_quota(document.business_id, document.customer_id, uploaded_size)
+        except quotas.QuotaExceeded as e:
+            s3_client_instance.abort_multipart_upload(Bucket=bucket_name, Key=s3_object_key, UploadId=document.upload_id)
+            document.upload_id = None
+            document.deleted = 1
+            db.session.commit()
+            return jsonify({"statuscode": 413, "message": str(e)}), 413
+
+        # 3. Stitch the parts together in S3
+        s3_client_instance.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=s3_object_key,
+            UploadId=document.upload_id,
+            MultipartUpload={
+                'Parts': [
+                    {'PartNumber': part['PartNumber'], 'ETag': part['ETag']}
+                    for part in sorted(uploaded_parts, key=lambda part: part['PartNumber'])
+                ]
+            }
+        )
+
+        # 4. The bytes never passed through the app, so sniff the start of the assembled object
+        head = s3_client_instance.get_object(
+            Bucket=bucket_name,
+            Key=s3_object_key,
+            Range=f"bytes=0-{current_app.config['UPLOAD_SNIFF_BYTES'] - 1}"
+        )['Body'].read()
+        try:
+            document.mime_type = sniff.sniff_content(head, document.file_type)
+        except sniff.ContentRejected as e:
+            s3_client_instance.delete_object(Bucket=bucket_name, Key=s3_object_key)
+            document.upload_id = None
+            document.deleted = 1
+            db.session.commit()
+            return jsonify({"statuscode": 415, "message": str(e)}), 415
+
+        # 5. Activate the document
+        document.status = 'active'
+        document.upload_id = None
+        counters.document_added(document)
+        processing.enqueue_document_processing(document.guid)
+        db.session.commit()
+
+        return jsonify({
+            "statuscode": 200,
+            "message": "File uploaded successfully and metadata saved!",
+            "document_guid": document.guid,
+            "s3_object_key": s3_object_key,
+            "file_size": uploaded_size
+        }), 200
+
+    except ClientError as e:
+        db.session.rollback()
+        error_message = e.response['Error']['Message']
+        current_app.logger.error(f"S3 Client Error completing upload {document_guid}: {e.response['Error']['Code']} - {error_message}")
+        return jsonify({"statuscode": 500, "message": f"S3 upload completion failed: {error_message}"}), 500
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error activating document {document_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Error saving document metadata to database", "error": str(e)}), 500
+
+
+def expire_direct_uploads(now=None):
+    """
+    Aborts abandoned direct-to-S3 uploads whose expiry has passed and soft-deletes their
+    pending documents. Returns the number of uploads expired.
+    """
+    now = now or datetime.utcnow()
+    s3_client_instance = get_s3_client()
+    bucket_name = current_app.config['S3_BUCKET_NAME']
+
+    expired = 0
+    while True:
+        # One row at a time, locked, so parallel cleanups never pick the same upload
+        document = CustomerDocument.query.filter(
+            CustomerDocument.status == 'pending',
+            CustomerDocument.upload_expires_at < now,
+            CustomerDocument.deleted == 0
+        ).with_for_update(skip_locked=True).first()
+        if not document:
+            break
+
+        if document.upload_id:
+            try:
+                s3_client_instance.abort_multipart_upload(
+                    Bucket=bucket_name,
+                    Key=document.document_path[len(f"s3://{bucket_name}/"):],
+                    UploadId=document.upload_id
+                )
+            except ClientError as e:
+                current_app.logger.warning(f"Could not abort multipart upload for document {document.guid}: {e}")
+        document.deleted = True
+        document.upload_id = None
+        db.session.commit()
+        expired += 1
+
+    return expired
+
+
+@customer_document_bp.route('/document-upload/<string:document_guid>', methods=['DELETE'])
+@jwt_required()
+def abort_direct_upload(document_guid):
+    """
+    Aborts a pending direct-to-S3 upload, discarding any parts already sent to S3.
+    """
+    current_customer_guid = get_jwt_identity()
+
+    try:
+        customer_obj = current_customer()
+        if not customer_obj:
+            return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
+
+        document = CustomerDocument.query.filter_by(
+            guid=document_guid,
+            customer_id=customer_obj.id,
+            business_id=customer_obj.business_id,
+            status='pending',
+            deleted=0
+        ).first()
+
+        if not document:
+            return jsonify({"statuscode": 404, "message": "Pending upload not found or unauthorized access."}), 404
+
+        bucket_name = current_app.config['S3_BUCKET_NAME']
+        get_s3_client().abort_multipart_upload(
+            Bucket=bucket_name,
+            Key=document.document_path[len(f"s3://{bucket_name}/"):],
+            UploadId=document.upload_id
+        )
+
+        document.deleted = True
+        document.upload_id = None
+        db.session.commit()
+
+        return jsonify({"statuscode": 200, "message": "Upload aborted."}), 200
+
+    except ClientError as e:
+        db.session.rollback()
+        error_message = e.response['Error']['Message']
+        current_app.logger.error(f"S3 Client Error aborting upload {document_guid}: {error_message}")
+        return jsonify({"statuscode": 500, "message": f"S3 upload abort failed: {error_message}"}), 500
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error aborting upload {document_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Error updating document metadata in database."}), 500
+
+
+@customer_document_bp.route('/document-delete/<string:document_guid>', methods=['DELETE'])
+@jwt_required()
+def delete_customer_document(document_guid):
+    """
+    Soft-deletes a customer document and releases its stored object.
+
+    Documents with identical content share one object per business, so the object is
+    only removed from S3 once the last document referencing it has been deleted.
+    """
+    current_customer_guid = get_jwt_identity()
+
+    try:
+        customer_obj = current_customer()
+        if not customer_obj:
+            return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
+
+        document = CustomerDocument.query.filter_by(
+            guid=document_guid,
+            customer_id=customer_obj.id,
+            business_id=customer_obj.business_id,
+            status='active',
+            deleted=0
+        ).first()
+
+        if not document:
+            return jsonify({"statuscode": 404, "message": "Document not found or unauthorized access."}), 404
+
+        document.deleted = True
+        counters.document_removed(document)
+        for disposition in ('attachment', 'inline'):
+            presigned_url_cache.pop((document.guid, disposition))
+
+        # Documents stored before deduplication own their object outright
+        if document.content_hash:
+            orphaned_path = dedup.release_blob(document.business_id, document.content_hash)
+        else:
+            orphaned_path = document.document_path
+
+        db.session.commit()
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error deleting document {document_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Error deleting document from database."}), 500
+
+    # Remove the object only after the commit, so a failed transaction never loses data
+    if orphaned_path:
+        try:
+            backend, object_key = storage_for_path(orphaned_path)
+            backend.delete(object_key)
+            if document.preview_path:
+                previews.delete_preview(document.preview_path)
+        except Exception as e:
+            current_app.logger.error(f"Failed to delete stored object {orphaned_path} for document {document_guid}: {e}")
+
+    return jsonify({"statuscode": 200, "message": "Document deleted successfully."}), 200
+
+
 # --- New Download Route ---
+DOWNLOAD_MODES = ('stream', 'presigned', 'redirect')
+
+# Signed download URLs per (document guid, disposition), kept until shortly before the URL expires
+presigned_url_cache = TTLCache(maxsize=10000)
+
+def get_presigned_download_url(backend, object_key, document, disposition):
+    """
+    Returns (url, seconds_left) for a short-lived pre-signed GET URL of a document,
+    or (None, None) when its storage backend cannot sign URLs.
+    URLs are cached and reused until PRESIGNED_URL_CACHE_MARGIN seconds before they expire,
+    so repeat clicks skip re-signing while every URL handed out stays valid long enough to use.
+    """
+    cache_key = (document.guid, disposition)
+    cached = presigned_url_cache.get(cache_key)
+    if cached:
+        presigned_url, expires_at = cached
+        return presigned_url, int(expires_at - time.time())
+
+    expires_in = current_app.config['PRESIGNED_DOWNLOAD_EXPIRES']
+    presigned_url = backend.presign(
+        object_key,
+        expires_in,
+        content_disposition=helpers.content_disposition(disposition, document.document_name),
+        content_type=document.mime_type or guess_mimetype(document.file_type)
+    )
+    if presigned_url is None:
+        return None, None
+
+    cache_ttl = expires_in - current_app.config['PRESIGNED_URL_CACHE_MARGIN']
+    if cache_ttl > 0:
+        presigned_url_cache.set(cache_key, (presigned_url, time.time() + expires_in), ttl=cache_ttl)
+
+    return presigned_url, expires_in
+
 @customer_document_bp.route('/document-download/<string:document_guid>', methods=['GET'])
 @jwt_required()
 def download_customer_document(document_guid):
     """
-    Generates a pre-signed URL for downloading a specific customer document from S3.
-    Requires a 'document_id' as a query parameter.
+    Downloads a specific customer document.
+
+    Optional query parameters:
+    - 'mode': 'stream' (relay the bytes through this worker), 'presigned' (return a short-lived
+      S3 URL as JSON) or 'redirect' (302 to that URL). Defaults to the DOWNLOAD_MODE config.
+      Backends that cannot sign URLs (local storage) always stream.
+    - 'disposition': 'attachment' (default) or 'inline'.
+    Streaming relays the stored object in fixed-size chunks and honors Range/If-Range so viewers
+    can load large files progressively (206 Partial Content). Files on local storage are
+    handed to send_file so the server can use sendfile instead of copying through Python.
+    Documents stored compressed are sent with Content-Encoding when the client's Accept-Encoding
+    allows it and decompressed while streaming otherwise; they are always sent whole.
     """
     current_customer_guid = get_jwt_identity()
 
@@ -191,7 +937,7 @@ def download_customer_document(document_guid):
 
     # 2. Fetch authenticated customer details for authorization
     try:
-        customer_obj = Customer.query.filter_by(guid=current_customer_guid).first()
+        customer_obj = current_customer()
         if not customer_obj:
             return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
 
@@ -204,7 +950,9 @@ def download_customer_document(document_guid):
         document = db.session.query(CustomerDocument).filter_by(
             guid=document_guid,
             customer_id=customer_obj.id, # Ensure document belongs to the authenticated customer
-            business_id=customer_obj.business_id   # Ensure document belongs to the customer's business
+            business_id=customer_obj.business_id,   # Ensure document belongs to the customer's business
+            status='active', # Pending direct uploads are not downloadable yet
+            deleted=0
         ).first()
 
         if not document:
@@ -214,63 +962,115 @@ def download_customer_document(document_guid):
         current_app.logger.error(f"Database error retrieving document for download: {e}")
         return jsonify({"statuscode": 500, "message": "Error retrieving document metadata from database."}), 500
 
-    # 4. Extract S3 object key from the stored document_path
-    s3_client_instance = get_s3_client()
-    bucket_name = current_app.config['S3_BUCKET_NAME']
+    # 4. Resolve the storage backend and object key from the stored document_path
+    # ("s3://bucket-name/path/to/object.ext" or "file:///storage/root/path/to/object.ext")
+    try:
+        backend, object_key = storage_for_path(document.document_path)
+    except ValueError:
+        current_app.logger.error(f"Invalid storage path format in DB for document {document_guid}: {document.document_path}")
+        return jsonify({"statuscode": 500, "message": "Internal error: Invalid storage path stored."}), 500
+
+    # 5. Either hand out a pre-signed URL or stream the stored object back to the client
+    download_mode = request.args.get('mode', current_app.config['DOWNLOAD_MODE'])
+    if download_mode not in DOWNLOAD_MODES:
+        return jsonify({"statuscode": 400, "message": f"Invalid download mode. Allowed modes: {', '.join(DOWNLOAD_MODES)}"}), 400
 
-    # document.document_path is stored as "s3://bucket-name/path/to/object.ext"
-    # We need to extract just "path/to/object.ext"
-    s3_path_prefix = f"s3://{bucket_name}/"
-    if not document.document_path.startswith(s3_path_prefix):
-        current_app.logger.error(f"Invalid S3 path format in DB for document {document_id}: {document.document_path}")
-        return jsonify({"statuscode": 500, "message": "Internal error: Invalid S3 path stored."}), 500
+    disposition = request.args.get('disposition', 'attachment')
+    if disposition not in ('attachment', 'inline'):
+        return jsonify({"statuscode": 400, "message": "'disposition' must be 'attachment' or 'inline'."}), 400
 
-    s3_object_key = document.document_path[len(s3_path_prefix):]
+    # A compressed document is sent as stored (with Content-Encoding) to clients that accept its
+    # encoding, and decompressed on the way out for everyone else
+    content_encoding = document.content_encoding
+    send_encoded = bool(content_encoding) and request.accept_encodings[content_encoding] > 0
 
-    # 5. Generate a pre-signed URL for the S3 object
     try:
-        # 'get_object' is the S3 action for downloading
-        # ExpiresIn sets the validity duration of the URL in seconds (e.g., 300 = 5 minutes)
-        # presigned_url = s3_client_instance.generate_presigned_url(
-        #     'get_object',
-        #     Params={
-        #         'Bucket': bucket_name,
-        #         'Key': s3_object_key,
-        #         'ResponseContentDisposition': f'attachment; filename="{document.document_name}"' # Suggests a filename for download
-        #     },
-        #     ExpiresIn=300 
-        # )
-        
-        
-        s3_response = s3_client_instance.get_object(Bucket=bucket_name, Key=s3_object_key)
-        file_data = s3_response['Body'].read()
-
-        # Save to a temp file
-        with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-            tmp_file.write(file_data)
-            tmp_file_path = tmp_file.name
-
-        # Send file to frontend
-        return send_file(
-            tmp_file_path,
-            as_attachment=True,
-            download_name=document.document_name,
-            mimetype=f"application/{document.file_type or 'octet-stream'}"
+        presigned_url = None
+        if download_mode != 'stream' and (send_encoded or not content_encoding):
+            # The browser fetches the file straight from S3, so no bytes pass through this worker
+            presigned_url, expires_in = get_presigned_download_url(backend, object_key, document, disposition)
+
+        if presigned_url:
+            if download_mode == 'redirect':
+                return redirect(presigned_url, code=302)
+
+            return jsonify({
+                "statuscode": 200,
+                "message": "Pre-signed URL generated successfully.",
+                "download_url": presigned_url,
+                "expires_in": expires_in,
+                "document_name": document.document_name,
+                "file_type": document.file_type
+            }), 200
+
+        # Stored with its parameters (e.g. "text/plain; charset=utf-8"), so it is sent as-is
+        # rather than as a mimetype werkzeug would append its own charset to
+        content_type = document.mime_type or guess_mimetype(document.file_type)
+
+        local_path = backend.local_path(object_key)
+        if local_path and not content_encoding:
+            # send_file handles Range/If-Range/conditional requests and lets the server use sendfile
+            if not os.path.isfile(local_path):
+                return jsonify({"statuscode": 404, "message": "Stored file not found."}), 404
+            response = send_file(
+                local_path,
+                mimetype=content_type,
+                conditional=True,
+                etag=True
+            )
+            response.content_type = content_type
+            response.headers['Content-Disposition'] = helpers.content_disposition(disposition, document.document_name)
+            return response
+
+        # Range/If-Range are forwarded to the backend so PDF viewers can fetch the file progressively.
+        # Byte ranges of a compressed object do not map onto the document, so those are sent whole.
+        stored_object = backend.stream(
+            object_key,
+            current_app.config['S3_DOWNLOAD_CHUNK_SIZE'],
+            range_header=None if content_encoding else request.headers.get('Range'),
+            if_range=request.headers.get('If-Range')
         )
+        is_partial = stored_object.content_range is not None
+        decode = content_encoding and not send_encoded
 
+        # Relay the body in fixed-size chunks instead of reading the whole object into memory
+        chunks = stored_object.chunks
+        if decode:
+            chunks = compression.decompress_chunks(chunks, content_encoding)
+        response = Response(
+            stream_with_context(chunks),
+            status=206 if is_partial else 200,
+            content_type=content_type,
+            direct_passthrough=True
+        )
+        response.headers['Content-Length'] = document.original_size if decode else stored_object.content_length
+        response.headers['Accept-Ranges'] = 'none' if content_encoding else 'bytes'
+        response.headers['Content-Disposition'] = helpers.content_disposition(disposition, document.document_name)
+        if content_encoding:
+            response.vary.add('Accept-Encoding')
+        if send_encoded:
+            response.headers['Content-Encoding'] = content_encoding
+        if is_partial:
+            response.headers['Content-Range'] = stored_object.content_range
+        # The stored object's ETag describes the compressed bytes, not the decompressed response
+        if stored_object.etag and not decode:
+            response.headers['ETag'] = stored_object.etag
+        if stored_object.last_modified:
+            response.last_modified = stored_object.last_modified
 
-        # return jsonify({
-        #     "statuscode": 200,
-        #     "message": "Pre-signed URL generated successfully.",
-        #     "download_url": presigned_url,
-        #     "document_name": document.document_name,
-        #     "file_type": document.file_type
-        # }), 200
+        return response
 
+    except InvalidRange:
+        return jsonify({"statuscode": 416, "message": "Requested range not satisfiable."}), 416, {
+            'Content-Range': f"bytes */{document.file_size}"
+        }
+    except ObjectNotFound:
+        current_app.logger.error(f"Stored object missing for document {document_guid}: {document.document_path}")
+        return jsonify({"statuscode": 404, "message": "Stored file not found."}), 404
     except ClientError as e:
         error_code = e.response['Error']['Code']
         error_message = e.response['Error']['Message']
-        current_app.logger.error(f"S3 Client Error generating presigned URL for {s3_object_key}: {error_code} - {error_message}")
+        current_app.logger.error(f"S3 Client Error generating download for {object_key}: {error_code} - {error_message}")
         return jsonify({"statuscode": 500, "message": f"Error generating download link: {error_message}"}), 500
     except NoCredentialsError:
         current_app.logger.error("AWS credentials not available for presigned URL generation.")
@@ -281,14 +1081,56 @@ def download_customer_document(document_guid):
 
 
 
+@customer_document_bp.route('/document-preview/<string:document_guid>', methods=['GET'])
+@jwt_required()
+def document_preview(document_guid):
+    """
+    Returns the small preview image of one of the customer's documents.
+    Documents without a preview (yet) answer 404; list responses only carry a
+    'previewUrl' for documents that have one.
+    """
+    try:
+        customer_obj = current_customer()
+        if not customer_obj:
+            return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
+
+        document = CustomerDocument.query.filter_by(
+            guid=document_guid,
+            customer_id=customer_obj.id,
+            business_id=customer_obj.business_id,
+            status='active',
+            deleted=0
+        ).first()
+
+        if not document or not document.preview_path:
+            return jsonify({"statuscode": 404, "message": "Preview not found."}), 404
+
+        return previews.preview_response(document)
+
+    except ObjectNotFound:
+        current_app.logger.error(f"Stored preview missing for document {document_guid}: {document.preview_path}")
+        return jsonify({"statuscode": 404, "message": "Preview not found."}), 404
+    except Exception as e:
+        current_app.logger.error(f"Error serving preview of document {document_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Error retrieving the preview."}), 500
+
+
 @customer_document_bp.route('/document-list', methods=['GET'])
 @jwt_required()
 def document_list():
-   
+    """
+    Lists the authenticated customer's documents, oldest first.
+
+    Two pagination modes:
+    - Cursor mode (recommended): pass 'cursor' (empty for the first page) and 'perPage'.
+      The response carries 'next_cursor' for the following page, and 'total_items' only
+      with 'includeTotal=true'.
+    - Page mode (legacy): 'page' and 'perPage', with total counts on every page.
+    """
     current_customer_guid = get_jwt_identity()
 
     try:
-        customer = Customer.query.filter_by(guid=current_customer_guid).first()
+        customer = current_customer()
         if not customer:
             return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
 
@@ -314,11 +1156,33 @@ def document_list():
 
     try:
         
-        documentLists = CustomerDocument.query.filter_by(
+        documents_query = CustomerDocument.query.filter_by(
                         customer_id=customer.id,
                         business_id=customer.business_id,
+                        status='active',
                         deleted=0
-                    ).paginate(page=page, per_page=per_page, error_out=False)
+                    )
+
+        # Cursor mode: seek past the last document seen instead of OFFSET + COUNT(*)
+        if 'cursor' in request.args:
+            try:
+                documents, pagination = keyset_page(documents_query, CustomerDocument, request.args.get('cursor'), per_page)
+            except ValueError:
+                return jsonify({"statuscode": 400, "message": "Invalid 'cursor'."}), 400
+
+            if request.args.get('includeTotal', 'false').lower() == 'true':
+                pagination['total_items'] = counters.get_counters(customer.business_id, customer.id).document_count
+
+            return jsonify({
+                'documents': [doc.to_dict() for doc in documents],
+                'pagination': pagination,
+                'message': 'Documents fetched successfully',
+                'status': 200
+            }), 200
+
+        # The total comes from the maintained counters instead of a COUNT(*) per page
+        documentLists = documents_query.order_by(CustomerDocument.created_at, CustomerDocument.id).paginate(page=page, per_page=per_page, error_out=False, count=False)
+        documentLists.total = counters.get_counters(customer.business_id, customer.id).document_count
    
    
         # Prepare customer data for JSON serialization
@@ -1,11 +1,12 @@
 import re
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity 
+from flask_jwt_extended import jwt_required
 
 customer_profile_bp = Blueprint('customer_profile', __name__, url_prefix='/customer')
 
 from models import  Customer,User,db
 from lib import helpers
+from lib.identity import current_customer
 from datetime import datetime
 
 
@@ -13,10 +14,12 @@ from datetime import datetime
 @customer_profile_bp.route('/customer-profile', methods=['GET'])
 @jwt_required() 
 def show():
-    current_customer_id = get_jwt_identity()
+    identity = current_customer()
+    if not identity:
+        return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
     
     try:
-        current_user = Customer.query.filter_by(guid=current_customer_id).first() 
+        current_user = db.session.get(Customer, identity.id)
    
         return jsonify(current_user.to_dict(True)), 200
 
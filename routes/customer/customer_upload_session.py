@@ -0,0 +1,542 @@
+import json
+from base64 import b64decode
+from binascii import Error as BinasciiError
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app, url_for
+from botocore.exceptions import ClientError
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.exceptions import ClientDisconnected
+
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from models import db, CustomerDocument, UploadSession
+from lib import s3, counters, quotas, processing, sniff
+from lib.s3 import get_s3_client
+from lib.storage import get_storage, S3Storage
+from lib.identity import current_customer
+from routes.customer.customer_document import allowed_file, build_document_key, ALLOWED_EXTENSIONS
+
+# Resumable uploads following the tus 1.0 core protocol (creation, expiration and termination extensions)
+customer_upload_session_bp = Blueprint('customer_upload_session', __name__, url_prefix='/customer')
+
+TUS_VERSION = '1.0.0'
+PATCH_CONTENT_TYPE = 'application/offset+octet-stream'
+READ_CHUNK_SIZE = 64 * 1024
+
+
+@customer_upload_session_bp.after_request
+def add_tus_headers(response):
+    response.headers['Tus-Resumable'] = TUS_VERSION
+    return response
+
+
+def parse_upload_metadata(header_value):
+    """
+    Parses a tus Upload-Metadata header ("key base64value,key2 base64value") into a dict.
+    """
+    metadata = {}
+    for pair in (header_value or '').split(','):
+        pair = pair.strip()
+        if not pair:
+            continue
+        key, _, encoded_value = pair.partition(' ')
+        metadata[key] = b64decode(encoded_value).decode('utf-8') if encoded_value else ''
+    return metadata
+
+
+def get_customer_session(session_guid, lock=False):
+    """
+    Returns (customer, upload_session) for the authenticated customer, either of which may be None.
+    """
+    customer_obj = current_customer()
+    if not customer_obj:
+        return None, None
+
+    query = UploadSession.query.filter_by(
+        guid=session_guid,
+        customer_id=customer_obj.id,
+        business_id=customer_obj.business_id
+    )
+    if lock:
+        query = query.with_for_update()
+    return customer_obj, query.first()
+
+
+def session_gone(upload_session):
+    """
+    Returns True when an upload session can no longer accept or report progress.
+    """
+    return upload_session.status != 'active' or upload_session.expires_at < datetime.utcnow()
+
+
+def tail_key_for(upload_session, offset):
+    """
+    Tail objects are versioned by the upload offset they end at, so a failed commit never
+    leaves the session pointing at a tail holding bytes it did not record.
+    """
+    return (
+        f"businesses/{upload_session.business_id}/customers/{upload_session.customer_id}"
+        f"/uploads/{upload_session.guid}/tail-{offset}"
+    )
+
+
+def discard_session_objects(s3_client_instance, bucket_name, upload_session):
+    """
+    Aborts the session's multipart upload and deletes its tail object, ignoring what is already gone.
+    """
+    if upload_session.upload_id:
+        try:
+            s3_client_instance.abort_multipart_upload(
+                Bucket=bucket_name,
+                Key=upload_session.object_key,
+                UploadId=upload_session.upload_id
+            )
+        except ClientError as e:
+            current_app.logger.warning(f"Could not abort multipart upload for session {upload_session.guid}: {e}")
+    if upload_session.tail_key:
+        try:
+            s3_client_instance.delete_object(Bucket=bucket_name, Key=upload_session.tail_key)
+        except ClientError as e:
+            current_app.logger.warning(f"Could not delete tail object for session {upload_session.guid}: {e}")
+
+
+def expire_upload_sessions(now=None):
+    """
+    Cleans up abandoned upload sessions whose expiry has passed.
+    Returns the number of sessions expired.
+    """
+    now = now or datetime.utcnow()
+    s3_client_instance = get_s3_client()
+    bucket_name = current_app.config['S3_BUCKET_NAME']
+
+    expired = 0
+    while True:
+        # One row at a time, locked, so parallel cleanups never pick the same session. A PATCH
+        # extends the expiry before it starts reading, so a session receiving a chunk is not picked
+        upload_session = UploadSession.query.filter(
+            UploadSession.status == 'active',
+            UploadSession.expires_at < now
+        ).with_for_update(skip_locked=True).first()
+        if not upload_session:
+            break
+
+        discard_session_objects(s3_client_instance, bucket_name, upload_session)
+        upload_session.status = 'expired'
+        upload_session.upload_id = None
+        upload_session.tail_key = None
+        db.session.commit()
+        expired += 1
+
+    return expired
+
+
+# --- Create an upload session ---
+@customer_upload_session_bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def create_upload_session():
+    """
+    Creates a resumable upload session (tus creation extension).
+
+    Expects:
+    - 'Upload-Length' header with the total file size in bytes.
+    - 'Upload-Metadata' header with base64 'filename' and 'document_name' (and optionally 'filetype').
+    Returns 201 with the session URL in 'Location' and its expiry in 'Upload-Expires'.
+    Sessions are assembled from S3 multipart parts, so they need the S3 storage backend.
+    """
+    if not isinstance(get_storage(), S3Storage):
+        return jsonify({"statuscode": 400, "message": "Resumable uploads require the S3 storage backend."}), 400
+
+    try:
+        upload_length = int(request.headers.get('Upload-Length', ''))
+        if upload_length < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"statuscode": 400, "message": "'Upload-Length' must be a positive integer."}), 400
+
+    try:
+        metadata = parse_upload_metadata(request.headers.get('Upload-Metadata'))
+    except (BinasciiError, UnicodeDecodeError):
+        return jsonify({"statuscode": 400, "message": "Malformed 'Upload-Metadata' header."}), 400
+
+    file_name = metadata.get('filename')
+    document_name = metadata.get('document_name')
+
+    errors = {}
+    if not document_name:
+        errors['document_name'] = 'Document Name field is required'
+    if not file_name:
+        errors['filename'] = 'File name is required.'
+    elif not allowed_file(file_name):
+        errors['filename'] = f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+
+    if errors:
+        return jsonify({"statuscode": 422, "errors": errors, "message": "Validation failed"}), 422
+
+    try:
+        customer_obj = current_customer()
+        if not customer_obj:
+            return jsonify({"statuscode": 404, "message": "Authenticated customer not found."}), 404
+
+        try:
+            quotas.check_quota(customer_obj.business_id, customer_obj.id, upload_length)
+        except quotas.QuotaExceeded as e:
+            return jsonify({"statuscode": 413, "message": str(e)}), 413
+
+        file_extension = file_name.rsplit('.', 1)[1].lower()
+        upload_session = UploadSession(
+            business_id=customer_obj.business_id,
+            customer_id=customer_obj.id,
+            document_name=document_name,
+            file_type=file_extension,
+            content_type=metadata.get('filetype'),
+            object_key=build_document_key(customer_obj.business_id, customer_obj.id, file_extension),
+            upload_length=upload_length,
+            expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['RESUMABLE_UPLOAD_EXPIRES'])
+        )
+        db.session.add(upload_session)
+        db.session.commit()
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error creating upload session: {e}")
+        return jsonify({"statuscode": 500, "message": "Error creating upload session."}), 500
+
+    location = url_for('customer_upload_session.upload_session_offset', session_guid=upload_session.guid)
+    return jsonify({
+        "statuscode": 201,
+        "message": "Upload session created.",
+        "upload_guid": upload_session.guid,
+        "upload_url": location
+    }), 201, {
+        'Location': location,
+        'Upload-Offset': '0',
+        'Upload-Expires': upload_session.expires_at.strftime('%a, %d %b %Y %H:%M:%S GMT')
+    }
+
+
+# --- Query the current offset ---
+@customer_upload_session_bp.route('/uploads/<string:session_guid>', methods=['HEAD'])
+@jwt_required()
+def upload_session_offset(session_guid):
+    """
+    Reports how many bytes of the upload the server has stored, so the client knows where to resume.
+    """
+    customer_obj, upload_session = get_customer_session(session_guid)
+    if not customer_obj or not upload_session:
+        return '', 404
+    if upload_session.status == 'completed':
+        return '', 200, {
+            'Upload-Offset': str(upload_session.upload_offset),
+            'Upload-Length': str(upload_session.upload_length),
+            'Cache-Control': 'no-store'
+        }
+    if session_gone(upload_session):
+        return '', 410
+
+    return '', 200, {
+        'Upload-Offset': str(upload_session.upload_offset),
+        'Upload-Length': str(upload_session.upload_length),
+        'Upload-Expires': upload_session.expires_at.strftime('%a, %d %b %Y %H:%M:%S GMT'),
+        'Cache-Control': 'no-store'
+    }
+
+
+# --- Append a chunk ---
+@customer_upload_session_bp.route('/uploads/<string:session_guid>', methods=['PATCH'])
+@jwt_required()
+def append_upload_chunk(session_guid):
+    """
+    Appends a chunk to the upload at the offset given in 'Upload-Offset'.
+
+    Every full part is sent to the S3 multipart upload as soon as it is buffered and the
+    remainder is parked in a tail object, so if the connection drops mid-chunk everything
+    received so far is kept and the client resumes from the returned offset.
+    When the last byte arrives the upload is completed and a CustomerDocument row is created.
+    The session row is not locked while the chunk arrives: the new offset is saved only if
+    the stored one is still the one checked on entry, otherwise the response is 409.
+    """
+    if request.mimetype != PATCH_CONTENT_TYPE:
+        return jsonify({"statuscode": 415, "message": f"Content-Type must be {PATCH_CONTENT_TYPE}."}), 415
+
+    try:
+        client_offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({"statuscode": 400, "message": "'Upload-Offset' must be an integer."}), 400
+
+    if request.content_length is None:
+        return jsonify({"statuscode": 411, "message": "Content-Length is required."}), 411
+
+    try:
+        # Validate under a short row lock. The session is detached before committing, and the
+        # body is read and sent to S3 without holding the lock
+        customer_obj, upload_session = get_customer_session(session_guid, lock=True)
+        if not customer_obj or not upload_session:
+            return jsonify({"statuscode": 404, "message": "Upload session not found."}), 404
+        if session_gone(upload_session):
+            db.session.rollback()
+            return jsonify({"statuscode": 410, "message": "Upload session has expired or was closed."}), 410
+        if client_offset != upload_session.upload_offset:
+            db.session.rollback()
+            return jsonify({"statuscode": 409, "message": "Upload-Offset does not match the stored offset."}), 409, {
+                'Upload-Offset': str(upload_session.upload_offset)
+            }
+        if upload_session.upload_offset + request.content_length > upload_session.upload_length:
+            db.session.rollback()
+            return jsonify({"statuscode": 413, "message": "Chunk would exceed the declared Upload-Length."}), 413
+        # The upload is only counted once it completes, so check that all of it still fits
+        # before accepting more bytes; other uploads may have used the quota in the meantime
+        quotas.check_quota(upload_session.business_id, upload_session.customer_id, upload_session.upload_length)
+
+        # Extended up front, so the cleanup command leaves the session alone while the chunk arrives
+        upload_session.expires_at = datetime.utcnow() + timedelta(seconds=current_app.config['RESUMABLE_UPLOAD_EXPIRES'])
+        db.session.flush()
+        db.session.expunge(upload_session)
+        db.session.commit()
+
+    except quotas.QuotaExceeded as e:
+        db.session.rollback()
+        return jsonify({"statuscode": 413, "message": str(e)}), 413
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error loading upload session {session_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Error loading upload session."}), 500
+
+    s3_client_instance = get_s3_client()
+    bucket_name = current_app.config['S3_BUCKET_NAME']
+    part_size = s3.get_part_size()
+    parts = json.loads(upload_session.parts)
+    expected_offset = upload_session.upload_offset
+    committed_bytes = upload_session.upload_offset - upload_session.tail_size
+    old_upload_id = upload_session.upload_id
+    old_tail_key = upload_session.tail_key
+    # The content is sniffed as soon as its first UPLOAD_SNIFF_BYTES have arrived, before any part is sent
+    sniff_length = min(current_app.config['UPLOAD_SNIFF_BYTES'], upload_session.upload_length)
+    needs_sniff = upload_session.upload_offset < sniff_length
+
+    def save_progress(**values):
+        """
+        Writes the new session state only if no other request has moved the offset since the
+        check above. Returns False when the session was changed in the meantime.
+        """
+        return UploadSession.query.filter_by(
+            id=upload_session.id,
+            status='active',
+            upload_offset=expected_offset
+        ).update(values, synchronize_session=False) == 1
+
+    try:
+        # 1. Start from the bytes parked by the previous chunk (always smaller than a part)
+        buffer = bytearray()
+        if old_tail_key:
+            buffer += s3_client_instance.get_object(Bucket=bucket_name, Key=old_tail_key)['Body'].read()
+
+        def flush_part(data):
+            if not upload_session.upload_id:
+                upload_session.upload_id = s3_client_instance.create_multipart_upload(
+                    Bucket=bucket_name,
+                    Key=upload_session.object_key,
+                    ContentType=upload_session.content_type or f'application/{upload_session.file_type}',
+                    ACL='private'
+                )['UploadId']
+            # A request racing this one from the same offset writes the same bytes of the file
+            # to the same part numbers, so whichever of them saves its progress stays consistent
+            part_number = len(parts) + 1
+            response = s3_client_instance.upload_part(
+                Bucket=bucket_name,
+                Key=upload_session.object_key,
+                UploadId=upload_session.upload_id,
+                PartNumber=part_number,
+                Body=bytes(data)
+            )
+            parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+
+        # 2. Read the request body, sending each full part to S3 as soon as it is buffered
+        try:
+            while True:
+                chunk = request.stream.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                buffer += chunk
+                if needs_sniff and len(buffer) >= sniff_length:
+                    # Still at the start of the file: nothing has been committed to a part yet
+                    upload_session.content_type = sniff.sniff_content(bytes(buffer[:sniff_length]), upload_session.file_type)
+                    needs_sniff = False
+                while len(buffer) >= part_size and committed_bytes + len(buffer) < upload_session.upload_length:
+                    flush_part(buffer[:part_size])
+                    del buffer[:part_size]
+                    committed_bytes += part_size
+        except ClientDisconnected:
+            # Keep everything received so far; the client resumes from the new offset
+            current_app.logger.info(f"Client disconnected during upload session {session_guid}, saving progress")
+
+        upload_session.upload_offset = committed_bytes + len(buffer)
+        upload_session.parts = json.dumps(parts)
+        upload_session.expires_at = datetime.utcnow() + timedelta(seconds=current_app.config['RESUMABLE_UPLOAD_EXPIRES'])
+
+        # 3. Either finish the upload or park the remainder in a fresh tail object
+        new_document = None
+        if upload_session.upload_offset == upload_session.upload_length:
+            if parts:
+                if buffer:
+                    flush_part(buffer)
+                s3_client_instance.complete_multipart_upload(
+                    Bucket=bucket_name,
+                    Key=upload_session.object_key,
+                    UploadId=upload_session.upload_id,
+                    MultipartUpload={'Parts': parts}
+                )
+            else:
+                # The whole file fitted in a single part
+                s3_client_instance.put_object(
+                    Bucket=bucket_name,
+                    Key=upload_session.object_key,
+                    Body=bytes(buffer),
+                    ContentType=upload_session.content_type or f'application/{upload_session.file_type}',
+                    ACL='private'
+                )
+            upload_session.status = 'completed'
+            upload_session.upload_id = None
+            upload_session.tail_key = None
+            upload_session.tail_size = 0
+        elif buffer:
+            upload_session.tail_key = tail_key_for(upload_session, upload_session.upload_offset)
+            upload_session.tail_size = len(buffer)
+            if upload_session.tail_key != old_tail_key:
+                s3_client_instance.put_object(Bucket=bucket_name, Key=upload_session.tail_key, Body=bytes(buffer), ACL='private')
+        else:
+            upload_session.tail_key = None
+            upload_session.tail_size = 0
+
+        saved = save_progress(
+            upload_offset=upload_session.upload_offset,
+            parts=upload_session.parts,
+            expires_at=upload_session.expires_at,
+            content_type=upload_session.content_type,
+            upload_id=upload_session.upload_id,
+            tail_key=upload_session.tail_key,
+            tail_size=upload_session.tail_size,
+            status=upload_session.status
+        )
+        if saved and upload_session.status == 'completed':
+            new_document = CustomerDocument(
+                business_id=upload_session.business_id,
+                customer_id=upload_session.customer_id,
+                document_name=upload_session.document_name,
+                document_path=f"s3://{bucket_name}/{upload_session.object_key}",
+                file_type=upload_session.file_type,
+                file_size=upload_session.upload_length,
+                mime_type=upload_session.content_type,
+                created_at=datetime.utcnow()
+            )
+            db.session.add(new_document)
+            db.session.flush()
+            counters.document_added(new_document)
+            processing.enqueue_document_processing(new_document.guid)
+            UploadSession.query.filter_by(id=upload_session.id).update(
+                {'document_id': new_document.id},
+                synchronize_session=False
+            )
+        db.session.commit()
+
+    except sniff.ContentRejected as e:
+        # Close the session; at most the first chunk was ever stored for it
+        if save_progress(status='aborted', upload_id=None, tail_key=None):
+            try:
+                discard_session_objects(s3_client_instance, bucket_name, upload_session)
+            except ClientError as cleanup_error:
+                current_app.logger.warning(f"Could not discard objects of rejected upload session {session_guid}: {cleanup_error}")
+        db.session.commit()
+        return jsonify({"statuscode": 415, "message": str(e)}), 415
+    except ClientError as e:
+        db.session.rollback()
+        error_message = e.response['Error']['Message']
+        current_app.logger.error(f"S3 Client Error appending to upload session {session_guid}: {error_message}")
+        return jsonify({"statuscode": 500, "message": f"S3 upload failed: {error_message}"}), 500
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error saving upload session {session_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Error saving upload progress."}), 500
+
+    if not saved:
+        return discard_lost_chunk(s3_client_instance, bucket_name, upload_session, old_upload_id)
+
+    # The old tail is only removed once the new offset has been committed
+    if old_tail_key and old_tail_key != upload_session.tail_key:
+        try:
+            s3_client_instance.delete_object(Bucket=bucket_name, Key=old_tail_key)
+        except ClientError as e:
+            current_app.logger.warning(f"Could not delete tail object {old_tail_key}: {e}")
+
+    headers = {'Upload-Offset': str(upload_session.upload_offset)}
+    if new_document:
+        headers['Upload-Document-Guid'] = new_document.guid
+    else:
+        headers['Upload-Expires'] = upload_session.expires_at.strftime('%a, %d %b %Y %H:%M:%S GMT')
+    return '', 204, headers
+
+
+def discard_lost_chunk(s3_client_instance, bucket_name, upload_session, old_upload_id):
+    """
+    Cleans up after a PATCH whose session was moved on by another request (or closed) while
+    its chunk was being stored, and returns the 409 response with the session's current offset.
+    Only objects the stored session does not reference are removed.
+    """
+    stored_session = db.session.get(UploadSession, upload_session.id)
+    if upload_session.upload_id and upload_session.upload_id not in (old_upload_id, stored_session.upload_id):
+        try:
+            s3_client_instance.abort_multipart_upload(
+                Bucket=bucket_name,
+                Key=upload_session.object_key,
+                UploadId=upload_session.upload_id
+            )
+        except ClientError as e:
+            current_app.logger.warning(f"Could not abort multipart upload for session {upload_session.guid}: {e}")
+    if upload_session.tail_key and upload_session.tail_key != stored_session.tail_key:
+        try:
+            s3_client_instance.delete_object(Bucket=bucket_name, Key=upload_session.tail_key)
+        except ClientError as e:
+            current_app.logger.warning(f"Could not delete tail object {upload_session.tail_key}: {e}")
+    if upload_session.status == 'completed' and stored_session.status != 'completed':
+        try:
+            s3_client_instance.delete_object(Bucket=bucket_name, Key=upload_session.object_key)
+        except ClientError as e:
+            current_app.logger.warning(f"Could not delete object {upload_session.object_key}: {e}")
+    stored_offset = stored_session.upload_offset
+    db.session.rollback()
+    return jsonify({"statuscode": 409, "message": "Upload session was changed by another request."}), 409, {
+        'Upload-Offset': str(stored_offset)
+    }
+
+
+# --- Terminate an upload ---
+@customer_upload_session_bp.route('/uploads/<string:session_guid>', methods=['DELETE'])
+@jwt_required()
+def terminate_upload_session(session_guid):
+    """
+    Aborts an upload session and discards whatever was stored for it (tus termination extension).
+    """
+    try:
+        customer_obj, upload_session = get_customer_session(session_guid, lock=True)
+        if not customer_obj or not upload_session:
+            return jsonify({"statuscode": 404, "message": "Upload session not found."}), 404
+        if upload_session.status != 'active':
+            db.session.rollback()
+            return jsonify({"statuscode": 410, "message": "Upload session is already closed."}), 410
+
+        discard_session_objects(get_s3_client(), current_app.config['S3_BUCKET_NAME'], upload_session)
+        upload_session.status = 'aborted'
+        upload_session.upload_id = None
+        upload_session.tail_key = None
+        db.session.commit()
+
+    except ClientError as e:
+        db.session.rollback()
+        current_app.logger.error(f"S3 Client Error terminating upload session {session_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Failed to discard uploaded data."}), 500
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error terminating upload session {session_guid}: {e}")
+        return jsonify({"statuscode": 500, "message": "Error terminating upload session."}), 500
+
+    return '', 204